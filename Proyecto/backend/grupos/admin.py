@@ -38,13 +38,14 @@ class UsuarioAdmin(admin.ModelAdmin):
     list_filter = ["estado_usuario", "fecha_registro"]
     search_fields = ["nombre_usuario", "apellido", "correo_usuario"]
     ordering = ["-fecha_registro"]
-    readonly_fields = ["id_usuario", "fecha_registro"]
+    # El contador lo mantienen UPDATEs por conjunto (grupos/audiencias.py)
+    readonly_fields = ["id_usuario", "fecha_registro", "notificaciones_no_leidas"]
     fieldsets = (
         ("Información Personal", {
             "fields": ("nombre_usuario", "apellido", "correo_usuario")
         }),
         ("Estado", {
-            "fields": ("estado_usuario",)
+            "fields": ("estado_usuario", "notificaciones_no_leidas")
         }),
         ("Auditoría", {
             "fields": ("id_usuario", "fecha_registro"),
@@ -67,7 +68,7 @@ class GrupoAdmin(admin.ModelAdmin):
     list_filter = ["tipo_grupo", "area_interes", "fecha_creacion"]
     search_fields = ["nombre_grupo", "correo_grupo", "descripcion"]
     ordering = ["-fecha_creacion"]
-    readonly_fields = ["id_grupo", "fecha_creacion", "total_miembros"]
+    readonly_fields = ["id_grupo", "fecha_creacion", "total_miembros", "total_eventos"]
     fieldsets = (
         ("Información General", {
             "fields": ("nombre_grupo", "tipo_grupo", "area_interes", "descripcion")
@@ -79,15 +80,11 @@ class GrupoAdmin(admin.ModelAdmin):
             "fields": ("logo",)
         }),
         ("Estadísticas", {
-            "fields": ("total_miembros", "fecha_creacion"),
+            "fields": ("total_miembros", "total_eventos", "fecha_creacion"),
             "classes": ("collapse",)
         }),
     )
 
-    def total_miembros(self, obj):
-        return obj.miembros.count()
-    total_miembros.short_description = "Total de Miembros"
-
 
 @admin.register(Evento)
 class EventoAdmin(admin.ModelAdmin):
@@ -140,8 +137,8 @@ class ComentarioAdmin(admin.ModelAdmin):
 
 @admin.register(Notificacion)
 class NotificacionAdmin(admin.ModelAdmin):
-    list_display = ["id_notificacion", "tipo_notificacion", "mensaje", "fecha_envio"]
-    list_filter = ["tipo_notificacion", "fecha_envio"]
+    list_display = ["id_notificacion", "tipo_notificacion", "mensaje", "fecha_envio", "audiencia_tipo", "audiencia_id"]
+    list_filter = ["tipo_notificacion", "audiencia_tipo", "fecha_envio"]
     search_fields = ["mensaje"]
     ordering = ["-fecha_envio"]
     readonly_fields = ["id_notificacion", "fecha_envio"]
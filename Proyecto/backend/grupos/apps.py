@@ -3,3 +3,7 @@ from django.apps import AppConfig
 class GruposConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'grupos'
+
+    def ready(self):
+        # Registrar los observadores (signals) de la app
+        from . import signals  # noqa: F401
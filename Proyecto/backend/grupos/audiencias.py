@@ -0,0 +1,369 @@
+"""
+Audiencias de notificaciones - ÁgoraUN
+
+Permite enviar una notificación a un conjunto de usuarios definido en el
+servidor en lugar de una lista de IDs:
+
+- GRUPO:  miembros de un grupo (UsuarioGrupo)
+- EVENTO: participantes confirmados de un evento (ParticipacionUsuario)
+- ROL:    usuarios con un rol del sistema (UsuarioRol)
+
+Dos modos de almacenamiento:
+- Individual: los destinatarios se insertan en USUARIO_NOTIFICACION con
+  INSERT ... SELECT por lotes ordenados por usuario_id; ni el payload ni
+  la memoria del proceso dependen del tamaño de la audiencia.
+- Difusión: la notificación se guarda una vez con (audiencia_tipo,
+  audiencia_id) y en USUARIO_NOTIFICACION solo quedan los acuses de
+  lectura. La bandeja de cada usuario se resuelve con sus propias
+  membresías (pocas filas), no con la audiencia completa.
+
+Bandeja (Bandeja): UNION de ramas indexadas, sus filas en
+USUARIO_NOTIFICACION y las difusiones de cada tipo de audiencia, cada una
+con su LIMIT antes de unir. Un OR entre un EXISTS correlacionado y los
+predicados de audiencia obligaría a MySQL a recorrer toda NOTIFICACION.
+
+Contador de no leídas: Usuario.notificaciones_no_leidas se mantiene con
+UPDATEs por conjunto al repartir, al leer y al cambiar la pertenencia a
+una audiencia (grupos/signals.py). `recalcular_no_leidas` lo reconstruye.
+"""
+
+from django.core.exceptions import ValidationError
+from django.db import connection, connections, transaction
+from django.db.models import BooleanField, Case, Exists, F, Func, IntegerField, Max, OuterRef, Q, Subquery, Value, When
+from django.db.models.constants import OnConflict
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Usuario, Grupo, Evento, Notificacion, Rol,
+    UsuarioGrupo, ParticipacionUsuario, UsuarioRol, UsuarioNotificacion
+)
+
+TIPOS_AUDIENCIA = ('GRUPO', 'EVENTO', 'ROL')
+
+_REFERENCIAS = {
+    'GRUPO': Grupo,
+    'EVENTO': Evento,
+    'ROL': Rol,
+}
+
+
+def usuarios_audiencia(tipo, id_referencia):
+    """
+    QuerySet de relaciones con `usuario_id` de los usuarios de una audiencia
+    (usar .values('usuario_id') como subconsulta).
+    """
+    if tipo == 'GRUPO':
+        return UsuarioGrupo.objects.filter(grupo_id=id_referencia)
+    if tipo == 'EVENTO':
+        return ParticipacionUsuario.objects.filter(
+            participacion__evento_id=id_referencia,
+            participacion__estado_participacion='CONFIRMADO',
+        )
+    if tipo == 'ROL':
+        return UsuarioRol.objects.filter(rol_id=id_referencia)
+    raise ValidationError(f"Tipo de audiencia inválido: {tipo}")
+
+
+def referencias_de_usuario(tipo, id_usuario):
+    """IDs de grupo/evento/rol por los que el usuario pertenece a audiencias `tipo`."""
+    if tipo == 'GRUPO':
+        return UsuarioGrupo.objects.filter(usuario_id=id_usuario).values('grupo_id')
+    if tipo == 'EVENTO':
+        return ParticipacionUsuario.objects.filter(
+            usuario_id=id_usuario,
+            participacion__estado_participacion='CONFIRMADO',
+        ).values('participacion__evento_id')
+    if tipo == 'ROL':
+        return UsuarioRol.objects.filter(usuario_id=id_usuario).values('rol_id')
+    raise ValidationError(f"Tipo de audiencia inválido: {tipo}")
+
+
+def condicion_difusiones(id_usuario):
+    """Q sobre Notificacion: difusiones cuya audiencia incluye al usuario."""
+    condicion = Q()
+    for tipo in TIPOS_AUDIENCIA:
+        condicion |= Q(
+            audiencia_tipo=tipo,
+            audiencia_id__in=referencias_de_usuario(tipo, id_usuario),
+        )
+    return condicion
+
+
+def condicion_bandeja(id_usuario):
+    """
+    Q sobre Notificacion: notificaciones individuales del usuario más las
+    difusiones cuya audiencia lo incluye (según su pertenencia actual).
+    `id_usuario` puede ser un entero o una expresión (OuterRef).
+    """
+    return Q(Exists(UsuarioNotificacion.objects.filter(
+        notificacion=OuterRef('pk'), usuario_id=id_usuario
+    ))) | condicion_difusiones(id_usuario)
+
+
+class Bandeja:
+    """
+    Bandeja de un usuario: UNION de una rama con sus notificaciones
+    individuales (y acuses de difusiones) y una por tipo de audiencia.
+
+    Ofrece lo que usan KeysetPagination y el Paginator de Django: filter y
+    order_by se aplican a cada rama, y un slice [a:b] pide b filas a cada
+    rama (LIMIT antes de unir, si la base de datos lo permite) y [a:b] del
+    resultado unido. Cada fila trae `leida` anotada.
+    """
+
+    ORDEN = ('-fecha_envio', '-id_notificacion')
+
+    model = Notificacion
+    ordered = True
+
+    def __init__(self, ramas, orden=ORDEN):
+        self._ramas = ramas
+        self._orden = orden
+        # Consulta representativa (orden, anotaciones, firma del SQL)
+        self.query = ramas[0].query
+        self.db = ramas[0].db
+
+    @classmethod
+    def de_usuario(cls, id_usuario):
+        leida = Exists(UsuarioNotificacion.objects.filter(
+            notificacion=OuterRef('pk'), usuario_id=id_usuario, leida=True
+        ))
+        ramas = [Notificacion.objects.filter(usuarios__id_usuario=id_usuario)]
+        ramas += [
+            Notificacion.objects.filter(
+                audiencia_tipo=tipo,
+                audiencia_id__in=referencias_de_usuario(tipo, id_usuario),
+            )
+            for tipo in TIPOS_AUDIENCIA
+        ]
+        return cls([rama.annotate(leida=leida).order_by(*cls.ORDEN) for rama in ramas])
+
+    def filter(self, *args, **kwargs):
+        return Bandeja([rama.filter(*args, **kwargs) for rama in self._ramas], self._orden)
+
+    def order_by(self, *orden):
+        return Bandeja([rama.order_by(*orden) for rama in self._ramas], orden)
+
+    def _union(self, limite=None):
+        if limite is not None and connections[self.db].features.supports_slicing_ordering_in_compound:
+            ramas = [rama[:limite] for rama in self._ramas]
+        else:
+            ramas = [rama.order_by() for rama in self._ramas]
+        return ramas[0].union(*ramas[1:])
+
+    def count(self):
+        return self._union().count()
+
+    def exists(self):
+        return bool(self[:1])
+
+    def get(self, *args, **kwargs):
+        filas = self.filter(*args, **kwargs)[:2]
+        if not filas:
+            raise Notificacion.DoesNotExist("La notificación no está en la bandeja del usuario")
+        if len(filas) > 1:
+            raise Notificacion.MultipleObjectsReturned()
+        return filas[0]
+
+    def __getitem__(self, item):
+        if isinstance(item, int):
+            return self[item:item + 1][0]
+        if item.stop is None:
+            return list(self)[item]
+        return list(self._union(item.stop).order_by(*self._orden)[item])
+
+    def __iter__(self):
+        return iter(self._union().order_by(*self._orden))
+
+    def __len__(self):
+        return self.count()
+
+
+def validar_audiencia(tipo, id_referencia):
+    """Verificar que exista el grupo, evento o rol referenciado."""
+    modelo = _REFERENCIAS.get(tipo)
+    if modelo is None:
+        raise ValidationError(f"Tipo de audiencia inválido: {tipo}")
+    if not modelo.objects.filter(pk=id_referencia).exists():
+        raise ValidationError(
+            f"{str(modelo._meta.verbose_name).capitalize()} {id_referencia} no existe"
+        )
+
+
+def insertar_seleccion(seleccion):
+    """
+    INSERT INTO USUARIO_NOTIFICACION (usuario, notificacion, leida) SELECT ...
+
+    Con la semántica de bulk_create(ignore_conflicts=True) (INSERT IGNORE en
+    MySQL): las filas (usuario, notificacion) que otra transacción insertó
+    entre la selección y el INSERT, p. ej. un doble acuse concurrente, se
+    omiten en lugar de fallar y no se cuentan.
+
+    Args:
+        seleccion (QuerySet): values_list con esas tres columnas en orden
+
+    Returns:
+        int: Filas insertadas
+    """
+    ops = connection.ops
+    tabla = ops.quote_name(UsuarioNotificacion._meta.db_table)
+    campos = [
+        UsuarioNotificacion._meta.get_field(campo)
+        for campo in ('usuario', 'notificacion', 'leida')
+    ]
+    columnas = ', '.join(ops.quote_name(campo.column) for campo in campos)
+    insert = ops.insert_statement(on_conflict=OnConflict.IGNORE)
+    sufijo = ops.on_conflict_suffix_sql(campos, OnConflict.IGNORE, None, None)
+    sql, params = seleccion.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{insert} {tabla} ({columnas}) {sql} {sufijo}".rstrip(), params)
+        return cursor.rowcount
+
+
+def insertar_destinatarios(id_notificacion, tipo, id_referencia, tamano_lote=1000):
+    """
+    Relacionar una notificación con todos los usuarios de la audiencia.
+
+    Cada lote es un INSERT ... SELECT ... ORDER BY usuario_id LIMIT n
+    (más un MAX para continuar) en su propia transacción.
+
+    Returns:
+        int: Filas USUARIO_NOTIFICACION creadas
+    """
+    creadas = 0
+    ultimo = 0
+    while True:
+        seleccion = (
+            usuarios_audiencia(tipo, id_referencia)
+            .filter(usuario_id__gt=ultimo)
+            .annotate(
+                id_notif=Value(id_notificacion, output_field=IntegerField()),
+                no_leida=Value(False, output_field=BooleanField()),
+            )
+            .values_list('usuario_id', 'id_notif', 'no_leida')
+            .distinct()
+            .order_by('usuario_id')[:tamano_lote]
+        )
+        with transaction.atomic():
+            insertadas = insertar_seleccion(seleccion)
+            creadas += insertadas
+            if not insertadas:
+                return creadas
+            hasta = UsuarioNotificacion.objects.filter(
+                notificacion_id=id_notificacion
+            ).aggregate(ultimo=Max('usuario_id'))['ultimo']
+            ajustar_no_leidas(
+                Usuario.objects.filter(id_usuario__in=UsuarioNotificacion.objects.filter(
+                    notificacion_id=id_notificacion, usuario_id__gt=ultimo, usuario_id__lte=hasta
+                ).values('usuario_id')),
+                1
+            )
+            if insertadas < tamano_lote:
+                return creadas
+            ultimo = hasta
+
+
+# ===========================================================================
+# CONTADOR DE NO LEÍDAS
+# ===========================================================================
+
+def ajustar_no_leidas(usuarios, delta):
+    """Sumar `delta` al contador de no leídas de un QuerySet de Usuario."""
+    if delta < 0:
+        # Nunca dejar el contador por debajo de 0 (columna sin signo)
+        return usuarios.update(notificaciones_no_leidas=Case(
+            When(notificaciones_no_leidas__gte=-delta,
+                 then=F('notificaciones_no_leidas') + delta),
+            default=Value(0),
+        ))
+    return usuarios.update(notificaciones_no_leidas=F('notificaciones_no_leidas') + delta)
+
+
+def marcar_leidas(id_usuario, notificaciones):
+    """
+    Marcar como leídas, para un usuario, las notificaciones de su bandeja
+    incluidas en `notificaciones` (QuerySet de Notificacion).
+
+    Un UPDATE para las individuales, un INSERT ... SELECT de acuses para
+    las difusiones y un UPDATE del contador; el número de consultas no
+    depende de cuántas se marquen.
+
+    Returns:
+        int: Notificaciones que pasaron a leídas
+    """
+    marcadas = UsuarioNotificacion.objects.filter(
+        usuario_id=id_usuario,
+        leida=False,
+        notificacion_id__in=notificaciones.values('pk'),
+    ).update(leida=True)
+
+    difusiones = notificaciones.filter(condicion_difusiones(id_usuario)).exclude(
+        Exists(UsuarioNotificacion.objects.filter(
+            notificacion=OuterRef('pk'), usuario_id=id_usuario
+        ))
+    ).annotate(
+        # Solo anotaciones: el SELECT conserva este orden de columnas
+        id_lector=Value(id_usuario, output_field=IntegerField()),
+        id_notif=F('pk'),
+        ya_leida=Value(True, output_field=BooleanField()),
+    ).values_list('id_lector', 'id_notif', 'ya_leida')
+    marcadas += insertar_seleccion(difusiones)
+
+    if marcadas:
+        ajustar_no_leidas(Usuario.objects.filter(id_usuario=id_usuario), -marcadas)
+    return marcadas
+
+
+def no_leidas_de_usuario(id_usuario):
+    """QuerySet de Notificacion en la bandeja del usuario y sin leer."""
+    return Notificacion.objects.filter(condicion_bandeja(id_usuario)).exclude(
+        Exists(UsuarioNotificacion.objects.filter(
+            notificacion=OuterRef('pk'), usuario_id=id_usuario, leida=True
+        ))
+    )
+
+
+def difusiones_no_leidas(id_usuario, tipo, id_referencia):
+    """Difusiones a la audiencia (tipo, id_referencia) que el usuario no ha leído."""
+    return Notificacion.objects.filter(
+        audiencia_tipo=tipo, audiencia_id=id_referencia
+    ).exclude(
+        Exists(UsuarioNotificacion.objects.filter(
+            notificacion=OuterRef('pk'), usuario_id=id_usuario, leida=True
+        ))
+    ).count()
+
+
+def descontar_notificacion(notificacion):
+    """Restar 1 a quienes tenían la notificación sin leer (antes de eliminarla)."""
+    lectores = UsuarioNotificacion.objects.filter(notificacion=notificacion)
+    if notificacion.audiencia_tipo:
+        pendientes = Usuario.objects.filter(
+            id_usuario__in=usuarios_audiencia(
+                notificacion.audiencia_tipo, notificacion.audiencia_id
+            ).values('usuario_id')
+        ).exclude(id_usuario__in=lectores.filter(leida=True).values('usuario_id'))
+    else:
+        pendientes = Usuario.objects.filter(
+            id_usuario__in=lectores.filter(leida=False).values('usuario_id')
+        )
+    ajustar_no_leidas(pendientes, -1)
+
+
+def recalcular_no_leidas():
+    """
+    Reconstruir el contador de todos los usuarios con un solo UPDATE
+    (subconsulta correlacionada sobre la bandeja de cada usuario).
+    """
+    usuario = OuterRef(OuterRef('pk'))
+    pendientes = Notificacion.objects.filter(condicion_bandeja(usuario)).exclude(
+        Exists(UsuarioNotificacion.objects.filter(
+            notificacion=OuterRef('pk'), usuario_id=usuario, leida=True
+        ))
+    )
+    total = pendientes.order_by().annotate(
+        total=Func(F('pk'), function='COUNT')
+    ).values('total')
+    return Usuario.objects.update(
+        notificaciones_no_leidas=Coalesce(Subquery(total), Value(0))
+    )
@@ -1,31 +1,129 @@
 import binascii
 import os
-from django.db import models
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
 from rest_framework import authentication, exceptions
 
 from .models import Usuario
+from .singletons import token_cache
+from .tareas import PoolAcotado
 
 def generate_key():
     return binascii.hexlify(os.urandom(20)).decode()
 
+
+# ===========================================================================
+# HASH DE CONTRASEÑAS
+# ===========================================================================
+
+_pool_hash = None
+_pool_hash_lock = threading.Lock()
+
+
+def ejecutar_hash(func, *args):
+    """
+    Ejecutar un hash de contraseña (check_password / set_password) en el
+    pool acotado AUTH_HASH_HILOS + AUTH_HASH_COLA. Si está lleno lanza
+    tareas.PoolSaturado: una avalancha de logins no ocupa todos los hilos
+    del servidor ni deja sin CPU al resto de endpoints.
+    """
+    global _pool_hash
+    if _pool_hash is None:
+        with _pool_hash_lock:
+            if _pool_hash is None:
+                _pool_hash = PoolAcotado(
+                    'hash',
+                    hilos=settings.AUTH_HASH_HILOS,
+                    cola=settings.AUTH_HASH_COLA,
+                    espera=settings.AUTH_HASH_ESPERA,
+                )
+    return _pool_hash.ejecutar(func, *args)
+
 class UsuarioAuthToken(models.Model):
     """
     Token simple ligado a Usuario (no depende de django.contrib.auth.models.User).
     """
     key = models.CharField(max_length=40, primary_key=True)
     usuario = models.ForeignKey(Usuario, related_name='auth_tokens', on_delete=models.CASCADE)
-    created = models.DateTimeField(auto_now_add=True)
+    created = models.DateTimeField(auto_now_add=True, db_index=True)
+    # Expiración deslizante: se renueva con el uso (ver AUTH_TOKEN_RENOVAR)
+    ultimo_uso = models.DateTimeField(default=timezone.now, db_index=True)
+    # Identificador del cliente (navegador/app) para reutilizar su token
+    dispositivo = models.CharField(max_length=100, blank=True, default='')
 
     class Meta:
         db_table = 'USUARIO_AUTHTOKEN'
+        indexes = [
+            models.Index(fields=['usuario', 'dispositivo'], name='token_usuario_disp_idx'),
+        ]
 
     def __str__(self):
         return f"Token for {self.usuario.correo_usuario}"
 
     @classmethod
-    def create(cls, usuario):
+    def create(cls, usuario, dispositivo=''):
         key = generate_key()
-        return cls.objects.create(key=key, usuario=usuario)
+        return cls.objects.create(key=key, usuario=usuario, dispositivo=dispositivo)
+
+    @classmethod
+    def obtener_o_crear(cls, usuario, dispositivo=''):
+        """
+        Token vigente del usuario para `dispositivo` (si AUTH_TOKEN_REUSAR),
+        o uno nuevo. Así iniciar sesión repetidamente no acumula tokens.
+        """
+        if settings.AUTH_TOKEN_REUSAR:
+            vigentes = cls.objects.filter(usuario=usuario, dispositivo=dispositivo)
+            limite = limite_vigencia()
+            if limite is not None:
+                vigentes = vigentes.filter(ultimo_uso__gte=limite)
+            token = vigentes.order_by('-ultimo_uso').first()
+            if token is not None:
+                return token
+        return cls.create(usuario, dispositivo)
+
+    def esta_vencido(self, ahora=None):
+        expiracion = settings.AUTH_TOKEN_EXPIRACION
+        if expiracion is None:
+            return False
+        return self.ultimo_uso < (ahora or timezone.now()) - timedelta(seconds=expiracion)
+
+
+def limite_vigencia(ahora=None):
+    """Fecha de último uso mínima de un token vigente (None: no expiran)."""
+    if settings.AUTH_TOKEN_EXPIRACION is None:
+        return None
+    return (ahora or timezone.now()) - timedelta(seconds=settings.AUTH_TOKEN_EXPIRACION)
+
+
+def purgar_tokens_vencidos(tamano_lote=500, pausa=0.0, ahora=None):
+    """
+    Eliminar tokens sin uso dentro del plazo de expiración, de a
+    `tamano_lote` por transacción (recorriendo el índice de ultimo_uso)
+    para no bloquear la tabla.
+
+    Returns:
+        int: Tokens eliminados
+    """
+    limite = limite_vigencia(ahora)
+    if limite is None:
+        return 0
+    vencidos = UsuarioAuthToken.objects.filter(ultimo_uso__lt=limite).order_by('ultimo_uso')
+    total = 0
+    while True:
+        with transaction.atomic():
+            keys = list(vencidos.values_list('key', flat=True)[:tamano_lote])
+            if not keys:
+                return total
+            # delete() del QuerySet dispara post_delete (invalida el cache)
+            UsuarioAuthToken.objects.filter(key__in=keys).delete()
+        total += len(keys)
+        if pausa:
+            time.sleep(pausa)
 
 
 class UsuarioTokenAuthentication(authentication.BaseAuthentication):
@@ -55,15 +153,42 @@ class UsuarioTokenAuthentication(authentication.BaseAuthentication):
         return self.authenticate_credentials(token)
 
     def authenticate_credentials(self, key):
-        try:
-            token = UsuarioAuthToken.objects.select_related('usuario').get(key=key)
-        except UsuarioAuthToken.DoesNotExist:
-            raise exceptions.AuthenticationFailed('Token inválido.')
-
-        usuario = token.usuario
-        if usuario.estado_usuario != 'ACTIVO':
-            raise exceptions.AuthenticationFailed('Usuario inactivo.')
-
+        # Cache en memoria/compartido: las peticiones habituales no tocan la BD
+        cacheado = token_cache.get_token(key)
+        carga = None
+        if cacheado is not None:
+            usuario, token = cacheado
+        else:
+            revocacion = token_cache.revocacion(key)
+            inicio = time.perf_counter()
+            try:
+                token = UsuarioAuthToken.objects.select_related('usuario').get(key=key)
+            except UsuarioAuthToken.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Token inválido.')
+
+            usuario = token.usuario
+            if usuario.estado_usuario != 'ACTIVO':
+                raise exceptions.AuthenticationFailed('Usuario inactivo.')
+            carga = time.perf_counter() - inicio
+
+        ahora = timezone.now()
+        if token.esta_vencido(ahora):
+            token_cache.invalidate_token(key)
+            raise exceptions.AuthenticationFailed('Token expirado.')
+
+        # Expiración deslizante: renovar ultimo_uso como mucho una vez por
+        # AUTH_TOKEN_RENOVAR segundos (UPDATE condicional, sin carrera)
+        if token.ultimo_uso < ahora - timedelta(seconds=settings.AUTH_TOKEN_RENOVAR):
+            UsuarioAuthToken.objects.filter(
+                key=key, ultimo_uso__lt=ahora
+            ).update(ultimo_uso=ahora)
+            token.ultimo_uso = ahora
+            if cacheado is not None:
+                revocacion = token_cache.revocacion(key)
+                cacheado = None
+
+        if cacheado is None:
+            token_cache.set_token(key, usuario, token, carga, revocacion)
         # devolver (usuario, token)
         return (usuario, token)
 
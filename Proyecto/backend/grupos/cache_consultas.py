@@ -0,0 +1,168 @@
+"""
+Cache de resultados de QuerySets - ÁgoraUN
+
+Cache opcional (opt-in) para listados muy repetidos, p. ej. el tráfico
+anónimo de GET /grupos/ y /eventos/ con los mismos filtros:
+
+    Grupo.objects.filter(...).cacheado()
+
+- La clave es el SQL normalizado + parámetros + la generación actual de
+  cada tabla que aparece en la consulta.
+- Cada tabla versionada (TABLAS_VERSIONADAS) tiene un contador de
+  generación en el cache compartido. Cualquier escritura la cambia:
+  save/delete por signals (grupos/signals.py) y update/bulk_create/
+  bulk_update por QuerySetVersionado (manager de esos modelos). Al
+  cambiar la generación las entradas anteriores dejan de consultarse y
+  vencen solas.
+- Nunca se devuelven datos viejos tras un COMMIT: la generación se cambia
+  al confirmar la transacción, y dentro de una transacción que escribió
+  una tabla sus consultas van directo a la BD.
+- Solo se cachean consultas cuyas tablas son todas versionadas; el resto
+  (o con select_for_update) se ejecuta normalmente.
+
+Las generaciones viven en el cache compartido de versiones
+(CACHE_VERSIONES_ALIAS, nunca se expulsan); los resultados, en
+QUERYSET_CACHE_ALIAS (por defecto el cache local del proceso): una entrada
+local solo se usa si su generación sigue vigente.
+
+Configuración (settings): QUERYSET_CACHE_ACTIVO, QUERYSET_CACHE_TTL,
+QUERYSET_CACHE_ALIAS.
+"""
+
+import functools
+import hashlib
+import re
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import EmptyResultSet
+from django.db import connections, models, transaction
+
+TABLAS_VERSIONADAS = frozenset({
+    'GRUPO', 'EVENTO', 'CUPO_FRAGMENTO', 'USUARIO_GRUPO', 'PARTICIPACION_USUARIO',
+})
+
+_PREFIJO_GENERACION = "qgen_"
+_PREFIJO_RESULTADO = "qres_"
+_IDENTIFICADOR = re.compile(r'["`]([^"`]+)["`]')
+
+
+@functools.lru_cache(maxsize=None)
+def _tablas_de_app():
+    return frozenset(modelo._meta.db_table for modelo in apps.get_models())
+
+
+def tablas_consulta(sql):
+    """Tablas de modelos mencionadas en el SQL (FROM, JOIN y subconsultas)."""
+    return set(_IDENTIFICADOR.findall(sql)) & _tablas_de_app()
+
+
+def _pendientes(using):
+    """Tablas escritas en la transacción abierta de la conexión `using`."""
+    conexion = connections[using]
+    if not conexion.in_atomic_block:
+        conexion._tablas_pendientes = set()
+    elif not hasattr(conexion, '_tablas_pendientes'):
+        conexion._tablas_pendientes = set()
+    return conexion._tablas_pendientes
+
+
+def incrementar_generacion(tabla, using='default'):
+    """Marcar `tabla` como modificada; la generación cambia al confirmar."""
+    if tabla not in TABLAS_VERSIONADAS:
+        return
+    pendientes = _pendientes(using)
+    pendientes.add(tabla)
+
+    def _confirmar():
+        pendientes.discard(tabla)
+        caches[settings.CACHE_VERSIONES_ALIAS].set(
+            f"{_PREFIJO_GENERACION}{tabla}", uuid.uuid4().hex, None
+        )
+
+    transaction.on_commit(_confirmar, using=using)
+
+
+def generaciones(tablas):
+    """Generación actual de cada tabla (se inicializa al primer uso)."""
+    versiones = caches[settings.CACHE_VERSIONES_ALIAS]
+    claves = {f"{_PREFIJO_GENERACION}{tabla}": tabla for tabla in tablas}
+    actuales = versiones.get_many(claves)
+    for clave in set(claves) - set(actuales):
+        versiones.add(clave, uuid.uuid4().hex, None)
+        actuales[clave] = versiones.get(clave)
+    return {claves[clave]: valor for clave, valor in actuales.items()}
+
+
+def clave_resultado(queryset):
+    """
+    Clave del resultado de `queryset`, o None si no se puede cachear
+    (tablas no versionadas, select_for_update o escrituras pendientes).
+    """
+    if queryset.query.select_for_update:
+        return None
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return None
+    tablas = tablas_consulta(sql)
+    if not tablas or not tablas <= TABLAS_VERSIONADAS or tablas & _pendientes(queryset.db):
+        return None
+    version = generaciones(sorted(tablas))
+    firma = repr((queryset.db, ' '.join(sql.split()), params, sorted(version.items())))
+    return f"{_PREFIJO_RESULTADO}{hashlib.sha256(firma.encode()).hexdigest()}"
+
+
+class QuerySetVersionado(models.QuerySet):
+    """
+    QuerySet de los modelos de TABLAS_VERSIONADAS: las escrituras masivas
+    cambian la generación de la tabla y `cacheado()` activa el cache.
+    """
+
+    _cache_ttl = None
+
+    def cacheado(self, ttl=None):
+        """Servir el resultado desde el cache (ver módulo)."""
+        clon = self._chain()
+        if settings.QUERYSET_CACHE_ACTIVO:
+            clon._cache_ttl = ttl if ttl is not None else settings.QUERYSET_CACHE_TTL
+        return clon
+
+    def _clone(self):
+        clon = super()._clone()
+        clon._cache_ttl = self._cache_ttl
+        return clon
+
+    def _fetch_all(self):
+        if self._result_cache is None and self._cache_ttl is not None:
+            clave = clave_resultado(self)
+            if clave is not None:
+                resultados = caches[settings.QUERYSET_CACHE_ALIAS]
+                resultado = resultados.get(clave)
+                if resultado is None:
+                    resultado = list(self._iterable_class(self))
+                    resultados.set(clave, resultado, self._cache_ttl)
+                self._result_cache = resultado
+        super()._fetch_all()
+
+    def _versionar(self):
+        incrementar_generacion(self.model._meta.db_table, using=self.db)
+
+    def update(self, **kwargs):
+        filas = super().update(**kwargs)
+        if filas:
+            self._versionar()
+        return filas
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        creados = super().bulk_create(objs, *args, **kwargs)
+        if creados:
+            self._versionar()
+        return creados
+
+    # bulk_update usa update() internamente; delete() siempre envía
+    # post_delete porque grupos/signals.py escucha estos modelos.
@@ -0,0 +1,252 @@
+"""
+Asignación de cupos - ÁgoraUN
+
+Motor de reserva de cupos para eventos sin bloquear la fila del Evento
+durante toda la inscripción:
+
+- Cada reserva es un único UPDATE condicional sobre un contador mantenido
+  (`cupo >= cupos_ocupados + n`); si no afecta filas, no hay cupo. La base
+  de datos garantiza que nunca se sobrevenda.
+- Para eventos muy concurridos el contador se puede fragmentar
+  (CupoFragmento): la capacidad restante se reparte entre N filas y cada
+  reserva actualiza una de ellas al azar, así las inscripciones simultáneas
+  no compiten por la misma fila.
+- `reintentar_transaccion` repite la operación completa ante deadlocks o
+  fallos de serialización.
+
+Cupos ocupados de un evento = Evento.cupos_ocupados + Σ fragmentos.ocupados
+(`con_cupos_ocupados` calcula la suma de fragmentos para toda una página).
+"""
+
+import functools
+import logging
+import random
+import time
+
+from django.db import OperationalError, transaction
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Evento, CupoFragmento
+
+logger = logging.getLogger(__name__)
+
+# Códigos de error reintentables: MySQL (deadlock, lock wait timeout)
+# y PostgreSQL (serialization_failure, deadlock_detected)
+ERRORES_REINTENTABLES = {1213, 1205, '40001', '40P01'}
+
+
+def _es_reintentable(exc):
+    causa = exc.__cause__ or exc
+    codigo = getattr(causa, 'pgcode', None)
+    if codigo is None and getattr(causa, 'args', None):
+        codigo = causa.args[0]
+    return codigo in ERRORES_REINTENTABLES
+
+
+def reintentar_transaccion(intentos=3, espera=0.05):
+    """
+    Decorador: ejecuta la función en una transacción y la reintenta si la
+    base de datos aborta por deadlock o fallo de serialización.
+    Debe ser la transacción más externa (no usar dentro de otro atomic).
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def envoltura(*args, **kwargs):
+            for intento in range(1, intentos + 1):
+                try:
+                    with transaction.atomic():
+                        return func(*args, **kwargs)
+                except OperationalError as exc:
+                    if intento == intentos or not _es_reintentable(exc):
+                        raise
+                    logger.warning("Reintentando %s (%s/%s): %s", func.__name__, intento, intentos, exc)
+                    time.sleep(espera * intento * random.uniform(0.5, 1.5))
+            return None
+        return envoltura
+    return decorador
+
+
+def reservar_cupo(evento, cantidad=1):
+    """
+    Reservar `cantidad` cupos de un evento con UPDATE condicional.
+
+    `evento.num_fragmentos` puede venir de una lectura sin bloqueo: si
+    fragmentar_cupos cambió el modo entretanto, el UPDATE no afecta filas
+    (la condición incluye el modo), se relee num_fragmentos y se reintenta
+    por el camino correcto.
+
+    Args:
+        evento (Evento): Evento (solo se usan id_evento y num_fragmentos)
+        cantidad (int): Cupos a reservar
+
+    Returns:
+        bool: True si se reservaron todos; False si no hay cupo suficiente
+    """
+    if _reservar(evento, cantidad):
+        return True
+    actual = Evento.objects.filter(id_evento=evento.id_evento).values_list(
+        'num_fragmentos', flat=True
+    ).first()
+    if actual is None or actual == evento.num_fragmentos:
+        return False
+    evento.num_fragmentos = actual
+    return _reservar(evento, cantidad)
+
+
+def _reservar(evento, cantidad):
+    if evento.num_fragmentos == 0:
+        # num_fragmentos=0: con fragmentos, la fila del Evento conserva el
+        # cupo y los ocupados anteriores y sobrevendería
+        return bool(
+            Evento.objects.filter(
+                id_evento=evento.id_evento,
+                num_fragmentos=0,
+                cupo__gte=F('cupos_ocupados') + cantidad,
+            ).update(cupos_ocupados=F('cupos_ocupados') + cantidad)
+        )
+
+    # Contador fragmentado: probar los fragmentos empezando por uno al azar
+    inicio = random.randrange(evento.num_fragmentos)
+    for paso in range(evento.num_fragmentos):
+        indice = (inicio + paso) % evento.num_fragmentos
+        if CupoFragmento.objects.filter(
+            evento_id=evento.id_evento,
+            indice=indice,
+            capacidad__gte=F('ocupados') + cantidad,
+        ).update(ocupados=F('ocupados') + cantidad):
+            return True
+    return False
+
+
+def reservar_hasta(evento, cantidad, intentos=3):
+    """
+    Reservar hasta `cantidad` cupos (lo que quede libre si no alcanzan).
+
+    Returns:
+        int: Cupos efectivamente reservados (0..cantidad)
+    """
+    if cantidad <= 0:
+        return 0
+    if reservar_cupo(evento, cantidad):
+        return cantidad
+
+    reservados = 0
+    for _ in range(intentos):
+        pendientes = cantidad - reservados
+        if evento.num_fragmentos == 0:
+            libres = Evento.objects.filter(id_evento=evento.id_evento).values_list(
+                F('cupo') - F('cupos_ocupados'), flat=True
+            ).first() or 0
+            tomar = min(pendientes, libres)
+            if tomar <= 0:
+                break
+            if reservar_cupo(evento, tomar):
+                reservados += tomar
+                break  # se tomó todo lo libre
+        else:
+            fragmentos = CupoFragmento.objects.filter(
+                evento_id=evento.id_evento, capacidad__gt=F('ocupados')
+            ).values_list('indice', 'capacidad', 'ocupados')
+            if not fragmentos:
+                break
+            for indice, capacidad, ocupados in fragmentos:
+                tomar = min(cantidad - reservados, capacidad - ocupados)
+                if tomar > 0 and CupoFragmento.objects.filter(
+                    evento_id=evento.id_evento,
+                    indice=indice,
+                    capacidad__gte=F('ocupados') + tomar,
+                ).update(ocupados=F('ocupados') + tomar):
+                    reservados += tomar
+        if reservados == cantidad:
+            break
+    return reservados
+
+
+def liberar_cupo(id_evento, cantidad=1):
+    """
+    Devolver `cantidad` cupos (participación cancelada o eliminada).
+
+    Con fragmentos, el cupo siempre vuelve a un fragmento: reservar_cupo
+    solo mira los fragmentos, así que un cupo devuelto a la fila del Evento
+    no se podría volver a reservar.
+    """
+    num_fragmentos = Evento.objects.filter(id_evento=id_evento).values_list(
+        'num_fragmentos', flat=True
+    ).first()
+    if num_fragmentos is None:
+        return
+    for _ in range(cantidad):
+        if not num_fragmentos:
+            Evento.objects.filter(
+                id_evento=id_evento, cupos_ocupados__gt=0
+            ).update(cupos_ocupados=F('cupos_ocupados') - 1)
+            continue
+        fragmento = CupoFragmento.objects.filter(
+            evento_id=id_evento, ocupados__gt=0
+        ).values_list('pk', flat=True).first()
+        if fragmento is not None and CupoFragmento.objects.filter(
+            pk=fragmento, ocupados__gt=0
+        ).update(ocupados=F('ocupados') - 1):
+            continue
+        # El cupo se ocupó antes de fragmentar (cuenta en la fila del Evento):
+        # pasarlo como capacidad nueva a un fragmento
+        if Evento.objects.filter(
+            id_evento=id_evento, cupos_ocupados__gt=0
+        ).update(cupos_ocupados=F('cupos_ocupados') - 1):
+            CupoFragmento.objects.filter(
+                evento_id=id_evento, indice=random.randrange(num_fragmentos)
+            ).update(capacidad=F('capacidad') + 1)
+
+
+def con_cupos_ocupados(queryset):
+    """
+    Anotar en un QuerySet de Evento la suma de sus fragmentos
+    (`cupos_fragmentos`) con una subconsulta, para que los listados no
+    hagan una consulta por evento fragmentado.
+    """
+    fragmentos = CupoFragmento.objects.filter(
+        evento=OuterRef('pk')
+    ).order_by().values('evento').annotate(total=Sum('ocupados')).values('total')
+    return queryset.annotate(
+        cupos_fragmentos=Coalesce(Subquery(fragmentos), 0, output_field=IntegerField())
+    )
+
+
+def cupos_ocupados(evento):
+    """Total de cupos ocupados (contador del evento + fragmentos)."""
+    total = evento.cupos_ocupados
+    anotado = getattr(evento, 'cupos_fragmentos', None)
+    if anotado is not None:
+        total += anotado
+    elif evento.num_fragmentos:
+        total += CupoFragmento.objects.filter(evento_id=evento.id_evento).aggregate(
+            total=Sum('ocupados')
+        )['total'] or 0
+    return total
+
+
+@transaction.atomic
+def fragmentar_cupos(id_evento, num_fragmentos):
+    """
+    (Re)distribuir los cupos libres de un evento en `num_fragmentos`
+    contadores. Con 0 vuelve al contador único en la fila del Evento.
+    También se usa para redistribuir cuando cambia el cupo.
+    """
+    evento = Evento.objects.select_for_update().get(id_evento=id_evento)
+    fragmentos = list(CupoFragmento.objects.select_for_update().filter(evento=evento))
+    ocupados = evento.cupos_ocupados + sum(f.ocupados for f in fragmentos)
+    CupoFragmento.objects.filter(evento=evento).delete()
+
+    evento.cupos_ocupados = ocupados
+    evento.num_fragmentos = num_fragmentos
+    evento.save(update_fields=['cupos_ocupados', 'num_fragmentos'])
+
+    if num_fragmentos:
+        libres = max(0, evento.cupo - ocupados)
+        base, resto = divmod(libres, num_fragmentos)
+        CupoFragmento.objects.bulk_create([
+            CupoFragmento(evento=evento, indice=i, capacidad=base + (1 if i < resto else 0))
+            for i in range(num_fragmentos)
+        ])
+    return evento
@@ -0,0 +1,28 @@
+"""
+Comando: python manage.py compactar_notificaciones
+
+Aplica la retención de notificaciones (settings.NOTIFICACIONES_RETENCION):
+borra lecturas vencidas, difusiones vencidas y notificaciones que ya no
+tienen destinatarios. Pensado para ejecutarse periódicamente (cron).
+"""
+
+from django.core.management.base import BaseCommand
+
+from grupos.retencion import compactar
+
+
+class Command(BaseCommand):
+    help = "Elimina por lotes las notificaciones vencidas según su tipo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500,
+                            help="Filas por DELETE")
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help="Segundos de espera entre lotes")
+
+    def handle(self, *args, **options):
+        borradas = compactar(tamano_lote=options['lote'], pausa=options['pausa'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Lecturas: {borradas['lecturas']}, difusiones: {borradas['difusiones']}, "
+            f"sin destinatarios: {borradas['huerfanas']}"
+        ))
@@ -0,0 +1,32 @@
+"""
+Comando: python manage.py fragmentar_cupos <id_evento> <fragmentos>
+
+Reparte los cupos libres de un evento muy concurrido en varios contadores
+(CUPO_FRAGMENTO) para que las inscripciones simultáneas no compitan por la
+misma fila. Con 0 fragmentos vuelve al contador único del evento.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from grupos.cupos import cupos_ocupados, fragmentar_cupos
+from grupos.models import Evento
+
+
+class Command(BaseCommand):
+    help = "Fragmenta (o unifica con 0) el contador de cupos de un evento"
+
+    def add_arguments(self, parser):
+        parser.add_argument('id_evento', type=int)
+        parser.add_argument('fragmentos', type=int)
+
+    def handle(self, *args, **options):
+        if options['fragmentos'] < 0:
+            raise CommandError("El número de fragmentos no puede ser negativo")
+        try:
+            evento = fragmentar_cupos(options['id_evento'], options['fragmentos'])
+        except Evento.DoesNotExist as exc:
+            raise CommandError("El evento no existe") from exc
+        self.stdout.write(self.style.SUCCESS(
+            f"Evento {evento.id_evento}: {evento.num_fragmentos} fragmentos, "
+            f"{cupos_ocupados(evento)}/{evento.cupo} cupos ocupados"
+        ))
@@ -0,0 +1,24 @@
+"""
+Comando: python manage.py purgar_tokens
+
+Elimina los tokens de autenticación sin uso dentro del plazo de
+settings.AUTH_TOKEN_EXPIRACION. Pensado para ejecutarse periódicamente (cron).
+"""
+
+from django.core.management.base import BaseCommand
+
+from grupos.auth import purgar_tokens_vencidos
+
+
+class Command(BaseCommand):
+    help = "Elimina por lotes los tokens de autenticación vencidos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500,
+                            help="Tokens por DELETE")
+        parser.add_argument('--pausa', type=float, default=0.1,
+                            help="Segundos de espera entre lotes")
+
+    def handle(self, *args, **options):
+        borrados = purgar_tokens_vencidos(tamano_lote=options['lote'], pausa=options['pausa'])
+        self.stdout.write(self.style.SUCCESS(f"Tokens eliminados: {borrados}"))
@@ -0,0 +1,21 @@
+"""
+Comando: python manage.py recalcular_contadores
+
+Reconstruye los contadores denormalizados de Grupo
+(total_miembros, total_eventos) a partir de las tablas de relación.
+Útil tras cargas masivas o si se sospecha desincronización.
+"""
+
+from django.core.management.base import BaseCommand
+
+from grupos.services import GrupoService
+
+
+class Command(BaseCommand):
+    help = "Recalcula total_miembros y total_eventos de todos los grupos"
+
+    def handle(self, *args, **options):
+        actualizados = GrupoService.recalcular_contadores()
+        self.stdout.write(self.style.SUCCESS(
+            f"Contadores recalculados para {actualizados} grupos"
+        ))
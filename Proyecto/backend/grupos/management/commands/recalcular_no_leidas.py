@@ -0,0 +1,21 @@
+"""
+Comando: python manage.py recalcular_no_leidas
+
+Reconstruye Usuario.notificaciones_no_leidas a partir de la bandeja real
+de cada usuario (notificaciones individuales y difusiones). Útil tras
+cargas masivas o si se sospecha desincronización del badge.
+"""
+
+from django.core.management.base import BaseCommand
+
+from grupos.audiencias import recalcular_no_leidas
+
+
+class Command(BaseCommand):
+    help = "Recalcula el contador de notificaciones no leídas de todos los usuarios"
+
+    def handle(self, *args, **options):
+        actualizados = recalcular_no_leidas()
+        self.stdout.write(self.style.SUCCESS(
+            f"Contador de no leídas recalculado para {actualizados} usuarios"
+        ))
@@ -0,0 +1,25 @@
+"""
+Comando: python manage.py reindexar_grupos
+
+Reconstruye el índice invertido de búsqueda de grupos (GRUPO_TERMINO)
+y los conteos por faceta (GRUPO_FACETA). Normalmente ambos se mantienen
+solos al guardar cada Grupo; usar tras cargas masivas o cambios en la
+normalización de grupos/search.py.
+"""
+
+from django.core.management.base import BaseCommand
+
+from grupos.search import reindexar_todos, recalcular_facetas
+
+
+class Command(BaseCommand):
+    help = "Reconstruye el índice de búsqueda y las facetas de grupos"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500,
+                            help="Términos por bulk insert")
+
+    def handle(self, *args, **options):
+        total = reindexar_todos(tamano_lote=options['lote'])
+        recalcular_facetas()
+        self.stdout.write(self.style.SUCCESS(f"{total} grupos indexados"))
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_contadores(apps, schema_editor):
+    Grupo = apps.get_model('grupos', 'Grupo')
+    UsuarioGrupo = apps.get_model('grupos', 'UsuarioGrupo')
+    Evento = apps.get_model('grupos', 'Evento')
+
+    def conteo(model):
+        subconsulta = (
+            model.objects.filter(grupo=OuterRef('pk'))
+            .order_by()
+            .values('grupo')
+            .annotate(total=Count('*'))
+            .values('total')
+        )
+        return Coalesce(Subquery(subconsulta), Value(0))
+
+    Grupo.objects.update(
+        total_miembros=conteo(UsuarioGrupo),
+        total_eventos=conteo(Evento),
+    )
+
+
+class Migration(migrations.Migration):
+
+    # Depende de ambas 0002 (también las fusiona)
+    dependencies = [
+        ('grupos', '0002_alter_grupo_fecha_creacion'),
+        ('grupos', '0002_grupo_creado_por_grupo_estado_grupo_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='grupo',
+            name='total_miembros',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='grupo',
+            name='total_eventos',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_contadores, migrations.RunPython.noop),
+    ]
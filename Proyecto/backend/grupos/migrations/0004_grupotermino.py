@@ -0,0 +1,97 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:27
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copia congelada del tokenizador de grupos/search.py tal como estaba al
+# crear esta migración: la migración no debe cambiar si search.py cambia.
+CAMPOS_INDEXADOS = (
+    ('nombre_grupo', 5),
+    ('tipo_grupo', 3),
+    ('area_interes', 3),
+    ('descripcion', 1),
+)
+PESO_MAXIMO = 100
+LONGITUD_TERMINO = 40
+
+STOPWORDS = frozenset("""
+    a al algo ante como con contra cual cuando de del desde donde e el ella ellos
+    en entre era es esa ese eso esta este esto fue ha hay la las le les lo los mas
+    me mi muy ni no nos o otra otro para pero por que quien se sin sobre su sus
+    tambien te tu un una uno unos unas y ya
+""".split())
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def quitar_tildes(texto):
+    descompuesto = unicodedata.normalize('NFD', texto)
+    return ''.join(c for c in descompuesto if unicodedata.category(c) != 'Mn')
+
+
+def raiz(palabra):
+    if len(palabra) <= 4:
+        return palabra
+    if palabra.endswith('ces'):
+        palabra = palabra[:-3] + 'z'
+    elif palabra.endswith('es') and palabra[-3] not in 'aeiou':
+        palabra = palabra[:-2]
+    elif palabra.endswith('s'):
+        palabra = palabra[:-1]
+    if len(palabra) > 4 and palabra[-1] in 'aeo':
+        palabra = palabra[:-1]
+    return palabra
+
+
+def tokenizar(texto):
+    palabras = _TOKEN.findall(quitar_tildes(texto or '').lower())
+    return [raiz(p)[:LONGITUD_TERMINO] for p in palabras if p not in STOPWORDS]
+
+
+def extraer_terminos(grupo):
+    pesos = {}
+    for campo, peso in CAMPOS_INDEXADOS:
+        for termino in tokenizar(getattr(grupo, campo, '')):
+            pesos[termino] = min(PESO_MAXIMO, pesos.get(termino, 0) + peso)
+    return pesos
+
+
+def indexar_grupos_existentes(apps, schema_editor):
+    Grupo = apps.get_model('grupos', 'Grupo')
+    GrupoTermino = apps.get_model('grupos', 'GrupoTermino')
+    GrupoTermino.objects.bulk_create(
+        [
+            GrupoTermino(termino=termino, grupo_id=grupo.id_grupo, peso=peso)
+            for grupo in Grupo.objects.iterator()
+            for termino, peso in extraer_terminos(grupo).items()
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0003_grupo_contadores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GrupoTermino',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=40)),
+                ('peso', models.PositiveSmallIntegerField(default=1)),
+                ('grupo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos', to='grupos.grupo')),
+            ],
+            options={
+                'db_table': 'GRUPO_TERMINO',
+                'unique_together': {('termino', 'grupo')},
+            },
+        ),
+        migrations.RunPython(indexar_grupos_existentes, migrations.RunPython.noop),
+    ]
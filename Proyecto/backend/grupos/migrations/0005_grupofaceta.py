@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:28
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def poblar_facetas(apps, schema_editor):
+    Grupo = apps.get_model('grupos', 'Grupo')
+    GrupoFaceta = apps.get_model('grupos', 'GrupoFaceta')
+    GrupoFaceta.objects.bulk_create([
+        GrupoFaceta(campo=campo, valor=fila[campo], total=fila['total'])
+        for campo in ('area_interes', 'tipo_grupo', 'estado_grupo')
+        for fila in Grupo.objects.order_by().values(campo).annotate(total=Count('id_grupo'))
+        if fila[campo]
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0004_grupotermino'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GrupoFaceta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campo', models.CharField(max_length=20)),
+                ('valor', models.CharField(max_length=40)),
+                ('total', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'GRUPO_FACETA',
+                'unique_together': {('campo', 'valor')},
+            },
+        ),
+        migrations.RunPython(poblar_facetas, migrations.RunPython.noop),
+    ]
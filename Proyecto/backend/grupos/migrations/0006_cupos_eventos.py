@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_cupos_ocupados(apps, schema_editor):
+    Evento = apps.get_model('grupos', 'Evento')
+    ParticipacionUsuario = apps.get_model('grupos', 'ParticipacionUsuario')
+    ocupados = (
+        ParticipacionUsuario.objects.filter(participacion__evento=OuterRef('pk'))
+        .exclude(participacion__estado_participacion='CANCELADO')
+        .order_by()
+        .values('participacion__evento')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    Evento.objects.update(cupos_ocupados=Coalesce(Subquery(ocupados), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0005_grupofaceta'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='cupos_ocupados',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='num_fragmentos',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='CupoFragmento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField()),
+                ('capacidad', models.PositiveIntegerField(default=0)),
+                ('ocupados', models.PositiveIntegerField(default=0)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fragmentos', to='grupos.evento')),
+            ],
+            options={
+                'db_table': 'CUPO_FRAGMENTO',
+                'unique_together': {('evento', 'indice')},
+            },
+        ),
+        migrations.RunPython(poblar_cupos_ocupados, migrations.RunPython.noop),
+    ]
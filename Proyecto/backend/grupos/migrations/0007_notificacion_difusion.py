@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0006_cupos_eventos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='audiencia_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notificacion',
+            name='audiencia_tipo',
+            field=models.CharField(blank=True, choices=[('GRUPO', 'Miembros de grupo'), ('EVENTO', 'Participantes de evento'), ('ROL', 'Usuarios con rol')], default='', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['audiencia_tipo', 'audiencia_id'], name='notif_audiencia_idx'),
+        ),
+    ]
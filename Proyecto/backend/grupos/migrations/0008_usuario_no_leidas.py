@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:39
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def poblar_no_leidas(apps, schema_editor):
+    # Solo notificaciones individuales; las difusiones (0007) las cubre
+    # `python manage.py recalcular_no_leidas`
+    Usuario = apps.get_model('grupos', 'Usuario')
+    UsuarioNotificacion = apps.get_model('grupos', 'UsuarioNotificacion')
+    subconsulta = (
+        UsuarioNotificacion.objects.filter(usuario=OuterRef('pk'), leida=False)
+        .order_by()
+        .values('usuario')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    Usuario.objects.update(
+        notificaciones_no_leidas=Coalesce(Subquery(subconsulta), Value(0))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0007_notificacion_difusion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='notificaciones_no_leidas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(poblar_no_leidas, migrations.RunPython.noop),
+    ]
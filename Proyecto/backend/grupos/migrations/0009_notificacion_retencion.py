@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0008_usuario_no_leidas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['fecha_envio'], name='notif_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificacion',
+            index=models.Index(fields=['tipo_notificacion', 'fecha_envio'], name='notif_tipo_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:47
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0009_notificacion_retencion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuarioauthtoken',
+            name='dispositivo',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='usuarioauthtoken',
+            name='ultimo_uso',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='usuarioauthtoken',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+        migrations.AddIndex(
+            model_name='usuarioauthtoken',
+            index=models.Index(fields=['usuario', 'dispositivo'], name='token_usuario_disp_idx'),
+        ),
+    ]
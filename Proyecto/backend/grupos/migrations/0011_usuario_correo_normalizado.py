@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:02
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower, Trim
+
+
+def poblar_correo_normalizado(apps, schema_editor):
+    Usuario = apps.get_model('grupos', 'Usuario')
+    # Correos que solo difieren en mayúsculas o espacios violarían el índice
+    # único: abortar antes de tocar datos para que se resuelvan a mano
+    duplicados = list(
+        Usuario.objects.annotate(normalizado=Lower(Trim('correo_usuario')))
+        .values('normalizado')
+        .annotate(total=Count('pk'))
+        .filter(total__gt=1)
+        .values_list('normalizado', flat=True)
+        .order_by('normalizado')
+    )
+    if duplicados:
+        conflictos = [
+            f"{correo}: " + ", ".join(
+                f"id={pk} {original!r}"
+                for pk, original in Usuario.objects.annotate(
+                    normalizado=Lower(Trim('correo_usuario'))
+                ).filter(normalizado=correo).order_by('pk').values_list('pk', 'correo_usuario')
+            )
+            for correo in duplicados
+        ]
+        raise RuntimeError(
+            "No se puede crear el índice único de correo_normalizado: hay usuarios "
+            "cuyo correo solo difiere en mayúsculas o espacios. Unifique o "
+            "corrija estas cuentas y vuelva a migrar:\n  " + "\n  ".join(conflictos)
+        )
+    Usuario.objects.update(correo_normalizado=Lower(Trim('correo_usuario')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0010_token_ciclo_vida'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usuario',
+            name='correo_normalizado',
+            field=models.CharField(editable=False, max_length=128, null=True),
+        ),
+        migrations.RunPython(poblar_correo_normalizado, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='usuario',
+            name='correo_normalizado',
+            field=models.CharField(editable=False, max_length=128, unique=True),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:10
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def crear_tabla_cache(apps, schema_editor):
+    # Tablas de los backends DatabaseCache de settings.CACHES (no hace nada
+    # si el cache compartido es Redis/Memcached)
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grupos', '0011_usuario_correo_normalizado'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tabla_cache, migrations.RunPython.noop),
+    ]
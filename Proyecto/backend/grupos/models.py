@@ -10,6 +10,8 @@ Incluye todos los modelos del sistema:
 from django.db import models
 from django.contrib.auth.hashers import make_password, check_password
 
+from .cache_consultas import QuerySetVersionado
+
 
 class Usuario(models.Model):
     """Modelo de Usuario del sistema"""
@@ -17,6 +19,9 @@ class Usuario(models.Model):
     nombre_usuario = models.CharField(max_length=60)
     apellido = models.CharField(max_length=60)
     correo_usuario = models.EmailField(max_length=128, unique=True)
+    # Clave de búsqueda en minúsculas (login/registro usan el índice único
+    # en lugar de correo_usuario__iexact); se calcula en save()
+    correo_normalizado = models.CharField(max_length=128, unique=True, editable=False)
     # Nuevo campo para almacenar hash de contraseña. Nullable para compatibilidad con datos existentes.
     password_hash = models.CharField(max_length=128, blank=True, null=True)
     estado_usuario = models.CharField(
@@ -29,6 +34,8 @@ class Usuario(models.Model):
         default='ACTIVO',
     )
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    # Contador denormalizado para el badge de la bandeja (grupos/audiencias.py)
+    notificaciones_no_leidas = models.PositiveIntegerField(default=0)
 
     class Meta:
         db_table = 'USUARIO'
@@ -38,6 +45,28 @@ class Usuario(models.Model):
     def __str__(self):
         return f"{self.nombre_usuario} {self.apellido}"
 
+    @staticmethod
+    def normalizar_correo(correo):
+        return (correo or '').strip().lower()
+
+    # Contadores mantenidos con UPDATE ... F(): un save() de la instancia
+    # nunca los escribe (pisaría incrementos concurrentes)
+    CONTADORES = ('notificaciones_no_leidas',)
+
+    def save(self, *args, **kwargs):
+        self.correo_normalizado = self.normalizar_correo(self.correo_usuario)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            update_fields = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CONTADORES
+            ]
+        if update_fields is not None and 'correo_usuario' in update_fields:
+            update_fields = {*update_fields, 'correo_normalizado'}
+        if update_fields is not None:
+            kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
+
     # --- helpers de contraseña (usando el framework de hashers de Django) ---
     def set_password(self, raw_password):
         """
@@ -121,6 +150,12 @@ class Grupo(models.Model):
         related_name='grupos_creados',
     )
 
+    # Contadores denormalizados (mantenidos por grupos/signals.py).
+    # Evitan un COUNT por fila al listar grupos; se reconstruyen con
+    # `python manage.py recalcular_contadores`.
+    total_miembros = models.PositiveIntegerField(default=0)
+    total_eventos = models.PositiveIntegerField(default=0)
+
     # Relaciones Many-to-Many
     miembros = models.ManyToManyField(
         Usuario,
@@ -128,6 +163,9 @@ class Grupo(models.Model):
         related_name='grupos',
     )
 
+    # Escrituras masivas versionan la tabla; .cacheado() (grupos/cache_consultas.py)
+    objects = QuerySetVersionado.as_manager()
+
     class Meta:
         db_table = 'GRUPO'
         verbose_name = 'Grupo'
@@ -163,6 +201,15 @@ class Evento(models.Model):
         default='PROGRAMADO',
     )
 
+    # Asignación de cupos (ver grupos/cupos.py): cupos retenidos por
+    # participaciones no canceladas y cantidad de contadores fragmentados
+    # (0 = el contador vive solo en esta fila).
+    cupos_ocupados = models.PositiveIntegerField(default=0)
+    num_fragmentos = models.PositiveSmallIntegerField(default=0)
+
+    # Escrituras masivas versionan la tabla; .cacheado() (grupos/cache_consultas.py)
+    objects = QuerySetVersionado.as_manager()
+
     class Meta:
         db_table = 'EVENTO'
         verbose_name = 'Evento'
@@ -172,6 +219,27 @@ class Evento(models.Model):
         return f"{self.nombre_evento} - {self.grupo.nombre_grupo}"
 
 
+class CupoFragmento(models.Model):
+    """Fragmento del contador de cupos de un evento muy concurrido"""
+    evento = models.ForeignKey(
+        Evento,
+        on_delete=models.CASCADE,
+        related_name='fragmentos',
+    )
+    indice = models.PositiveSmallIntegerField()
+    capacidad = models.PositiveIntegerField(default=0)
+    ocupados = models.PositiveIntegerField(default=0)
+
+    objects = QuerySetVersionado.as_manager()
+
+    class Meta:
+        db_table = 'CUPO_FRAGMENTO'
+        unique_together = ('evento', 'indice')
+
+    def __str__(self):
+        return f"Fragmento {self.indice} de {self.evento_id}: {self.ocupados}/{self.capacidad}"
+
+
 class Participacion(models.Model):
     """Modelo de Participación en eventos"""
     id_participaciones = models.AutoField(primary_key=True)
@@ -247,7 +315,22 @@ class Notificacion(models.Model):
     mensaje = models.TextField()
     fecha_envio = models.DateTimeField(auto_now_add=True)
 
+    # Difusión: la notificación se guarda una sola vez con la definición de
+    # su audiencia (ver grupos/audiencias.py); vacío = notificación individual
+    audiencia_tipo = models.CharField(
+        max_length=10,
+        blank=True,
+        default='',
+        choices=[
+            ('GRUPO', 'Miembros de grupo'),
+            ('EVENTO', 'Participantes de evento'),
+            ('ROL', 'Usuarios con rol'),
+        ],
+    )
+    audiencia_id = models.PositiveIntegerField(null=True, blank=True)
+
     # Relación Many-to-Many con Usuario
+    # (en difusiones solo hay fila para quienes ya la leyeron)
     usuarios = models.ManyToManyField(
         Usuario,
         through='UsuarioNotificacion',
@@ -258,6 +341,12 @@ class Notificacion(models.Model):
         db_table = 'NOTIFICACION'
         verbose_name = 'Notificación'
         verbose_name_plural = 'Notificaciones'
+        indexes = [
+            models.Index(fields=['audiencia_tipo', 'audiencia_id'], name='notif_audiencia_idx'),
+            # Bandejas ordenadas por fecha y retención por tipo
+            models.Index(fields=['fecha_envio'], name='notif_fecha_idx'),
+            models.Index(fields=['tipo_notificacion', 'fecha_envio'], name='notif_tipo_fecha_idx'),
+        ]
 
     def __str__(self):
         return f"{self.tipo_notificacion} - {self.fecha_envio}"
@@ -281,6 +370,9 @@ class UsuarioGrupo(models.Model):
         default='MIEMBRO',
     )
 
+    # Escrituras masivas versionan la tabla; .cacheado() (grupos/cache_consultas.py)
+    objects = QuerySetVersionado.as_manager()
+
     class Meta:
         db_table = 'USUARIO_GRUPO'
         unique_together = ('usuario', 'grupo')
@@ -294,6 +386,9 @@ class ParticipacionUsuario(models.Model):
     usuario = models.ForeignKey(Usuario, on_delete=models.CASCADE)
     participacion = models.ForeignKey(Participacion, on_delete=models.CASCADE)
 
+    # Escrituras masivas versionan la tabla; .cacheado() (grupos/cache_consultas.py)
+    objects = QuerySetVersionado.as_manager()
+
     class Meta:
         db_table = 'PARTICIPACION_USUARIO'
         unique_together = ('usuario', 'participacion')
@@ -328,3 +423,35 @@ class UsuarioRol(models.Model):
     class Meta:
         db_table = 'USUARIO_ROL'
         unique_together = ('usuario', 'rol')
+
+
+# ===========================================================================
+# ÍNDICE DE BÚSQUEDA
+# ===========================================================================
+
+class GrupoTermino(models.Model):
+    """Índice invertido de búsqueda: término normalizado → grupo (ver grupos/search.py)"""
+    termino = models.CharField(max_length=40)
+    grupo = models.ForeignKey(Grupo, on_delete=models.CASCADE, related_name='terminos')
+    peso = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        db_table = 'GRUPO_TERMINO'
+        unique_together = ('termino', 'grupo')
+
+    def __str__(self):
+        return f"{self.termino} → {self.grupo_id}"
+
+
+class GrupoFaceta(models.Model):
+    """Conteo precalculado de grupos por valor de faceta (área, tipo, estado)"""
+    campo = models.CharField(max_length=20)
+    valor = models.CharField(max_length=40)
+    total = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'GRUPO_FACETA'
+        unique_together = ('campo', 'valor')
+
+    def __str__(self):
+        return f"{self.campo}={self.valor}: {self.total}"
@@ -0,0 +1,208 @@
+"""
+Paginación - ÁgoraUN
+
+KeysetPagination:
+- Sin `?cursor` se comporta igual que PageNumberPagination (compatibilidad
+  con el frontend: `?page=N`, respuesta con count/next/previous/results).
+- Con `?cursor` (vacío para la primera página) activa el modo keyset:
+  busca por (campo de ordenamiento, pk) en lugar de usar OFFSET y no
+  ejecuta COUNT(*). La respuesta trae solo `next` y `results`.
+- `?total=aprox` agrega la cabecera X-Total-Count-Approx, para interfaces
+  que aún necesitan un total: sin filtros (en MySQL) es la estimación de
+  filas del optimizador; con filtros, un COUNT exacto cacheado unos segundos.
+"""
+
+import base64
+import datetime
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder sin recortar microsegundos (el cursor debe ser exacto)."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(PageNumberPagination):
+    """PageNumberPagination con modo cursor (keyset) opcional."""
+
+    cursor_query_param = 'cursor'
+    total_query_param = 'total'
+    total_header = 'X-Total-Count-Approx'
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = self.cursor_query_param in request.query_params
+        self.total_aproximado = None
+        if request.query_params.get(self.total_query_param) == 'aprox':
+            self.total_aproximado = self._total_aproximado(queryset)
+
+        if not self.keyset:
+            return super().paginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        campo, descendente = self._campo_orden(queryset)
+        pk = queryset.model._meta.pk.name
+        orden = [f"-{campo}", f"-{pk}"] if descendente else [campo, pk]
+        if campo == pk:
+            orden = orden[:1]
+        queryset = queryset.order_by(*orden)
+
+        cursor = self._decodificar_cursor(
+            request.query_params[self.cursor_query_param], queryset, campo
+        )
+        if cursor is not None:
+            valor, ultimo_pk = cursor
+            op = 'lt' if descendente else 'gt'
+            condicion = Q(**{f"{pk}__{op}": ultimo_pk})
+            if campo != pk:
+                condicion = Q(**{f"{campo}__{op}": valor}) | (Q(**{campo: valor}) & condicion)
+            queryset = queryset.filter(condicion)
+
+        # Pedimos una fila extra para saber si hay página siguiente
+        filas = list(queryset[:page_size + 1])
+        self.siguiente = None
+        if len(filas) > page_size:
+            filas = filas[:page_size]
+            ultimo = filas[-1]
+            self.siguiente = (self._valor(ultimo, campo), ultimo.pk)
+        return filas
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            response = super().get_paginated_response(data)
+        else:
+            response = Response(OrderedDict([
+                ('next', self.get_next_link()),
+                ('results', data),
+            ]))
+        if self.total_aproximado is not None:
+            response[self.total_header] = str(self.total_aproximado)
+        return response
+
+    def get_next_link(self):
+        if not self.keyset:
+            return super().get_next_link()
+        if self.siguiente is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, self._codificar_cursor(*self.siguiente))
+
+    # ----------------------------- helpers -----------------------------
+
+    @staticmethod
+    def _campo_orden(queryset):
+        """Primer campo del ORDER BY (o la pk si el queryset no está ordenado)."""
+        orden = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not orden or not isinstance(orden[0], str):
+            return queryset.model._meta.pk.name, False
+        campo = orden[0]
+        if campo in ('pk', '-pk'):
+            campo = campo.replace('pk', queryset.model._meta.pk.name)
+        return campo.lstrip('-'), campo.startswith('-')
+
+    @staticmethod
+    def _valor(obj, campo):
+        """Valor de `campo` en `obj`, siguiendo relaciones con '__'."""
+        for parte in campo.split('__'):
+            obj = getattr(obj, parte)
+        return obj
+
+    @staticmethod
+    def _codificar_cursor(valor, pk):
+        crudo = json.dumps([valor, pk], cls=_CursorEncoder)
+        return base64.urlsafe_b64encode(crudo.encode()).decode()
+
+    @staticmethod
+    def _campo_cursor(queryset, campo):
+        """
+        Field que tipa `campo`: el output_field si es una anotación (p. ej.
+        `relevancia` de la búsqueda) o el campo del modelo, siguiendo
+        relaciones con '__'.
+        """
+        anotacion = queryset.query.annotations.get(campo)
+        if anotacion is not None:
+            return anotacion.output_field
+        modelo = queryset.model
+        partes = campo.split('__')
+        for parte in partes[:-1]:
+            modelo = modelo._meta.get_field(parte).related_model
+        return modelo._meta.get_field(partes[-1])
+
+    def _decodificar_cursor(self, cursor, queryset, campo):
+        """(valor, pk) del cursor ya convertidos a los tipos de los campos."""
+        if not cursor:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if not isinstance(datos, list) or len(datos) != 2:
+                raise ValueError("El cursor debe ser [valor, pk]")
+            valor = self._campo_cursor(queryset, campo).to_python(datos[0])
+            pk = queryset.model._meta.pk.to_python(datos[1])
+        except (TypeError, ValueError, ValidationError, FieldDoesNotExist) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+        return valor, pk
+
+    @classmethod
+    def _total_aproximado(cls, queryset):
+        """
+        Total para X-Total-Count-Approx.
+
+        - Listado sin filtros en MySQL: filas estimadas por el optimizador
+          (EXPLAIN, estadísticas de InnoDB), sin recorrer la tabla.
+        - En otro caso: COUNT exacto, cacheado por consulta durante
+          PAGINACION_TOTAL_TTL segundos (puede ir ese tiempo atrasado).
+        """
+        query = queryset.query
+        sin_filtros = (
+            not query.where and not query.distinct and not query.combinator
+            and len(query.alias_map) <= 1
+        )
+        if sin_filtros and connections[queryset.db].vendor == 'mysql':
+            return cls._filas_estimadas(queryset.model, queryset.db)
+        return cls._conteo_cacheado(queryset)
+
+    @staticmethod
+    def _filas_estimadas(modelo, using):
+        """Filas de la tabla según el plan de `SELECT pk` (columna rows de EXPLAIN)."""
+        sql, params = (
+            modelo._base_manager.using(using).order_by().values('pk')
+            .query.sql_with_params()
+        )
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            columnas = [col[0].lower() for col in cursor.description]
+            fila = cursor.fetchone()
+        return int(fila[columnas.index('rows')] or 0)
+
+    @staticmethod
+    def _conteo_cacheado(queryset):
+        """COUNT exacto cacheado por consulta durante PAGINACION_TOTAL_TTL segundos."""
+        sql, params = queryset.order_by().query.sql_with_params()
+        firma = hashlib.md5(f"{sql}|{params}".encode()).hexdigest()
+        cache_key = f"paginacion_total_{firma}"
+        total = cache.get(cache_key)
+        if total is None:
+            total = queryset.order_by().count()
+            cache.set(cache_key, total, getattr(settings, 'PAGINACION_TOTAL_TTL', 60))
+        return total
@@ -0,0 +1,79 @@
+"""
+Aviso de notificaciones nuevas (long-poll) - ÁgoraUN
+
+En lugar de que cada pestaña recargue la bandeja completa cada cierto
+tiempo, el cliente llama a GET /notificaciones/esperar/ y la petición
+queda bloqueada hasta que haya algo nuevo para ese usuario (o se agote
+el tiempo). Luego recarga la bandeja una sola vez.
+
+Canales: cada publicación marca uno o más canales con una estampa de
+tiempo (µs). Un usuario escucha su canal propio ('usuario:ID') y los de
+las audiencias a las que pertenece ('GRUPO:ID', 'EVENTO:ID', 'ROL:ID'),
+así una difusión a miles de usuarios es una sola marca.
+
+Backends (settings.NOTIFICACIONES_PUSH_BACKEND):
+- BackendLocal: marcas en memoria del proceso (un solo worker).
+- BackendCache: marcas en el cache de Django; con un cache compartido
+  (Redis/Memcached) avisa entre procesos. Con LocMemCache funciona como
+  sustituto local.
+El broker (singletons.BrokerNotificaciones) despierta al instante a las
+esperas del mismo proceso y consulta el backend cada
+NOTIFICACIONES_PUSH_SONDEO segundos para avisos de otros procesos.
+"""
+
+import threading
+
+from django.core.cache import cache
+
+from .audiencias import TIPOS_AUDIENCIA, referencias_de_usuario
+
+
+def canal_usuario(id_usuario):
+    return f"usuario:{id_usuario}"
+
+
+def canal_audiencia(tipo, id_referencia):
+    return f"{tipo}:{id_referencia}"
+
+
+def canales_de_usuario(id_usuario):
+    """Canal propio + canales de las audiencias del usuario (una consulta por tipo)."""
+    canales = [canal_usuario(id_usuario)]
+    for tipo in TIPOS_AUDIENCIA:
+        canales.extend(
+            canal_audiencia(tipo, id_referencia)
+            for fila in referencias_de_usuario(tipo, id_usuario)
+            for id_referencia in fila.values()
+        )
+    return canales
+
+
+class BackendLocal:
+    """Marcas en memoria: solo avisa dentro del mismo proceso."""
+
+    def __init__(self):
+        self._marcas = {}
+        self._lock = threading.Lock()
+
+    def publicar(self, canales, marca):
+        with self._lock:
+            for canal in canales:
+                self._marcas[canal] = max(marca, self._marcas.get(canal, 0))
+
+    def ultima_marca(self, canales):
+        with self._lock:
+            return max((self._marcas.get(canal, 0) for canal in canales), default=0)
+
+
+class BackendCache:
+    """Marcas en el cache de Django: avisa entre procesos si el cache es compartido."""
+
+    prefijo = "push_"
+    ttl = 3600
+
+    def publicar(self, canales, marca):
+        cache.set_many({f"{self.prefijo}{canal}": marca for canal in canales}, self.ttl)
+
+    def ultima_marca(self, canales):
+        marcas = cache.get_many([f"{self.prefijo}{canal}" for canal in canales])
+        return max(marcas.values(), default=0)
@@ -0,0 +1,101 @@
+"""
+Retención de notificaciones - ÁgoraUN
+
+Evita que NOTIFICACION y USUARIO_NOTIFICACION crezcan sin límite.
+Los días de retención se configuran por tipo_notificacion en
+settings.NOTIFICACIONES_RETENCION ('default' para el resto):
+
+- Notificaciones individuales vencidas: se borran las filas ya leídas;
+  las no leídas se conservan hasta que el usuario las lea.
+- Difusiones vencidas: se borran completas (con sus acuses); el signal
+  pre_delete descuenta el contador de quienes no la habían leído.
+- Notificaciones individuales sin destinatarios (todas leídas y
+  borradas, o usuarios eliminados) se eliminan pasado un margen.
+
+Todo se hace por lotes pequeños, cada uno en su propia transacción
+corta, con una pausa opcional entre lotes para no competir con el
+tráfico en vivo: `python manage.py compactar_notificaciones`.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Notificacion, UsuarioNotificacion
+
+# Margen antes de eliminar una notificación individual sin destinatarios
+# (el reparto en segundo plano puede no haber insertado aún sus filas)
+MARGEN_HUERFANAS = timedelta(days=1)
+
+
+def dias_retencion(tipo):
+    """Días que se conservan las notificaciones de `tipo`."""
+    retencion = settings.NOTIFICACIONES_RETENCION
+    return retencion.get(tipo, retencion['default'])
+
+
+def condicion_vencidas(ahora=None):
+    """Q sobre Notificacion: enviadas antes del límite de retención de su tipo."""
+    ahora = ahora or timezone.now()
+    tipos = [tipo for tipo in settings.NOTIFICACIONES_RETENCION if tipo != 'default']
+    condicion = Q(
+        fecha_envio__lt=ahora - timedelta(days=dias_retencion('default'))
+    ) & ~Q(tipo_notificacion__in=tipos)
+    for tipo in tipos:
+        condicion |= Q(
+            tipo_notificacion=tipo,
+            fecha_envio__lt=ahora - timedelta(days=dias_retencion(tipo)),
+        )
+    return condicion
+
+
+def _borrar_por_lotes(queryset, tamano_lote, pausa):
+    """Borrar las filas de `queryset` de a `tamano_lote` PKs por transacción."""
+    total = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.values_list('pk', flat=True)[:tamano_lote])
+            if not ids:
+                return total
+            queryset.model.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+        if pausa:
+            time.sleep(pausa)
+
+
+def compactar(tamano_lote=500, pausa=0.0, ahora=None):
+    """
+    Aplicar la política de retención.
+
+    Args:
+        tamano_lote (int): Filas por DELETE
+        pausa (float): Segundos de espera entre lotes
+        ahora (datetime): Referencia de tiempo (por defecto, ahora)
+
+    Returns:
+        dict: Filas borradas por categoría
+    """
+    ahora = ahora or timezone.now()
+    vencidas = Notificacion.objects.filter(condicion_vencidas(ahora))
+
+    lecturas = UsuarioNotificacion.objects.filter(
+        leida=True,
+        notificacion__in=vencidas.filter(audiencia_tipo='').values('pk'),
+    )
+    difusiones = vencidas.exclude(audiencia_tipo='')
+    huerfanas = Notificacion.objects.filter(
+        audiencia_tipo='',
+        fecha_envio__lt=ahora - MARGEN_HUERFANAS,
+    ).exclude(
+        Exists(UsuarioNotificacion.objects.filter(notificacion=OuterRef('pk')))
+    )
+
+    return {
+        'lecturas': _borrar_por_lotes(lecturas, tamano_lote, pausa),
+        'difusiones': _borrar_por_lotes(difusiones, tamano_lote, pausa),
+        'huerfanas': _borrar_por_lotes(huerfanas, tamano_lote, pausa),
+    }
@@ -0,0 +1,269 @@
+"""
+Búsqueda de texto - ÁgoraUN
+
+Índice invertido de grupos (tabla GRUPO_TERMINO) sobre nombre, área,
+tipo y descripción. Reemplaza los `LIKE '%q%'` de SearchFilter, que
+recorren la tabla completa, por búsquedas indexadas por término.
+
+- Normalización: minúsculas, sin tildes, sin stopwords en español y con
+  un stemmer ligero (plurales y vocal final): "Músicas" → "music".
+- Ranking: suma de pesos por campo (nombre > tipo/área > descripción)
+  ponderada por la rareza del término (IDF).
+- El último término de la consulta se busca por prefijo para soportar
+  búsqueda mientras se escribe.
+- El índice se actualiza al guardar un Grupo (ver grupos/signals.py);
+  `python manage.py reindexar_grupos` lo reconstruye completo.
+
+Facetas: conteos por área, tipo y estado en la tabla GRUPO_FACETA,
+mantenidos de forma incremental por los mismos signals, para que los
+listados sin filtros devuelvan los conteos sin un GROUP BY por petición.
+Con filtros, los conteos se calculan sobre los resultados filtrados.
+"""
+
+import math
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from rest_framework.filters import SearchFilter
+
+from .models import Grupo, GrupoFaceta, GrupoTermino
+
+# Peso de cada campo indexado del Grupo
+CAMPOS_INDEXADOS = (
+    ('nombre_grupo', 5),
+    ('tipo_grupo', 3),
+    ('area_interes', 3),
+    ('descripcion', 1),
+)
+# Campos de Grupo con conteo por faceta
+FACETAS = ('area_interes', 'tipo_grupo', 'estado_grupo')
+PESO_MAXIMO = 100
+LONGITUD_TERMINO = GrupoTermino._meta.get_field('termino').max_length
+LONGITUD_MINIMA_PREFIJO = 3
+
+STOPWORDS = frozenset("""
+    a al algo ante como con contra cual cuando de del desde donde e el ella ellos
+    en entre era es esa ese eso esta este esto fue ha hay la las le les lo los mas
+    me mi muy ni no nos o otra otro para pero por que quien se sin sobre su sus
+    tambien te tu un una uno unos unas y ya
+""".split())
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+
+def quitar_tildes(texto):
+    """'Música Ñandú' → 'musica nandu'"""
+    descompuesto = unicodedata.normalize('NFD', texto)
+    return ''.join(c for c in descompuesto if unicodedata.category(c) != 'Mn')
+
+
+def raiz(palabra):
+    """Stemmer ligero para español (plurales y vocal de género final)."""
+    if len(palabra) <= 4:
+        return palabra
+    if palabra.endswith('ces'):
+        palabra = palabra[:-3] + 'z'
+    elif palabra.endswith('es') and palabra[-3] not in 'aeiou':
+        palabra = palabra[:-2]
+    elif palabra.endswith('s'):
+        palabra = palabra[:-1]
+    if len(palabra) > 4 and palabra[-1] in 'aeo':
+        palabra = palabra[:-1]
+    return palabra
+
+
+def tokenizar(texto):
+    """Lista de términos normalizados de un texto (con repeticiones)."""
+    palabras = _TOKEN.findall(quitar_tildes(texto or '').lower())
+    return [raiz(p)[:LONGITUD_TERMINO] for p in palabras if p not in STOPWORDS]
+
+
+def extraer_terminos(grupo):
+    """Diccionario {término: peso} de un grupo según CAMPOS_INDEXADOS."""
+    pesos = {}
+    for campo, peso in CAMPOS_INDEXADOS:
+        for termino in tokenizar(getattr(grupo, campo, '')):
+            pesos[termino] = min(PESO_MAXIMO, pesos.get(termino, 0) + peso)
+    return pesos
+
+
+# ===========================================================================
+# MANTENIMIENTO DEL ÍNDICE
+# ===========================================================================
+
+@transaction.atomic
+def indexar_grupo(grupo):
+    """(Re)indexar un grupo: reemplaza sus términos en GRUPO_TERMINO."""
+    GrupoTermino.objects.filter(grupo_id=grupo.id_grupo).delete()
+    GrupoTermino.objects.bulk_create([
+        GrupoTermino(termino=termino, grupo_id=grupo.id_grupo, peso=peso)
+        for termino, peso in extraer_terminos(grupo).items()
+    ])
+
+
+def reindexar_todos(tamano_lote=500):
+    """Reconstruir el índice completo por lotes. Retorna grupos indexados."""
+    total = 0
+    campos = ['id_grupo'] + [campo for campo, _ in CAMPOS_INDEXADOS]
+    with transaction.atomic():
+        GrupoTermino.objects.all().delete()
+        lote = []
+        for grupo in Grupo.objects.only(*campos).iterator(chunk_size=tamano_lote):
+            lote.extend(
+                GrupoTermino(termino=termino, grupo_id=grupo.id_grupo, peso=peso)
+                for termino, peso in extraer_terminos(grupo).items()
+            )
+            total += 1
+            if len(lote) >= tamano_lote:
+                GrupoTermino.objects.bulk_create(lote)
+                lote = []
+        GrupoTermino.objects.bulk_create(lote)
+    return total
+
+
+# ===========================================================================
+# CONSULTA
+# ===========================================================================
+
+def _condicion_terminos(texto):
+    """Q sobre GrupoTermino para la consulta (último término por prefijo)."""
+    terminos = list(dict.fromkeys(tokenizar(texto)))
+    if not terminos:
+        return None
+    condicion = Q(termino__in=terminos)
+    ultimo = terminos[-1]
+    if len(ultimo) >= LONGITUD_MINIMA_PREFIJO:
+        condicion |= Q(termino__startswith=ultimo)
+    return condicion
+
+
+def buscar(queryset, texto):
+    """
+    Filtrar un queryset de Grupo por texto usando el índice invertido.
+
+    Args:
+        queryset (QuerySet): Grupos (puede venir ya filtrado)
+        texto (str): Consulta libre
+
+    Returns:
+        QuerySet: Grupos que coinciden, anotados con `relevancia`
+        (sin ordenar; usar order_by('-relevancia') para ranking)
+    """
+    condicion = _condicion_terminos(texto)
+    if condicion is None:
+        return queryset
+
+    postings = GrupoTermino.objects.filter(condicion)
+    # Frecuencia de documento por término → IDF (una consulta indexada)
+    frecuencias = dict(
+        postings.order_by().values('termino').annotate(df=Count('grupo')).values_list('termino', 'df')
+    )
+    if not frecuencias:
+        return queryset.none()
+
+    ponderado = Case(
+        *[
+            When(termino=termino, then=F('peso') * Value(1 / math.log2(df + 1)))
+            for termino, df in frecuencias.items()
+        ],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    relevancia = (
+        postings.filter(grupo=OuterRef('pk'))
+        .order_by()
+        .values('grupo')
+        .annotate(total=Sum(ponderado))
+        .values('total')
+    )
+    return queryset.filter(
+        id_grupo__in=postings.values('grupo')
+    ).annotate(relevancia=Subquery(relevancia, output_field=FloatField()))
+
+
+class BusquedaTextoFilter(SearchFilter):
+    """
+    Backend de filtrado para ?search= que usa el índice invertido.
+    Si no se pide ?ordering= explícito, ordena por relevancia.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        texto = request.query_params.get(self.search_param, '').strip()
+        if not texto:
+            return queryset
+        resultado = buscar(queryset, texto)
+        if 'relevancia' in resultado.query.annotations and 'ordering' not in request.query_params:
+            resultado = resultado.order_by('-relevancia', 'id_grupo')
+        return resultado
+
+
+# ===========================================================================
+# FACETAS
+# ===========================================================================
+
+def ajustar_facetas(valores, delta):
+    """
+    Sumar `delta` a los conteos de las facetas dadas.
+
+    Args:
+        valores (dict): {campo: valor} p. ej. {'area_interes': 'Artes'}
+        delta (int): +1 al crear, -1 al eliminar
+    """
+    for campo, valor in valores.items():
+        if not valor:
+            continue
+        actualizadas = GrupoFaceta.objects.filter(campo=campo, valor=valor)
+        if delta < 0:
+            actualizadas = actualizadas.filter(total__gte=-delta)
+        if not actualizadas.update(total=F('total') + delta) and delta > 0:
+            faceta, creada = GrupoFaceta.objects.get_or_create(
+                campo=campo, valor=valor, defaults={'total': delta}
+            )
+            if not creada:
+                GrupoFaceta.objects.filter(pk=faceta.pk).update(total=F('total') + delta)
+
+
+def valores_faceta(grupo):
+    """{campo: valor} de las facetas de un grupo."""
+    return {campo: getattr(grupo, campo) for campo in FACETAS}
+
+
+def obtener_facetas(queryset=None):
+    """
+    Conteos por faceta.
+
+    Sin `queryset`: conteos globales precalculados en GRUPO_FACETA (una
+    consulta). Con `queryset` (listado filtrado por búsqueda/área/estado):
+    un GROUP BY por faceta sobre esos grupos, para que los conteos
+    coincidan con los resultados.
+
+    Returns:
+        dict: {'area_interes': {'Artes': 3, ...}, 'tipo_grupo': {...}, ...}
+    """
+    facetas = {campo: {} for campo in FACETAS}
+    if queryset is not None:
+        grupos = Grupo.objects.filter(pk__in=queryset.order_by().values('pk')).order_by()
+        for campo in FACETAS:
+            for fila in grupos.values(campo).annotate(total=Count('id_grupo')).order_by(campo):
+                if fila[campo]:
+                    facetas[campo][fila[campo]] = fila['total']
+        return facetas
+
+    filas = GrupoFaceta.objects.filter(total__gt=0).order_by('campo', 'valor')
+    for campo, valor, total in filas.values_list('campo', 'valor', 'total'):
+        facetas.setdefault(campo, {})[valor] = total
+    return facetas
+
+
+@transaction.atomic
+def recalcular_facetas():
+    """Reconstruir GRUPO_FACETA con un GROUP BY por campo."""
+    GrupoFaceta.objects.all().delete()
+    GrupoFaceta.objects.bulk_create([
+        GrupoFaceta(campo=campo, valor=fila[campo], total=fila['total'])
+        for campo in FACETAS
+        for fila in Grupo.objects.order_by().values(campo).annotate(total=Count('id_grupo'))
+        if fila[campo]
+    ])
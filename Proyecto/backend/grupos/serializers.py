@@ -10,6 +10,8 @@ Valida formato de datos y convierte entre:
 from django.core.exceptions import ObjectDoesNotExist
 from django.utils import timezone
 from rest_framework import serializers
+from .audiencias import TIPOS_AUDIENCIA
+from .cupos import cupos_ocupados
 from .models import (
     Usuario, Grupo, Evento, Participacion,
     Comentario, Notificacion, Rol,
@@ -33,9 +35,10 @@ class UsuarioSerializer(serializers.ModelSerializer):
             'apellido',
             'correo_usuario',
             'estado_usuario',
-            'fecha_registro'
+            'fecha_registro',
+            'notificaciones_no_leidas'
         ]
-        read_only_fields = ['id_usuario', 'fecha_registro']
+        read_only_fields = ['id_usuario', 'fecha_registro', 'notificaciones_no_leidas']
 
     def validate_correo_usuario(self, value):
         """Validar que el correo sea institucional"""
@@ -45,13 +48,21 @@ class UsuarioSerializer(serializers.ModelSerializer):
             )
         return value
 
+    def update(self, instance, validated_data):
+        """Guardar solo los campos editados (no el contador de no leídas)"""
+        for campo, valor in validated_data.items():
+            setattr(instance, campo, valor)
+        if validated_data:
+            instance.save(update_fields=list(validated_data))
+        return instance
+
 
 class GrupoSerializer(serializers.ModelSerializer):
     """Serializer para Grupo"""
 
-    # Campos calculados (no están en BD)
-    total_miembros = serializers.SerializerMethodField()
-    total_eventos = serializers.SerializerMethodField()
+    # Contadores denormalizados (mantenidos por grupos/signals.py)
+    total_miembros = serializers.IntegerField(read_only=True)
+    total_eventos = serializers.IntegerField(read_only=True)
     estado_grupo = serializers.CharField(read_only=True)
     motivo_rechazo = serializers.CharField(read_only=True)
 
@@ -74,14 +85,6 @@ class GrupoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id_grupo', 'fecha_creacion', 'estado_grupo', 'motivo_rechazo']
 
-    def get_total_miembros(self, obj):
-        """Contar miembros del grupo"""
-        return obj.miembros.count()
-
-    def get_total_eventos(self, obj):
-        """Contar eventos del grupo"""
-        return obj.eventos.count()
-
     def validate_correo_grupo(self, value):
         """Validar correo institucional"""
         if not value.endswith('@unal.edu.co'):
@@ -118,16 +121,20 @@ class GrupoDetalleSerializer(serializers.ModelSerializer):
         ]
 
     def get_miembros(self, obj):
-        """Obtener lista de miembros"""
-        usuarios = obj.miembros.all()[:10]  # Limitar a 10
+        """Obtener lista de miembros (precargada con GrupoService.con_detalle)"""
+        usuarios = getattr(obj, 'miembros_detalle', None)
+        if usuarios is None:
+            usuarios = obj.miembros.order_by('id_usuario')[:10]  # Limitar a 10
         return UsuarioSerializer(usuarios, many=True).data
 
     def get_eventos_proximos(self, obj):
-        """Obtener eventos próximos del grupo"""
-        eventos = obj.eventos.filter(
-            fecha_inicio__gte=timezone.now(),
-            estado_evento='PROGRAMADO'
-        ).order_by('fecha_inicio')[:5]
+        """Obtener eventos próximos del grupo (precargados con GrupoService.con_detalle)"""
+        eventos = getattr(obj, 'eventos_proximos_detalle', None)
+        if eventos is None:
+            eventos = obj.eventos.filter(
+                fecha_inicio__gte=timezone.now(),
+                estado_evento='PROGRAMADO'
+            ).order_by('fecha_inicio')[:5]
         return EventoSerializer(eventos, many=True).data
 
 
@@ -160,11 +167,9 @@ class EventoSerializer(serializers.ModelSerializer):
 
     def get_cupos_disponibles(self, obj):
         """Calcular cupos disponibles SOLO para este evento"""
-        participaciones_confirmadas = ParticipacionUsuario.objects.filter(
-            participacion__evento=obj,
-            participacion__estado_participacion='CONFIRMADO'
-        ).count()
-        return max(0, obj.cupo - participaciones_confirmadas)
+        # Contador mantenido por grupos/cupos.py: sin consulta salvo que el
+        # evento tenga el contador fragmentado
+        return max(0, obj.cupo - cupos_ocupados(obj))
 
     def validate(self, data):
         """Validar fechas coherentes y cupo positivo"""
@@ -233,6 +238,25 @@ class RegistroParticipacionSerializer(serializers.Serializer):
         return value
 
 
+class RegistroMasivoSerializer(serializers.Serializer):
+    """Serializer para inscribir varios usuarios a un evento
+
+    La existencia de los usuarios se valida en el servicio (una consulta
+    para todo el lote) y se informa por usuario en la respuesta.
+    """
+
+    ids_usuarios = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=500
+    )
+    comentario = serializers.CharField(
+        max_length=100,
+        required=False,
+        allow_blank=True
+    )
+
+
 class ComentarioSerializer(serializers.ModelSerializer):
     """Serializer para Comentario"""
 
@@ -281,7 +305,12 @@ class NotificacionSerializer(serializers.ModelSerializer):
         """
         Verificar si fue leída por el usuario indicado en el contexto.
         Si no se pasa usuario, se asume no leída.
+
+        Las bandejas (NotificacionService.obtener_notificaciones_usuario)
+        ya traen `leida` anotada y no se consulta por fila.
         """
+        if hasattr(obj, 'leida'):
+            return obj.leida
         id_usuario = self.context.get('id_usuario')
         if not id_usuario:
             return False
@@ -372,16 +401,39 @@ class AgregarMiembroSerializer(serializers.Serializer):
         return value
 
 
+class AudienciaSerializer(serializers.Serializer):
+    """Audiencia definida en el servidor (miembros de grupo, evento o rol)"""
+
+    tipo = serializers.ChoiceField(choices=TIPOS_AUDIENCIA)
+    id = serializers.IntegerField()
+
+
 class EnviarNotificacionSerializer(serializers.Serializer):
-    """Serializer para enviar notificación"""
+    """Serializer para enviar notificación
+
+    Se indica `ids_usuarios` o `audiencia`, no ambos.
+    """
 
     ids_usuarios = serializers.ListField(
         child=serializers.IntegerField(),
-        min_length=1
+        min_length=1,
+        required=False
     )
+    audiencia = AudienciaSerializer(required=False)
+    # Guardar una sola vez con la audiencia (sin filas por destinatario)
+    difusion = serializers.BooleanField(default=False)
     tipo_notificacion = serializers.CharField(max_length=20)
     mensaje = serializers.CharField()
 
+    def validate(self, attrs):
+        if ('ids_usuarios' in attrs) == ('audiencia' in attrs):
+            raise serializers.ValidationError(
+                "Indique ids_usuarios o audiencia (solo uno)"
+            )
+        if attrs['difusion'] and 'audiencia' not in attrs:
+            raise serializers.ValidationError("Una difusión requiere una audiencia")
+        return attrs
+
     def validate_ids_usuarios(self, value):
         """Verificar que todos los usuarios existen"""
         usuarios_existentes = Usuario.objects.filter(
@@ -394,6 +446,21 @@ class EnviarNotificacionSerializer(serializers.Serializer):
         return value
 
 
+class MarcarLeidasSerializer(serializers.Serializer):
+    """Serializer para marcar varias notificaciones como leídas
+
+    Sin campos se marca toda la bandeja.
+    """
+
+    hasta = serializers.DateTimeField(required=False)
+    ids_notificaciones = serializers.ListField(
+        child=serializers.IntegerField(),
+        min_length=1,
+        max_length=1000,
+        required=False
+    )
+
+
 class RechazarGrupoSerializer(serializers.Serializer):
     """Serializer para rechazo de grupo (RF_14)"""
 
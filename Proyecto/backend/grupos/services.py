@@ -11,7 +11,11 @@ Esta capa:
 Patrón: Service Layer Pattern
 """
 
-from django.db import transaction
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ValidationError
 from .models import (
     Usuario, Grupo, Evento, Participacion,
@@ -19,6 +23,17 @@ from .models import (
     UsuarioGrupo, ParticipacionUsuario,
     UsuarioComentario, UsuarioNotificacion
 )
+from .cupos import (
+    con_cupos_ocupados, reintentar_transaccion, reservar_cupo, reservar_hasta, fragmentar_cupos
+)
+from .audiencias import (
+    Bandeja, ajustar_no_leidas, condicion_bandeja, insertar_destinatarios,
+    marcar_leidas, usuarios_audiencia, validar_audiencia
+)
+from .push import canal_audiencia, canal_usuario, canales_de_usuario
+from .search import buscar
+from .singletons import broker_notificaciones, buffer_lecturas, grupo_cache
+from .tareas import en_segundo_plano
 
 
 # ===========================================================================
@@ -46,12 +61,13 @@ class GrupoService:
                 queryset = queryset.filter(area_interes=filtros['area_interes'])
             if 'tipo_grupo' in filtros:
                 queryset = queryset.filter(tipo_grupo=filtros['tipo_grupo'])
-            if 'busqueda' in filtros:
-                queryset = queryset.filter(
-                    nombre_grupo__icontains=filtros['busqueda']
-                )
             if 'estado_grupo' in filtros:
                 queryset = queryset.filter(estado_grupo=filtros['estado_grupo'])
+            if 'busqueda' in filtros:
+                # Índice invertido (grupos/search.py), ordenado por relevancia
+                queryset = buscar(queryset, filtros['busqueda'])
+                if 'relevancia' in queryset.query.annotations:
+                    return queryset.order_by('-relevancia', '-fecha_creacion')
 
         return queryset.order_by('-fecha_creacion')
 
@@ -71,6 +87,33 @@ class GrupoService:
         """
         return Grupo.objects.get(id_grupo=id_grupo)
 
+    @staticmethod
+    def con_detalle(queryset, max_miembros=10, max_eventos=5):
+        """
+        Precargar lo que muestra GrupoDetalleSerializer en consultas fijas:
+        - Primeros `max_miembros` miembros
+        - Próximos `max_eventos` eventos PROGRAMADOS
+
+        Returns:
+            QuerySet: Grupos con prefetch (1 consulta extra por relación)
+        """
+        eventos = con_cupos_ocupados(Evento.objects.filter(
+            fecha_inicio__gte=timezone.now(),
+            estado_evento='PROGRAMADO',
+        )).order_by('fecha_inicio')
+        return queryset.prefetch_related(
+            Prefetch(
+                'miembros',
+                queryset=Usuario.objects.order_by('id_usuario')[:max_miembros],
+                to_attr='miembros_detalle',
+            ),
+            Prefetch(
+                'eventos',
+                queryset=eventos[:max_eventos],
+                to_attr='eventos_proximos_detalle',
+            ),
+        )
+
     @staticmethod
     @transaction.atomic
     def crear_grupo(datos_grupo, usuario_creador):
@@ -120,6 +163,8 @@ class GrupoService:
             rol_en_grupo='ADMIN'
         )
 
+        # El contador lo incrementa el signal en BD; refrescar la instancia
+        grupo.refresh_from_db(fields=['total_miembros'])
         return grupo
 
     @staticmethod
@@ -140,7 +185,8 @@ class GrupoService:
         for key, value in datos_actualizados.items():
             setattr(grupo, key, value)
 
-        grupo.save()
+        # Guardar solo los campos editados para no pisar los contadores
+        grupo.save(update_fields=list(datos_actualizados.keys()) or None)
         return grupo
 
     @staticmethod
@@ -267,6 +313,30 @@ class GrupoService:
             )
         return grupo
 
+    @staticmethod
+    def recalcular_contadores():
+        """
+        Reconstruir total_miembros y total_eventos de todos los grupos
+        a partir de las tablas de relación (un único UPDATE).
+
+        Returns:
+            int: Número de grupos actualizados
+        """
+        def conteo(queryset):
+            subconsulta = (
+                queryset.filter(grupo=OuterRef('pk'))
+                .order_by()
+                .values('grupo')
+                .annotate(total=Count('*'))
+                .values('total')
+            )
+            return Coalesce(Subquery(subconsulta), Value(0))
+
+        return Grupo.objects.update(
+            total_miembros=conteo(UsuarioGrupo.objects.all()),
+            total_eventos=conteo(Evento.objects.all()),
+        )
+
 
 # ===========================================================================
 # SERVICIOS DE EVENTO
@@ -300,7 +370,9 @@ class EventoService:
                     fecha_inicio__gte=filtros['desde']
                 )
 
-        return queryset.select_related('grupo').order_by('fecha_inicio')
+        return con_cupos_ocupados(
+            queryset.select_related('grupo')
+        ).order_by('fecha_inicio')
 
     @staticmethod
     @transaction.atomic
@@ -346,11 +418,33 @@ class EventoService:
     def actualizar_evento(id_evento, datos_actualizados):
         """Actualizar información del evento"""
         evento = Evento.objects.get(id_evento=id_evento)
+        grupo_anterior = evento.grupo_id
+        cupo_anterior = evento.cupo
 
         for key, value in datos_actualizados.items():
             setattr(evento, key, value)
 
-        evento.save()
+        # Los contadores de cupos los mantiene grupos/cupos.py: nunca se
+        # reescriben con los valores leídos arriba
+        campos = [k for k in datos_actualizados if k not in ('cupos_ocupados', 'num_fragmentos')]
+        if campos:
+            evento.save(update_fields=campos)
+
+        if evento.num_fragmentos and evento.cupo != cupo_anterior:
+            fragmentar_cupos(evento.id_evento, evento.num_fragmentos)
+
+        # Si el evento cambió de grupo, mover el contador denormalizado
+        if evento.grupo_id != grupo_anterior:
+            Grupo.objects.filter(
+                id_grupo=grupo_anterior, total_eventos__gt=0
+            ).update(total_eventos=F('total_eventos') - 1)
+            Grupo.objects.filter(
+                id_grupo=evento.grupo_id
+            ).update(total_eventos=F('total_eventos') + 1)
+            # Como en grupos/signals.py: el detalle cacheado de ambos grupos
+            # (contador y próximos eventos) ya no es válido
+            grupo_cache.invalidate_grupo(grupo_anterior)
+            grupo_cache.invalidate_grupo(evento.grupo_id)
         return evento
 
     @staticmethod
@@ -371,7 +465,9 @@ class EventoService:
         """
         evento = Evento.objects.get(id_evento=id_evento)
         evento.estado_evento = 'CANCELADO'
-        evento.save()
+        # Solo el estado: un save() completo pisaría los contadores de cupos
+        # con los valores leídos antes
+        evento.save(update_fields=['estado_evento'])
 
         return evento
 
@@ -424,7 +520,7 @@ class UsuarioService:
 
         # Validación: Correo único
         if Usuario.objects.filter(
-            correo_usuario=datos_usuario['correo_usuario']
+            correo_normalizado=Usuario.normalizar_correo(datos_usuario['correo_usuario'])
         ).exists():
             raise ValidationError("El correo ya está registrado")
 
@@ -451,7 +547,7 @@ class ParticipacionService:
     """Servicio de lógica de negocio para Participaciones"""
 
     @staticmethod
-    @transaction.atomic
+    @reintentar_transaccion()
     def registrar_participacion(id_evento, id_usuario, comentario=""):
         """
         Registrar participación de un usuario en un evento.
@@ -462,43 +558,129 @@ class ParticipacionService:
         - No permitir registros duplicados (mismo usuario + evento)
         - Verificar cupo disponible (sobre ese evento)
         - Estado inicial: PENDIENTE
+
+        El cupo se reserva con un UPDATE condicional (grupos/cupos.py) en vez
+        de bloquear la fila del evento; la transacción se reintenta sola ante
+        deadlocks.
         """
-        # Bloqueamos la fila del evento para evitar condiciones de carrera de cupo
-        evento = Evento.objects.select_for_update().get(id_evento=id_evento)
-        usuario = Usuario.objects.get(id_usuario=id_usuario)
+        evento = Evento.objects.only('id_evento', 'num_fragmentos').get(id_evento=id_evento)
+        # Bloqueo por usuario: solo serializa inscripciones del mismo usuario
+        usuario = Usuario.objects.select_for_update().get(id_usuario=id_usuario)
 
         # 1) Validar que el usuario no esté ya registrado en este evento
         ya_existe = ParticipacionUsuario.objects.filter(
             usuario=usuario,
-            participacion__evento=evento,
-        ).exists()
+            participacion__evento_id=id_evento,
+        ).exclude(participacion__estado_participacion="CANCELADO").exists()
         if ya_existe:
             raise ValidationError("El usuario ya está registrado en este evento")
 
-        # 2) Contar participaciones CONFIRMADAS de ESTE evento
-        participaciones_confirmadas = ParticipacionUsuario.objects.filter(
-            participacion__evento=evento,
-            participacion__estado_participacion="CONFIRMADO",
-        ).count()
-
-        if participaciones_confirmadas >= evento.cupo:
-            raise ValidationError("No hay cupos disponibles para este evento")
-
-        # 3) Crear la Participación (estado inicial: PENDIENTE)
+        # 2) Crear la Participación (estado inicial: PENDIENTE) y relacionarla
         participacion = Participacion.objects.create(
             evento=evento,
             comentario=comentario,
             estado_participacion="PENDIENTE",
         )
-
-        # 4) Relacionarla con el usuario
         ParticipacionUsuario.objects.create(
             usuario=usuario,
             participacion=participacion,
         )
 
+        # 3) Reservar el cupo al final: el bloqueo de la fila del contador
+        #    dura solo hasta el commit
+        if not reservar_cupo(evento):
+            raise ValidationError("No hay cupos disponibles para este evento")
+
         return participacion
 
+    @staticmethod
+    @reintentar_transaccion()
+    def registrar_participaciones(id_evento, ids_usuarios, comentario=""):
+        """
+        Registrar varios usuarios en un evento en una sola transacción.
+
+        Mismas reglas que registrar_participacion, pero con un número fijo
+        de consultas: existencia y duplicados se validan por conjunto y los
+        cupos de todo el lote se reservan con un solo UPDATE condicional.
+        Si no alcanzan los cupos se inscribe a los primeros de la lista.
+
+        Args:
+            id_evento (int): ID del evento
+            ids_usuarios (list): IDs de usuarios (en orden de prioridad)
+            comentario (str): Comentario para todas las participaciones
+
+        Returns:
+            list: [{'id_usuario', 'estado', 'id_participacion'}] en el orden
+            recibido. estado: REGISTRADO, NO_EXISTE, YA_REGISTRADO,
+            DUPLICADO (repetido en la solicitud) o SIN_CUPO.
+        """
+        evento = Evento.objects.only('id_evento', 'num_fragmentos').get(id_evento=id_evento)
+
+        # Existencia + bloqueo por usuario (en orden de id para evitar deadlocks)
+        existentes = set(
+            Usuario.objects.select_for_update()
+            .filter(id_usuario__in=ids_usuarios)
+            .order_by('id_usuario')
+            .values_list('id_usuario', flat=True)
+        )
+        registrados = set(
+            ParticipacionUsuario.objects.filter(
+                usuario_id__in=existentes,
+                participacion__evento_id=id_evento,
+            ).exclude(participacion__estado_participacion="CANCELADO")
+            .values_list('usuario_id', flat=True)
+        )
+
+        resultados = []
+        candidatos = []
+        vistos = set()
+        for id_usuario in ids_usuarios:
+            if id_usuario in vistos:
+                estado = "DUPLICADO"
+            elif id_usuario not in existentes:
+                estado = "NO_EXISTE"
+            elif id_usuario in registrados:
+                estado = "YA_REGISTRADO"
+            else:
+                estado = "SIN_CUPO"
+                candidatos.append(id_usuario)
+            vistos.add(id_usuario)
+            resultados.append({'id_usuario': id_usuario, 'estado': estado, 'id_participacion': None})
+
+        admitidos = candidatos[:reservar_hasta(evento, len(candidatos))]
+        if not admitidos:
+            return resultados
+
+        nuevas = [
+            Participacion(evento=evento, comentario=comentario, estado_participacion="PENDIENTE")
+            for _ in admitidos
+        ]
+        Participacion.objects.bulk_create(nuevas)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # MySQL no devuelve las PKs de un INSERT múltiple: se leen con un
+            # SELECT. Las filas propias son las más recientes del evento sin
+            # usuarios (las de otras transacciones ya los tienen o aún no son
+            # visibles) y sus PKs crecen en el orden del INSERT.
+            ids = list(
+                Participacion.objects.filter(evento=evento, usuarios__isnull=True)
+                .order_by('-id_participaciones')
+                .values_list('id_participaciones', flat=True)[:len(nuevas)]
+            )
+            for participacion, id_participacion in zip(nuevas, reversed(ids)):
+                participacion.id_participaciones = id_participacion
+        ParticipacionUsuario.objects.bulk_create([
+            ParticipacionUsuario(usuario_id=id_usuario, participacion=participacion)
+            for id_usuario, participacion in zip(admitidos, nuevas)
+        ])
+
+        por_usuario = dict(zip(admitidos, nuevas))
+        for resultado in resultados:
+            participacion = por_usuario.get(resultado['id_usuario'])
+            if participacion is not None and resultado['estado'] == "SIN_CUPO":
+                resultado['estado'] = "REGISTRADO"
+                resultado['id_participacion'] = participacion.id_participaciones
+        return resultados
+
     @staticmethod
     @transaction.atomic
     def confirmar_participacion(id_participacion):
@@ -507,7 +689,7 @@ class ParticipacionService:
             id_participaciones=id_participacion
         )
         participacion.estado_participacion = 'CONFIRMADO'
-        participacion.save()
+        participacion.save(update_fields=['estado_participacion'])
         return participacion
 
     @staticmethod
@@ -515,7 +697,30 @@ class ParticipacionService:
         """Obtener todas las participaciones de un evento"""
         return ParticipacionUsuario.objects.filter(
             participacion__estado_participacion='CONFIRMADO'
-        ).select_related('usuario', 'participacion')
+        ).select_related('usuario', 'participacion').prefetch_related(
+            *ParticipacionService.prefetch_evento_info('participacion__')
+        )
+
+    @staticmethod
+    def prefetch_evento_info(prefijo=''):
+        """
+        Prefetch para serializar participaciones (ParticipacionSerializer)
+        sin consultas por fila: evento con su grupo y cupos ocupados
+        calculados para toda la página, y usuarios de cada participación.
+
+        Args:
+            prefijo (str): Ruta hasta Participacion (p. ej. 'participacion__')
+
+        Returns:
+            list: Objetos para queryset.prefetch_related(*...)
+        """
+        return [
+            Prefetch(
+                f'{prefijo}evento',
+                queryset=con_cupos_ocupados(Evento.objects.select_related('grupo')),
+            ),
+            f'{prefijo}usuarios',
+        ]
 
 
 # ===========================================================================
@@ -578,52 +783,249 @@ class NotificacionService:
     """Servicio de lógica de negocio para Notificaciones"""
 
     @staticmethod
-    @transaction.atomic
-    def enviar_notificacion(ids_usuarios, tipo, mensaje):
+    def enviar_notificacion(ids_usuarios, tipo, mensaje, audiencia=None, difusion=False):
         """
         Enviar notificación a múltiples usuarios
 
+        Las filas USUARIO_NOTIFICACION se insertan por lotes
+        (NOTIFICACIONES_LOTE), cada lote en su propia transacción: el
+        reparto nunca corre dentro de una transacción abierta (si el
+        llamador tiene una, empieza cuando se confirme). Si la audiencia
+        supera NOTIFICACIONES_UMBRAL_DIFERIDO usuarios, el reparto se hace
+        en segundo plano y la notificación queda con `envio_diferido = True`.
+
+        Con `audiencia` los destinatarios se resuelven en el servidor
+        (grupos/audiencias.py) y el reparto siempre es diferido, porque su
+        tamaño no se conoce sin contarla. Con `difusion=True` no hay
+        reparto: se guarda la audiencia y solo se registran las lecturas.
+
         Args:
-            ids_usuarios (list): Lista de IDs de usuarios
+            ids_usuarios (list): Lista de IDs de usuarios (o None)
             tipo (str): Tipo de notificación
             mensaje (str): Mensaje
+            audiencia (dict): {'tipo': 'GRUPO'|'EVENTO'|'ROL', 'id': int}
+            difusion (bool): Guardar como difusión (requiere audiencia)
 
         Returns:
             Notificacion: Notificación creada
         """
+        if difusion and not audiencia:
+            raise ValidationError("Una difusión requiere una audiencia")
+        if audiencia:
+            validar_audiencia(audiencia['tipo'], audiencia['id'])
+
+        if difusion:
+            with transaction.atomic():
+                notificacion = Notificacion.objects.create(
+                    tipo_notificacion=tipo,
+                    mensaje=mensaje,
+                    audiencia_tipo=audiencia['tipo'],
+                    audiencia_id=audiencia['id'],
+                )
+                notificacion.envio_diferido = False
+                ajustar_no_leidas(
+                    Usuario.objects.filter(id_usuario__in=usuarios_audiencia(
+                        audiencia['tipo'], audiencia['id']
+                    ).values('usuario_id')),
+                    1
+                )
+                canal = canal_audiencia(audiencia['tipo'], audiencia['id'])
+                transaction.on_commit(lambda: broker_notificaciones.publicar([canal]))
+            return notificacion
+
         notificacion = Notificacion.objects.create(
             tipo_notificacion=tipo,
             mensaje=mensaje
         )
 
-        # Relacionar con usuarios
-        for id_usuario in ids_usuarios:
-            usuario = Usuario.objects.get(id_usuario=id_usuario)
-            UsuarioNotificacion.objects.create(
-                usuario=usuario,
-                notificacion=notificacion,
-                leida=False
+        if audiencia:
+            notificacion.envio_diferido = True
+            en_segundo_plano(
+                NotificacionService.distribuir_audiencia,
+                notificacion.id_notificacion, audiencia['tipo'], audiencia['id']
+            )
+            return notificacion
+
+        ids_usuarios = list(dict.fromkeys(ids_usuarios))
+        notificacion.envio_diferido = (
+            len(ids_usuarios) > settings.NOTIFICACIONES_UMBRAL_DIFERIDO
+        )
+        if notificacion.envio_diferido:
+            en_segundo_plano(
+                NotificacionService.distribuir_notificacion,
+                notificacion.id_notificacion, ids_usuarios
+            )
+        else:
+            # Sin transacción abierta corre ya; si no, al confirmarse
+            transaction.on_commit(
+                lambda: NotificacionService.distribuir_notificacion(
+                    notificacion.id_notificacion, ids_usuarios
+                )
             )
 
         return notificacion
 
     @staticmethod
-    def obtener_notificaciones_usuario(id_usuario):
-        """Obtener notificaciones de un usuario"""
-        return UsuarioNotificacion.objects.filter(
-            usuario_id=id_usuario
-        ).select_related('notificacion').order_by(
-            '-notificacion__fecha_envio'
+    def distribuir_notificacion(id_notificacion, ids_usuarios, tamano_lote=None):
+        """
+        Relacionar una notificación con sus destinatarios por lotes.
+
+        Por cada lote: una consulta para descartar usuarios inexistentes,
+        un INSERT múltiple y un UPDATE del contador de no leídas, cada lote
+        en su propia transacción corta.
+
+        Returns:
+            int: Filas USUARIO_NOTIFICACION creadas
+        """
+        tamano_lote = tamano_lote or settings.NOTIFICACIONES_LOTE
+        creadas = 0
+        for inicio in range(0, len(ids_usuarios), tamano_lote):
+            lote = ids_usuarios[inicio:inicio + tamano_lote]
+            with transaction.atomic():
+                existentes = list(Usuario.objects.filter(
+                    id_usuario__in=lote
+                ).values_list('id_usuario', flat=True))
+                ajustar_no_leidas(Usuario.objects.filter(id_usuario__in=existentes), 1)
+                creadas += len(UsuarioNotificacion.objects.bulk_create(
+                    [
+                        UsuarioNotificacion(
+                            usuario_id=id_usuario,
+                            notificacion_id=id_notificacion,
+                            leida=False
+                        )
+                        for id_usuario in existentes
+                    ],
+                    ignore_conflicts=True,
+                ))
+                # Avisar a las esperas (long-poll) cuando el lote sea visible
+                transaction.on_commit(
+                    lambda ids=existentes: broker_notificaciones.publicar(
+                        [canal_usuario(id_usuario) for id_usuario in ids]
+                    )
+                )
+        return creadas
+
+    @staticmethod
+    def distribuir_audiencia(id_notificacion, tipo, id_referencia, tamano_lote=None):
+        """Repartir a una audiencia (INSERT ... SELECT por lotes) y avisar a su canal."""
+        creadas = insertar_destinatarios(
+            id_notificacion, tipo, id_referencia,
+            tamano_lote or settings.NOTIFICACIONES_LOTE
         )
+        broker_notificaciones.publicar([canal_audiencia(tipo, id_referencia)])
+        return creadas
+
+    @staticmethod
+    def obtener_notificaciones_usuario(id_usuario):
+        """
+        Bandeja de un usuario: notificaciones individuales y difusiones
+        de sus audiencias, anotadas con `leida` (una sola consulta, UNION
+        de ramas indexadas; ver grupos/audiencias.Bandeja).
+        """
+        buffer_lecturas.intentar_vaciar(id_usuario)
+        return Bandeja.de_usuario(id_usuario)
 
     @staticmethod
     @transaction.atomic
     def marcar_como_leida(id_usuario, id_notificacion):
-        """Marcar notificación como leída"""
-        relacion = UsuarioNotificacion.objects.get(
+        """
+        Marcar notificación como leída.
+
+        En difusiones la fila USUARIO_NOTIFICACION (acuse de lectura) se
+        crea aquí, si la notificación está en la bandeja del usuario.
+        """
+        relacion = UsuarioNotificacion.objects.filter(
             usuario_id=id_usuario,
             notificacion_id=id_notificacion
-        )
-        relacion.leida = True
-        relacion.save()
+        ).first()
+        if relacion is None:
+            en_bandeja = Notificacion.objects.filter(
+                condicion_bandeja(id_usuario), id_notificacion=id_notificacion
+            ).exists()
+            if not en_bandeja:
+                raise UsuarioNotificacion.DoesNotExist(
+                    "La notificación no está en la bandeja del usuario"
+                )
+            relacion, creada = UsuarioNotificacion.objects.get_or_create(
+                usuario_id=id_usuario,
+                notificacion_id=id_notificacion,
+                defaults={'leida': True}
+            )
+            if creada:
+                ajustar_no_leidas(Usuario.objects.filter(id_usuario=id_usuario), -1)
+        if not relacion.leida:
+            # UPDATE condicional: dos lecturas simultáneas descuentan una vez
+            if UsuarioNotificacion.objects.filter(pk=relacion.pk, leida=False).update(leida=True):
+                ajustar_no_leidas(Usuario.objects.filter(id_usuario=id_usuario), -1)
+            relacion.leida = True
         return relacion
+
+    @staticmethod
+    def registrar_lectura(id_usuario, id_notificacion):
+        """
+        Marcar como leída con escritura diferida (BufferLecturas): las
+        lecturas de un mismo intervalo se escriben juntas en lote.
+
+        Raises:
+            UsuarioNotificacion.DoesNotExist: Si la notificación no está en
+            la bandeja del usuario (se comprueba antes de encolar)
+        """
+        en_bandeja = Notificacion.objects.filter(
+            condicion_bandeja(id_usuario), id_notificacion=id_notificacion
+        ).exists()
+        if not en_bandeja:
+            raise UsuarioNotificacion.DoesNotExist(
+                "La notificación no está en la bandeja del usuario"
+            )
+        buffer_lecturas.agregar(id_usuario, id_notificacion)
+
+    @staticmethod
+    @transaction.atomic
+    def marcar_leidas(id_usuario, hasta=None, ids_notificaciones=None):
+        """
+        Marcar varias notificaciones como leídas con operaciones por conjunto.
+
+        Sin filtros marca toda la bandeja; `hasta` limita a las enviadas
+        hasta esa fecha y `ids_notificaciones` a una lista de IDs (las que
+        no estén en la bandeja del usuario se ignoran).
+
+        Returns:
+            int: Notificaciones que pasaron a leídas
+        """
+        notificaciones = Notificacion.objects.all()
+        if hasta is not None:
+            notificaciones = notificaciones.filter(fecha_envio__lte=hasta)
+        if ids_notificaciones is not None:
+            notificaciones = notificaciones.filter(id_notificacion__in=ids_notificaciones)
+        return marcar_leidas(id_usuario, notificaciones)
+
+    @staticmethod
+    def esperar_novedades(id_usuario, desde=None, timeout=None):
+        """
+        Long-poll: bloquear hasta que el usuario tenga notificaciones nuevas.
+
+        Args:
+            id_usuario (int): ID del usuario
+            desde (int): Marca devuelta por la llamada anterior (None = ahora)
+            timeout (float): Segundos máximos (tope NOTIFICACIONES_PUSH_ESPERA)
+
+        Returns:
+            dict: {'hay_nuevas': bool, 'marca': int} — `marca` es el `desde`
+            de la siguiente llamada
+        """
+        maximo = settings.NOTIFICACIONES_PUSH_ESPERA
+        timeout = maximo if timeout is None else max(0, min(timeout, maximo))
+        if desde is None:
+            desde = broker_notificaciones.marca_actual()
+        # Canales resueltos al inicio; la espera en sí no consulta la BD
+        canales = canales_de_usuario(id_usuario)
+        marca = broker_notificaciones.esperar(canales, desde, timeout)
+        return {'hay_nuevas': marca is not None, 'marca': marca or desde}
+
+    @staticmethod
+    def contar_no_leidas(id_usuario):
+        """Badge de la bandeja: lectura por PK del contador mantenido."""
+        buffer_lecturas.intentar_vaciar(id_usuario)
+        return Usuario.objects.filter(id_usuario=id_usuario).values_list(
+            'notificaciones_no_leidas', flat=True
+        ).get()
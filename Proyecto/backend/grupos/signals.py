@@ -0,0 +1,250 @@
+"""
+Signals (Observer) - ÁgoraUN
+
+Observadores sobre los modelos que mantienen datos derivados:
+- Contadores denormalizados de Grupo (total_miembros, total_eventos)
+- Índice de búsqueda de grupos (GRUPO_TERMINO)
+- Conteos por faceta de grupos (GRUPO_FACETA)
+- Cache de la página explorar_intereses
+- Cupos ocupados de eventos al cancelar/eliminar participaciones
+- Contador de notificaciones no leídas al cambiar la pertenencia a una
+  audiencia de difusión o al eliminar notificaciones
+- Cache de autenticación por token (logout, token eliminado, cambios
+  del Usuario como estado_usuario)
+- Generación de tablas del cache de QuerySets (grupos/cache_consultas.py)
+
+Se usan signals en lugar de hacerlo en los services para que los
+contadores sigan siendo correctos también en borrados en cascada
+(p. ej. eliminar un Usuario elimina sus filas de UsuarioGrupo).
+"""
+
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from .auth import UsuarioAuthToken
+from .audiencias import ajustar_no_leidas, descontar_notificacion, difusiones_no_leidas
+from .cache_consultas import incrementar_generacion
+from .cupos import liberar_cupo
+from .models import (
+    Usuario, Grupo, Evento, CupoFragmento, Notificacion, Participacion,
+    ParticipacionUsuario, UsuarioGrupo, UsuarioRol
+)
+from .singletons import grupo_cache, token_cache
+from .search import (
+    CAMPOS_INDEXADOS, FACETAS,
+    indexar_grupo, ajustar_facetas, valores_faceta,
+)
+
+
+def _ajustar_contador(id_grupo, campo, delta):
+    """Sumar `delta` al contador `campo` del grupo con un UPDATE atómico."""
+    queryset = Grupo.objects.filter(id_grupo=id_grupo)
+    if delta < 0:
+        # Nunca dejar el contador por debajo de 0 (columna sin signo)
+        queryset = queryset.filter(**{f'{campo}__gte': -delta})
+    if queryset.update(**{campo: F(campo) + delta}):
+        grupo_cache.invalidate_grupo(id_grupo)
+
+
+# ===========================================================================
+# CONTADORES DE GRUPO
+# ===========================================================================
+
+@receiver(post_save, sender=UsuarioGrupo)
+def miembro_agregado(sender, instance, created, **kwargs):
+    if created:
+        _ajustar_contador(instance.grupo_id, 'total_miembros', 1)
+
+
+@receiver(post_delete, sender=UsuarioGrupo)
+def miembro_eliminado(sender, instance, **kwargs):
+    _ajustar_contador(instance.grupo_id, 'total_miembros', -1)
+
+
+@receiver(post_save, sender=Evento)
+def evento_creado(sender, instance, created, **kwargs):
+    if created:
+        _ajustar_contador(instance.grupo_id, 'total_eventos', 1)
+
+
+@receiver(post_delete, sender=Evento)
+def evento_eliminado(sender, instance, **kwargs):
+    _ajustar_contador(instance.grupo_id, 'total_eventos', -1)
+
+
+# ===========================================================================
+# ÍNDICE DE BÚSQUEDA
+# ===========================================================================
+
+@receiver(post_save, sender=Grupo)
+def grupo_guardado(sender, instance, created, update_fields=None, **kwargs):
+    # Reindexar solo si cambió algún campo indexado (p. ej. aprobar no lo hace)
+    indexados = {campo for campo, _ in CAMPOS_INDEXADOS}
+    if update_fields is None or indexados.intersection(update_fields):
+        indexar_grupo(instance)
+
+
+# ===========================================================================
+# FACETAS
+# ===========================================================================
+
+@receiver(pre_save, sender=Grupo)
+def grupo_por_guardar(sender, instance, update_fields=None, **kwargs):
+    # Recordar los valores de faceta previos para poder descontarlos
+    instance._facetas_previas = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and not set(FACETAS).intersection(update_fields):
+        return
+    instance._facetas_previas = (
+        Grupo.objects.filter(pk=instance.pk).values(*FACETAS).first()
+    )
+
+
+@receiver(post_save, sender=Grupo)
+def facetas_grupo_guardado(sender, instance, created, **kwargs):
+    nuevas = valores_faceta(instance)
+    if created:
+        ajustar_facetas(nuevas, 1)
+        return
+    previas = getattr(instance, '_facetas_previas', None)
+    if previas:
+        ajustar_facetas({c: v for c, v in previas.items() if v != nuevas[c]}, -1)
+        ajustar_facetas({c: v for c, v in nuevas.items() if v != previas[c]}, 1)
+
+
+@receiver(post_delete, sender=Grupo)
+def facetas_grupo_eliminado(sender, instance, **kwargs):
+    ajustar_facetas(valores_faceta(instance), -1)
+
+
+# ===========================================================================
+# CACHE
+# ===========================================================================
+
+@receiver(post_save, sender=Grupo)
+@receiver(post_delete, sender=Grupo)
+def invalidar_cache_grupo(sender, instance, **kwargs):
+    grupo_cache.invalidate_grupo(instance.id_grupo)
+    grupo_cache.invalidate_explorar_intereses()
+
+
+@receiver(post_save, sender=Grupo)
+@receiver(post_delete, sender=Grupo)
+@receiver(post_save, sender=Evento)
+@receiver(post_delete, sender=Evento)
+@receiver(post_save, sender=CupoFragmento)
+@receiver(post_delete, sender=CupoFragmento)
+@receiver(post_save, sender=UsuarioGrupo)
+@receiver(post_delete, sender=UsuarioGrupo)
+@receiver(post_save, sender=ParticipacionUsuario)
+@receiver(post_delete, sender=ParticipacionUsuario)
+def versionar_tabla(sender, using, **kwargs):
+    incrementar_generacion(sender._meta.db_table, using=using)
+
+
+# ===========================================================================
+# CUPOS DE EVENTOS
+# ===========================================================================
+
+@receiver(pre_save, sender=Participacion)
+def participacion_por_guardar(sender, instance, update_fields=None, **kwargs):
+    # Recordar el estado previo para detectar cancelaciones
+    instance._estado_previo = None
+    if instance._state.adding:
+        return
+    if update_fields is not None and 'estado_participacion' not in update_fields:
+        return
+    instance._estado_previo = (
+        Participacion.objects.filter(pk=instance.pk)
+        .values_list('estado_participacion', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Participacion)
+def participacion_cancelada(sender, instance, created, **kwargs):
+    previo = getattr(instance, '_estado_previo', None)
+    if previo and previo != 'CANCELADO' and instance.estado_participacion == 'CANCELADO':
+        liberar_cupo(instance.evento_id)
+
+
+@receiver(post_delete, sender=Participacion)
+def participacion_eliminada(sender, instance, **kwargs):
+    if instance.estado_participacion != 'CANCELADO':
+        liberar_cupo(instance.evento_id)
+
+
+# ===========================================================================
+# NOTIFICACIONES NO LEÍDAS
+# ===========================================================================
+
+def _cambio_audiencia(ids_usuarios, tipo, id_referencia, signo):
+    """Sumar/restar las difusiones sin leer de la audiencia que se gana/pierde."""
+    for id_usuario in ids_usuarios:
+        pendientes = difusiones_no_leidas(id_usuario, tipo, id_referencia)
+        if pendientes:
+            ajustar_no_leidas(Usuario.objects.filter(id_usuario=id_usuario), signo * pendientes)
+
+
+@receiver(post_save, sender=UsuarioGrupo)
+def audiencia_grupo_ganada(sender, instance, created, **kwargs):
+    if created:
+        _cambio_audiencia([instance.usuario_id], 'GRUPO', instance.grupo_id, 1)
+
+
+@receiver(post_delete, sender=UsuarioGrupo)
+def audiencia_grupo_perdida(sender, instance, **kwargs):
+    _cambio_audiencia([instance.usuario_id], 'GRUPO', instance.grupo_id, -1)
+
+
+@receiver(post_save, sender=UsuarioRol)
+def audiencia_rol_ganada(sender, instance, created, **kwargs):
+    if created:
+        _cambio_audiencia([instance.usuario_id], 'ROL', instance.rol_id, 1)
+
+
+@receiver(post_delete, sender=UsuarioRol)
+def audiencia_rol_perdida(sender, instance, **kwargs):
+    _cambio_audiencia([instance.usuario_id], 'ROL', instance.rol_id, -1)
+
+
+@receiver(post_save, sender=Participacion)
+def audiencia_evento_cambiada(sender, instance, created, **kwargs):
+    previo = getattr(instance, '_estado_previo', None)
+    if previo is None or previo == instance.estado_participacion:
+        return
+    if 'CONFIRMADO' in (previo, instance.estado_participacion):
+        signo = 1 if instance.estado_participacion == 'CONFIRMADO' else -1
+        ids_usuarios = instance.usuarios.values_list('id_usuario', flat=True)
+        _cambio_audiencia(ids_usuarios, 'EVENTO', instance.evento_id, signo)
+
+
+@receiver(pre_delete, sender=Participacion)
+def audiencia_evento_eliminada(sender, instance, **kwargs):
+    # pre_delete: después de la cascada ya no quedan filas ParticipacionUsuario
+    if instance.estado_participacion == 'CONFIRMADO':
+        ids_usuarios = instance.usuarios.values_list('id_usuario', flat=True)
+        _cambio_audiencia(ids_usuarios, 'EVENTO', instance.evento_id, -1)
+
+
+@receiver(pre_delete, sender=Notificacion)
+def notificacion_por_eliminar(sender, instance, **kwargs):
+    descontar_notificacion(instance)
+
+
+# ===========================================================================
+# CACHE DE AUTENTICACIÓN
+# ===========================================================================
+
+@receiver(post_delete, sender=UsuarioAuthToken)
+def token_eliminado(sender, instance, **kwargs):
+    token_cache.invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=Usuario)
+def usuario_guardado(sender, instance, created, **kwargs):
+    # Estado u otros datos cambiados: las entradas cacheadas ya no sirven
+    if not created:
+        keys = UsuarioAuthToken.objects.filter(usuario=instance).values_list('key', flat=True)
+        token_cache.invalidate_usuario(instance.id_usuario, keys)
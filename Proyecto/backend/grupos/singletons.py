@@ -1,11 +1,111 @@
+import atexit
+import copy
+import hashlib
 import logging
-from django.core.cache import cache
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
 
-from .models import Grupo
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from .audiencias import marcar_leidas
+from .models import Grupo, Notificacion
+from .tareas import en_segundo_plano
 
 logger = logging.getLogger(__name__)
 
 
+class EstadisticasCache:
+    """
+    Contadores de un namespace de cache, actualizados en cada operación
+    (sin recorrer claves del backend). Son del proceso actual.
+
+    - aciertos / fallos
+    - desalojos: fallos sobre claves que este proceso guardó y no invalidó
+      (vencidas o desalojadas por el backend), más los desalojos LRU propios
+    - entradas / bytes: lo que este proceso guardó y sigue vigente (tamaño
+      del valor serializado con pickle)
+    - cargas / tiempo medio de carga desde la BD
+    """
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self._lock = threading.Lock()
+        self._tamanos = {}
+        self.aciertos = self.fallos = self.desalojos = self.invalidaciones = 0
+        self.cargas = 0
+        self.tiempo_carga = 0.0
+
+    def acierto(self):
+        with self._lock:
+            self.aciertos += 1
+
+    def fallo(self, clave):
+        with self._lock:
+            self.fallos += 1
+            if self._tamanos.pop(clave, None) is not None:
+                self.desalojos += 1
+
+    def guardado(self, clave, valor, segundos_carga=None):
+        tamano = len(pickle.dumps(valor, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._tamanos[clave] = tamano
+            if segundos_carga is not None:
+                self.cargas += 1
+                self.tiempo_carga += segundos_carga
+
+    def invalidado(self, clave):
+        with self._lock:
+            if self._tamanos.pop(clave, None) is not None:
+                self.invalidaciones += 1
+
+    def desalojado(self, clave):
+        with self._lock:
+            self._tamanos.pop(clave, None)
+            self.desalojos += 1
+
+    def resumen(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': round(self.aciertos / consultas, 4) if consultas else None,
+                'desalojos': self.desalojos,
+                'invalidaciones': self.invalidaciones,
+                'entradas': len(self._tamanos),
+                'bytes': sum(self._tamanos.values()),
+                'cargas': self.cargas,
+                'carga_media_ms': round(self.tiempo_carga / self.cargas * 1000, 3) if self.cargas else None,
+            }
+
+
+_estadisticas = {}
+_estadisticas_lock = threading.Lock()
+
+
+def estadisticas_cache(nombre):
+    """Contadores del namespace `nombre` (se crean al primer uso)."""
+    with _estadisticas_lock:
+        if nombre not in _estadisticas:
+            _estadisticas[nombre] = EstadisticasCache(nombre)
+        return _estadisticas[nombre]
+
+
+def resumen_estadisticas(nombre=None):
+    """Resumen de un namespace o de todos ({namespace: contadores})."""
+    with _estadisticas_lock:
+        seleccion = [_estadisticas[nombre]] if nombre in _estadisticas else (
+            [] if nombre else list(_estadisticas.values())
+        )
+    return {stats.nombre: stats.resumen() for stats in seleccion}
+
+
 class GrupoCacheManager:
     """
     Singleton para cache específico de grupos
@@ -16,44 +116,426 @@ class GrupoCacheManager:
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._instance._cache_prefix = "grupo_"
+            cls._instance._stats_grupo = estadisticas_cache('grupo')
+            cls._instance._stats_explorar = estadisticas_cache('explorar_intereses')
             logger.info("GrupoCacheManager Singleton creado")
         return cls._instance
 
+    # ----------------------- Grupo (read-through) -------------------------
+    #
+    # Entrada: {'datos': payload de GrupoSerializer o None (no existe),
+    #           'fresco_hasta': epoch}. Vive GRUPO_CACHE_TTL + GRUPO_CACHE_STALE
+    # segundos: pasada la frescura se sirve igual mientras una sola carga
+    # la renueva en segundo plano (stale-while-revalidate). Los IDs
+    # inexistentes se cachean GRUPO_CACHE_TTL_NEGATIVO segundos.
+    # Con la clave vencida, solo quien obtiene el candado ('..._carga',
+    # cache.add atómico) consulta la BD; el resto espera su resultado.
+
+    def _grupo_key(self, grupo_id):
+        return f"{self._cache_prefix}{grupo_id}"
+
+    def _cargar_grupo(self, grupo_id):
+        """Consultar la BD, guardar la entrada y devolver el payload."""
+        from .serializers import GrupoSerializer
+
+        cache_key = self._grupo_key(grupo_id)
+        inicio = time.perf_counter()
+        grupo = Grupo.objects.filter(id_grupo=grupo_id).first()
+        datos = dict(GrupoSerializer(grupo).data) if grupo is not None else None
+        ttl = settings.GRUPO_CACHE_TTL if grupo is not None else settings.GRUPO_CACHE_TTL_NEGATIVO
+        entrada = {'datos': datos, 'fresco_hasta': time.time() + ttl}
+        cache.set(cache_key, entrada, ttl + settings.GRUPO_CACHE_STALE)
+        self._stats_grupo.guardado(cache_key, entrada, time.perf_counter() - inicio)
+        logger.info("Grupo %s cargado desde BD y cacheado", grupo_id)
+        return datos
+
+    def _recargar_grupo(self, grupo_id):
+        try:
+            self._cargar_grupo(grupo_id)
+        finally:
+            cache.delete(f"{self._grupo_key(grupo_id)}_carga")
+
     def get_grupo(self, grupo_id):
-        """Obtener grupo desde cache o BD"""
-        cache_key = f"{self._cache_prefix}{grupo_id}"
-        grupo_data = cache.get(cache_key)
+        """Obtener grupo (payload de GrupoSerializer) desde cache o BD; None si no existe"""
+        cache_key = self._grupo_key(grupo_id)
+        candado = f"{cache_key}_carga"
+        entrada = cache.get(cache_key)
 
-        if grupo_data is None:
-            # Simular carga desde BD
-            try:
-                grupo = Grupo.objects.get(id_grupo=grupo_id)
-                grupo_data = {
-                    'id': grupo.id_grupo,
-                    'nombre': grupo.nombre_grupo,
-                    'area': grupo.area_interes
-                }
-                # Guardar en cache por 15 minutos
-                cache.set(cache_key, grupo_data, 900)
-                logger.info("Grupo %s cargado desde BD y cacheado", grupo_id)
-            except Grupo.DoesNotExist:
-                return None
+        if entrada is not None:
+            self._stats_grupo.acierto()
+            if entrada['fresco_hasta'] < time.time() and cache.add(
+                candado, 1, settings.GRUPO_CACHE_ESPERA
+            ):
+                en_segundo_plano(self._recargar_grupo, grupo_id)
+            return entrada['datos']
 
-        return grupo_data
+        self._stats_grupo.fallo(cache_key)
+        limite = time.monotonic() + settings.GRUPO_CACHE_ESPERA
+        while not cache.add(candado, 1, settings.GRUPO_CACHE_ESPERA):
+            # Otra petición está cargando la clave: esperar su resultado
+            time.sleep(0.05)
+            entrada = cache.get(cache_key)
+            if entrada is not None:
+                return entrada['datos']
+            if time.monotonic() > limite:
+                return self._cargar_grupo(grupo_id)
+        try:
+            # La carga anterior pudo terminar entre el último get y el add
+            entrada = cache.get(cache_key)
+            if entrada is not None:
+                return entrada['datos']
+            return self._cargar_grupo(grupo_id)
+        finally:
+            cache.delete(candado)
 
     def invalidate_grupo(self, grupo_id):
-        """Invalidar cache de un grupo"""
-        cache_key = f"{self._cache_prefix}{grupo_id}"
+        """Invalidar cache de un grupo (ahora y al confirmar la transacción)"""
+        cache_key = self._grupo_key(grupo_id)
         cache.delete(cache_key)
+        # Una carga concurrente pudo leer la versión anterior antes del COMMIT
+        transaction.on_commit(lambda: cache.delete(cache_key))
+        self._stats_grupo.invalidado(cache_key)
         logger.info("Cache de grupo %s invalidado", grupo_id)
 
+    def get_explorar_intereses(self, renderizar):
+        """
+        HTML de la página explorar_intereses desde cache.
+        `renderizar` es una función sin argumentos que lo genera si no está.
+        """
+        cache_key = f"{self._cache_prefix}explorar_intereses"
+        html = cache.get(cache_key)
+        if html is None:
+            self._stats_explorar.fallo(cache_key)
+            inicio = time.perf_counter()
+            html = renderizar()
+            # Se invalida al crear/editar/eliminar grupos (grupos/signals.py)
+            cache.set(cache_key, html, 600)
+            self._stats_explorar.guardado(cache_key, html, time.perf_counter() - inicio)
+        else:
+            self._stats_explorar.acierto()
+        return html
+
+    def invalidate_explorar_intereses(self):
+        """Invalidar el HTML cacheado de explorar_intereses"""
+        cache_key = f"{self._cache_prefix}explorar_intereses"
+        cache.delete(cache_key)
+        self._stats_explorar.invalidado(cache_key)
+
     def get_estadisticas(self):
-        """Obtener estadísticas de cache"""
+        """Obtener estadísticas de cache (contadores, sin recorrer claves)"""
         return {
-            'total_grupos_cache': len([key for key in cache.keys() if key.startswith(self._cache_prefix)]),
-            'cache_prefix': self._cache_prefix
+            'cache_prefix': self._cache_prefix,
+            'namespaces': resumen_estadisticas(),
         }
 
 
-# Instancia global
+class BufferLecturas:
+    """
+    Singleton: buffer de escritura diferida (write-behind) para acuses de
+    lectura de notificaciones.
+
+    - `agregar` solo guarda (usuario, notificación) en memoria; un hilo
+      los escribe cada LECTURAS_VENTANA segundos en una sola transacción,
+      con UPDATEs por conjunto por usuario (audiencias.marcar_leidas).
+    - Lecturas consistentes para el mismo usuario: antes de leer su
+      bandeja o su contador se vacían sus pendientes (`vaciar(id_usuario)`).
+      Solo dentro del mismo proceso: el buffer es local, así que otro
+      worker puede mostrar la notificación como no leída hasta LECTURAS_VENTANA
+      segundos después (usar 0 si se requiere consistencia entre workers).
+    - Al terminar el proceso (atexit) se vacía todo lo pendiente.
+    - Con LECTURAS_VENTANA = 0 se escribe de inmediato (sin buffer).
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._pendientes = {}   # {id_usuario: {id_notificacion, ...}}
+            cls._instance._total = 0
+            cls._instance._lock = threading.Lock()
+            cls._instance._hilo = None
+            atexit.register(cls._instance.vaciar)
+            logger.info("BufferLecturas Singleton creado")
+        return cls._instance
+
+    def agregar(self, id_usuario, id_notificacion):
+        """Registrar que el usuario leyó la notificación."""
+        if not settings.LECTURAS_VENTANA:
+            with transaction.atomic():
+                marcar_leidas(id_usuario, Notificacion.objects.filter(id_notificacion=id_notificacion))
+            return
+        with self._lock:
+            ids = self._pendientes.setdefault(id_usuario, set())
+            if id_notificacion not in ids:
+                ids.add(id_notificacion)
+                self._total += 1
+            lleno = self._total >= settings.LECTURAS_MAX_PENDIENTES
+            self._iniciar_hilo()
+        if lleno:
+            self.intentar_vaciar()
+
+    def pendientes(self, id_usuario):
+        """IDs de notificaciones leídas por el usuario aún sin escribir."""
+        with self._lock:
+            return set(self._pendientes.get(id_usuario, ()))
+
+    def vaciar(self, id_usuario=None):
+        """
+        Escribir los acuses pendientes (de todos o de un usuario) en una
+        transacción. Si falla, vuelven al buffer para el siguiente intento.
+
+        Returns:
+            int: Notificaciones que pasaron a leídas
+        """
+        with self._lock:
+            if id_usuario is None:
+                lote, self._pendientes = self._pendientes, {}
+            else:
+                ids = self._pendientes.pop(id_usuario, None)
+                lote = {id_usuario: ids} if ids else {}
+            self._total -= sum(len(ids) for ids in lote.values())
+        if not lote:
+            return 0
+
+        try:
+            with transaction.atomic():
+                return sum(
+                    marcar_leidas(usuario, Notificacion.objects.filter(id_notificacion__in=ids))
+                    for usuario, ids in lote.items()
+                )
+        except Exception:
+            with self._lock:
+                for usuario, ids in lote.items():
+                    previos = self._pendientes.setdefault(usuario, set())
+                    self._total += len(ids - previos)
+                    previos.update(ids)
+            raise
+
+    def intentar_vaciar(self, id_usuario=None):
+        """
+        `vaciar` para rutas de petición: si la BD falla, los acuses quedan
+        en el buffer (se reintentan en el siguiente ciclo) y la petición
+        continúa.
+        """
+        try:
+            return self.vaciar(id_usuario)
+        except Exception:  # noqa: BLE001 - vaciar ya los devolvió al buffer
+            logger.exception("Error al escribir acuses de lectura; se reintentará")
+            return 0
+
+    def _iniciar_hilo(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(
+                target=self._ciclo, name='agoraun-lecturas', daemon=True
+            )
+            self._hilo.start()
+
+    def _ciclo(self):
+        while True:
+            time.sleep(settings.LECTURAS_VENTANA or 1)
+            try:
+                self.vaciar()
+            except Exception:  # noqa: BLE001 - se reintenta en el siguiente ciclo
+                logger.exception("Error al escribir acuses de lectura")
+            finally:
+                connection.close()
+
+
+class BrokerNotificaciones:
+    """
+    Singleton: broker en proceso para avisar de notificaciones nuevas
+    (long-poll, ver grupos/push.py).
+
+    Las esperas duermen en una Condition: no consumen CPU mientras no hay
+    novedades. Una publicación en este proceso las despierta al instante;
+    las de otros procesos se detectan consultando el backend cada
+    NOTIFICACIONES_PUSH_SONDEO segundos.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._condicion = threading.Condition()
+            cls._instance._backend = None
+            logger.info("BrokerNotificaciones Singleton creado")
+        return cls._instance
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(settings.NOTIFICACIONES_PUSH_BACKEND)()
+        return self._backend
+
+    @staticmethod
+    def marca_actual():
+        """Estampa de tiempo en µs (cursor de las esperas)."""
+        return time.time_ns() // 1000
+
+    def publicar(self, canales):
+        """Marcar canales con novedades y despertar a las esperas."""
+        if not canales:
+            return
+        self.backend.publicar(canales, self.marca_actual())
+        with self._condicion:
+            self._condicion.notify_all()
+
+    def esperar(self, canales, desde, timeout):
+        """
+        Bloquear hasta que algún canal tenga una marca posterior a `desde`.
+
+        Returns:
+            int | None: Marca más reciente, o None si se agotó el tiempo
+        """
+        limite = time.monotonic() + timeout
+        while True:
+            marca = self.backend.ultima_marca(canales)
+            if marca > desde:
+                return marca
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            with self._condicion:
+                self._condicion.wait(min(restante, settings.NOTIFICACIONES_PUSH_SONDEO))
+
+
+class TokenCacheManager:
+    """
+    Singleton para cache de autenticación por token (UsuarioTokenAuthentication)
+
+    Dos niveles:
+    - Local: LRU en memoria del proceso (AUTH_CACHE_MAX entradas) con TTL
+      corto (AUTH_CACHE_TTL_LOCAL): sin BD.
+    - Compartido (opcional, AUTH_CACHE_COMPARTIDO): cache de Django con TTL
+      AUTH_CACHE_TTL_COMPARTIDO; la clave es el SHA-256 del token.
+    Se invalida al borrar el token y al guardar el Usuario (grupos/signals.py)
+    publicando una generación de revocación por token en el cache de
+    versiones (compartido entre procesos). Cada entrada guarda la generación
+    vigente al cargarla y cada acierto la compara: una entrada revocada en
+    otro proceso deja de servir en la siguiente petición.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._cache_prefix = "auth_token_v2_"    # entradas con generación
+            cls._instance._revocacion_prefix = "auth_revocacion_"
+            cls._instance._lru = OrderedDict()    # {key: (vence, id_usuario, valor, revocacion)}
+            cls._instance._lock = threading.Lock()
+            cls._instance._stats = estadisticas_cache('auth_token')
+            logger.info("TokenCacheManager Singleton creado")
+        return cls._instance
+
+    def _shared_key(self, key):
+        return f"{self._cache_prefix}{hashlib.sha256(key.encode()).hexdigest()}"
+
+    def _revocacion_key(self, key):
+        return f"{self._revocacion_prefix}{hashlib.sha256(key.encode()).hexdigest()}"
+
+    def revocacion(self, key):
+        """
+        Generación de revocación vigente del token (None si nunca se revocó).
+        Leerla ANTES de cargar el token de la BD y pasarla a set_token: una
+        revocación entre la lectura y el guardado invalida la entrada.
+        """
+        return caches[settings.CACHE_VERSIONES_ALIAS].get(self._revocacion_key(key))
+
+    def get_token(self, key):
+        """(usuario, token) cacheados o None. Devuelve copias de las instancias."""
+        with self._lock:
+            entrada = self._lru.get(key)
+        if entrada is not None:
+            vigente = entrada[0] > time.monotonic() and entrada[3] == self.revocacion(key)
+            with self._lock:
+                if vigente and self._lru.get(key) is entrada:
+                    self._lru.move_to_end(key)
+                    self._stats.acierto()
+                    return tuple(copy.copy(obj) for obj in entrada[2])
+                if self._lru.get(key) is entrada:
+                    del self._lru[key]
+
+        if settings.AUTH_CACHE_COMPARTIDO:
+            compartido = cache.get(self._shared_key(key))
+            if compartido is not None:
+                usuario, token, revocacion = compartido
+                if revocacion == self.revocacion(key):
+                    self._stats.acierto()
+                    self._set_local(key, (usuario, token), revocacion)
+                    return (usuario, token)
+        self._stats.fallo(key)
+        return None
+
+    def set_token(self, key, usuario, token, segundos_carga=None, revocacion=None):
+        """
+        Guardar el resultado de una autenticación exitosa. `revocacion` es la
+        generación leída con revocacion() antes de consultar la BD.
+        """
+        valor = (usuario, token)
+        self._set_local(key, valor, revocacion, segundos_carga)
+        if settings.AUTH_CACHE_COMPARTIDO:
+            cache.set(
+                self._shared_key(key), (usuario, token, revocacion),
+                settings.AUTH_CACHE_TTL_COMPARTIDO,
+            )
+
+    def _set_local(self, key, valor, revocacion, segundos_carga=None):
+        vence = time.monotonic() + settings.AUTH_CACHE_TTL_LOCAL
+        desalojadas = []
+        with self._lock:
+            self._lru[key] = (vence, valor[0].id_usuario, valor, revocacion)
+            self._lru.move_to_end(key)
+            while len(self._lru) > settings.AUTH_CACHE_MAX:
+                desalojadas.append(self._lru.popitem(last=False)[0])
+        self._stats.guardado(key, valor, segundos_carga)
+        for clave in desalojadas:
+            self._stats.desalojado(clave)
+
+    def _revocar(self, keys):
+        """Publicar una generación nueva (ahora y al confirmar la transacción)."""
+        if not keys:
+            return
+        versiones = caches[settings.CACHE_VERSIONES_ALIAS]
+        # Basta con que dure más que cualquier entrada cargada antes
+        ttl = max(settings.AUTH_CACHE_TTL_LOCAL, settings.AUTH_CACHE_TTL_COMPARTIDO) + 60
+
+        def _publicar():
+            versiones.set_many(
+                {self._revocacion_key(key): uuid.uuid4().hex for key in keys}, ttl
+            )
+
+        _publicar()
+        # Una carga concurrente pudo leer la fila anterior antes del COMMIT
+        transaction.on_commit(_publicar)
+
+    def invalidate_token(self, key):
+        """Invalidar un token (logout / token eliminado)"""
+        with self._lock:
+            self._lru.pop(key, None)
+        self._stats.invalidado(key)
+        self._revocar([key])
+        if settings.AUTH_CACHE_COMPARTIDO:
+            cache.delete(self._shared_key(key))
+
+    def invalidate_usuario(self, id_usuario, keys=()):
+        """
+        Invalidar todos los tokens de un usuario (cambio de estado/datos).
+        `keys` son sus tokens en BD: se revocan en todos los procesos.
+        """
+        keys = list(keys)
+        with self._lock:
+            invalidadas = [k for k, entrada in self._lru.items() if entrada[1] == id_usuario]
+            for key in invalidadas:
+                del self._lru[key]
+        for key in invalidadas:
+            self._stats.invalidado(key)
+        self._revocar(keys)
+        if settings.AUTH_CACHE_COMPARTIDO and keys:
+            cache.delete_many([self._shared_key(key) for key in keys])
+
+
+# Instancias globales
 grupo_cache = GrupoCacheManager()
+token_cache = TokenCacheManager()
+buffer_lecturas = BufferLecturas()
+broker_notificaciones = BrokerNotificaciones()
@@ -0,0 +1,98 @@
+"""
+Tareas en segundo plano - ÁgoraUN
+
+Pool de hilos del proceso para trabajo que no debe retrasar la respuesta
+HTTP (p. ej. repartir una notificación a miles de usuarios). No requiere
+broker externo: las tareas se encolan al confirmar la transacción actual
+y cada una cierra su conexión a la base de datos al terminar.
+
+Configuración (settings):
+- TAREAS_HILOS: hilos del pool (por defecto 2)
+- TAREAS_SINCRONAS: ejecutar en el mismo hilo (tests / comandos)
+
+PoolAcotado: pool aparte para trabajo de CPU que sí se espera en la
+petición (p. ej. verificar contraseñas). Limita los hilos y la cola; si
+está lleno rechaza de inmediato (PoolSaturado) en lugar de acumular
+peticiones bloqueadas.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturoTimeout
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'TAREAS_HILOS', 2),
+                    thread_name_prefix='agoraun-tarea',
+                )
+    return _pool
+
+
+def _ejecutar(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception:  # noqa: BLE001 - el hilo no tiene a quién propagarla
+        logger.exception("Error en tarea en segundo plano %s", func.__name__)
+        return None
+    finally:
+        connection.close()
+
+
+def en_segundo_plano(func, *args, **kwargs):
+    """
+    Ejecutar `func(*args, **kwargs)` en el pool cuando la transacción
+    actual se confirme (inmediatamente si no hay transacción abierta).
+    Si la transacción se revierte, la tarea no se ejecuta.
+    """
+    if getattr(settings, 'TAREAS_SINCRONAS', False):
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+    transaction.on_commit(lambda: _obtener_pool().submit(_ejecutar, func, args, kwargs))
+
+
+# ===========================================================================
+# POOL ACOTADO
+# ===========================================================================
+
+class PoolSaturado(Exception):
+    """El pool acotado no admite más trabajo en este momento."""
+
+
+class PoolAcotado:
+    """
+    `hilos` ejecutando y como mucho `cola` esperando. `ejecutar` bloquea
+    hasta el resultado (máximo `espera` segundos).
+    """
+
+    def __init__(self, nombre, hilos, cola, espera=None):
+        self._pool = ThreadPoolExecutor(max_workers=hilos, thread_name_prefix=f'agoraun-{nombre}')
+        self._cupos = threading.BoundedSemaphore(hilos + cola)
+        self._espera = espera
+
+    def ejecutar(self, func, *args, **kwargs):
+        if not self._cupos.acquire(blocking=False):
+            raise PoolSaturado("Demasiadas solicitudes en cola")
+        try:
+            futuro = self._pool.submit(func, *args, **kwargs)
+        except Exception:
+            self._cupos.release()
+            raise
+        futuro.add_done_callback(lambda _: self._cupos.release())
+        try:
+            return futuro.result(timeout=self._espera)
+        except FuturoTimeout as exc:
+            futuro.cancel()
+            raise PoolSaturado("Tiempo de espera agotado") from exc
@@ -0,0 +1,21 @@
+"""
+Configuración común de los tests - ÁgoraUN
+"""
+
+import pytest
+
+CACHE_LOCAL = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'versiones': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-versiones'},
+    'local': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-local'},
+}
+
+
+@pytest.fixture(autouse=True)
+def cache_local(settings):
+    """
+    Los tests no tienen Redis y cuentan las consultas de la aplicación
+    (con el respaldo DatabaseCache se sumarían las de la tabla de cache).
+    test_cache.TestCacheCompartido prueba el respaldo compartido.
+    """
+    settings.CACHES = CACHE_LOCAL
@@ -0,0 +1,182 @@
+"""
+Tests de autenticación por token - ÁgoraUN
+"""
+
+import importlib
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.apps import apps
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.test import APIClient
+
+from grupos.auth import UsuarioAuthToken, UsuarioTokenAuthentication, purgar_tokens_vencidos
+from grupos.models import Usuario
+from grupos.singletons import TokenCacheManager
+from grupos.tareas import PoolAcotado, PoolSaturado
+
+
+class TestCacheAutenticacion(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(
+            nombre_usuario="Ana", apellido="Test", correo_usuario="ana@unal.edu.co"
+        )
+        self.token = UsuarioAuthToken.create(self.usuario)
+        self.auth = UsuarioTokenAuthentication()
+
+    def test_peticiones_siguientes_sin_bd(self):
+        with self.assertNumQueries(1):
+            self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            usuario, token = self.auth.authenticate_credentials(self.token.key)
+        self.assertEqual(usuario.id_usuario, self.usuario.id_usuario)
+        self.assertEqual(token.key, self.token.key)
+
+    def test_invalida_al_eliminar_token(self):
+        key = self.token.key    # delete() deja la pk en None
+        self.auth.authenticate_credentials(key)
+        self.token.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_invalida_al_cambiar_estado(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.usuario.estado_usuario = 'INACTIVO'
+        self.usuario.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+
+class TestRevocacionEntreProcesos(TestCase):
+    """Dos instancias del cache simulan dos workers con su propia LRU."""
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(
+            nombre_usuario="Eva", apellido="Test", correo_usuario="eva@unal.edu.co"
+        )
+        self.token = UsuarioAuthToken.create(self.usuario)
+        self.auth = UsuarioTokenAuthentication()
+        # Segundo worker: otra instancia con su LRU (las señales usan la global)
+        original = TokenCacheManager._instance
+        TokenCacheManager._instance = None
+        self.otro_worker = TokenCacheManager()
+        TokenCacheManager._instance = original
+        self.key = self.token.key
+
+    def autenticar_en_otro_worker(self):
+        with patch('grupos.auth.token_cache', self.otro_worker):
+            return self.auth.authenticate_credentials(self.key)
+
+    def test_otro_worker_sirve_desde_su_lru(self):
+        self.autenticar_en_otro_worker()
+        with self.assertNumQueries(0):
+            self.autenticar_en_otro_worker()
+
+    def test_token_eliminado_en_otro_worker(self):
+        self.autenticar_en_otro_worker()
+        self.token.delete()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.autenticar_en_otro_worker()
+
+    def test_usuario_suspendido_en_otro_worker(self):
+        self.autenticar_en_otro_worker()
+        self.usuario.estado_usuario = 'INACTIVO'
+        self.usuario.save()
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.autenticar_en_otro_worker()
+
+    def test_revocacion_tras_el_commit(self):
+        # Una carga leída antes del COMMIT se revoca al confirmar
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.usuario.estado_usuario = 'INACTIVO'
+            self.usuario.save()
+        revocacion = self.otro_worker.revocacion(self.key)
+        self.otro_worker.set_token(self.key, self.usuario, self.token, None, revocacion)
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(self.otro_worker.get_token(self.key))
+
+
+@override_settings(AUTH_TOKEN_EXPIRACION=3600, AUTH_TOKEN_REUSAR=True)
+class TestCicloVidaTokens(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario(
+            nombre_usuario="Luis", apellido="Test", correo_usuario="luis@unal.edu.co"
+        )
+        self.usuario.set_password("secreta123")
+        self.usuario.save()
+        self.client = APIClient()
+
+    def login(self, dispositivo):
+        return self.client.post('/api/auth/login/', {
+            'correo': 'luis@unal.edu.co', 'password': 'secreta123', 'dispositivo': dispositivo,
+        }, format='json').data['token']
+
+    def test_reutiliza_token_por_dispositivo(self):
+        primero = self.login('movil')
+        self.assertEqual(self.login('movil'), primero)
+        self.assertNotEqual(self.login('web'), primero)
+        self.assertEqual(UsuarioAuthToken.objects.filter(usuario=self.usuario).count(), 2)
+
+    def test_token_vencido(self):
+        token = UsuarioAuthToken.create(self.usuario)
+        UsuarioAuthToken.objects.filter(key=token.key).update(
+            ultimo_uso=timezone.now() - timedelta(hours=2)
+        )
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            UsuarioTokenAuthentication().authenticate_credentials(token.key)
+
+    def test_purgar_por_lotes(self):
+        tokens = [UsuarioAuthToken.create(self.usuario, f"d{i}") for i in range(5)]
+        UsuarioAuthToken.objects.filter(key__in=[t.key for t in tokens[:3]]).update(
+            ultimo_uso=timezone.now() - timedelta(hours=2)
+        )
+        self.assertEqual(purgar_tokens_vencidos(tamano_lote=2), 3)
+        self.assertEqual(UsuarioAuthToken.objects.count(), 2)
+
+
+class TestLoginConcurrente(TestCase):
+
+    def test_busqueda_por_correo_normalizado(self):
+        usuario = Usuario(nombre_usuario="Eva", apellido="Test", correo_usuario=" Eva@UNAL.edu.co")
+        usuario.set_password("secreta123")
+        usuario.save()
+        self.assertEqual(usuario.correo_normalizado, "eva@unal.edu.co")
+
+        respuesta = APIClient().post('/api/auth/login/', {
+            'correo': 'EVA@unal.edu.co', 'password': 'secreta123',
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_migracion_aborta_con_correos_duplicados(self):
+        migracion = importlib.import_module('grupos.migrations.0011_usuario_correo_normalizado')
+        Usuario.objects.create(nombre_usuario="Eva", apellido="Test", correo_usuario="eva@unal.edu.co")
+        otra = Usuario.objects.create(nombre_usuario="Eva", apellido="Dos", correo_usuario="otra@unal.edu.co")
+        # Datos previos a la migración: mismo correo con otras mayúsculas
+        Usuario.objects.filter(pk=otra.pk).update(correo_usuario=" Eva@UNAL.edu.co")
+
+        with self.assertRaisesMessage(RuntimeError, "eva@unal.edu.co: id="):
+            migracion.poblar_correo_normalizado(apps, None)
+
+    def test_pool_acotado_rechaza_exceso(self):
+        pool = PoolAcotado('test', hilos=1, cola=0)
+        liberar = threading.Event()
+        hilo = threading.Thread(target=pool.ejecutar, args=(liberar.wait, 5))
+        hilo.start()
+        try:
+            while pool._cupos._value:
+                time.sleep(0.01)
+            with self.assertRaises(PoolSaturado):
+                pool.ejecutar(lambda: None)
+        finally:
+            liberar.set()
+            hilo.join()
+        while not pool._cupos._value:  # el cupo se libera en el callback del futuro
+            time.sleep(0.01)
+        self.assertEqual(pool.ejecutar(lambda: 42), 42)
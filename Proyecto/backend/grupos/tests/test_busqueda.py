@@ -0,0 +1,125 @@
+"""
+Tests del índice invertido de búsqueda - ÁgoraUN
+"""
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from grupos.models import Grupo, GrupoTermino
+from grupos.search import obtener_facetas, raiz, tokenizar
+from grupos.services import GrupoService
+
+
+class TestNormalizacion(TestCase):
+
+    def test_tildes_stopwords_y_plurales(self):
+        self.assertEqual(tokenizar("El Club de Músicas"), ["club", "music"])
+        self.assertEqual(raiz("luces"), "luz")
+        self.assertEqual(raiz("deportes"), raiz("deporte"))
+
+
+class TestBusquedaGrupos(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.musica = Grupo.objects.create(
+            nombre_grupo="Club de Música", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="musica@unal.edu.co", descripcion="Ensayos de guitarra y canto",
+        )
+        self.coro = Grupo.objects.create(
+            nombre_grupo="Coro UN", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="coro@unal.edu.co", descripcion="Coro con repertorio de música clásica",
+        )
+        self.futbol = Grupo.objects.create(
+            nombre_grupo="Club de Fútbol", area_interes="Deportes", tipo_grupo="Deportivo",
+            correo_grupo="futbol@unal.edu.co", descripcion="Entrenamientos semanales",
+        )
+
+    def _buscar(self, texto, extra=''):
+        data = self.client.get(f'/api/grupos/?search={texto}{extra}').json()
+        return [g['id_grupo'] for g in data['results']]
+
+    def test_ranking_por_relevancia(self):
+        # El nombre pesa más que la descripción
+        self.assertEqual(self._buscar('musicas'), [self.musica.id_grupo, self.coro.id_grupo])
+
+    def test_prefijo_y_filtros(self):
+        self.assertEqual(self._buscar('futb'), [self.futbol.id_grupo])
+        self.assertEqual(self._buscar('club', '&area=Deportes'), [self.futbol.id_grupo])
+        self.assertEqual(self._buscar('inexistente'), [])
+
+    def test_indice_incremental_al_actualizar(self):
+        GrupoService.actualizar_grupo(self.futbol.id_grupo, {'descripcion': 'Torneos de ajedrez'})
+        self.assertEqual(self._buscar('ajedrez'), [self.futbol.id_grupo])
+        self.futbol.delete()
+        self.assertFalse(GrupoTermino.objects.filter(termino='ajedrez').exists())
+
+    def test_endpoint_buscar_paginado(self):
+        data = self.client.get('/api/grupos/buscar/?busqueda=club&cursor=').json()
+        self.assertEqual(
+            {g['id_grupo'] for g in data['results']},
+            {self.musica.id_grupo, self.futbol.id_grupo},
+        )
+
+    def test_cursor_por_relevancia_sigue_la_pagina_siguiente(self):
+        # Más de una página, con relevancias repetidas para forzar el desempate
+        for i in range(22):
+            Grupo.objects.create(
+                nombre_grupo=f"Club {i}", area_interes="Artes", tipo_grupo="Cultural",
+                correo_grupo=f"club{i}@unal.edu.co", descripcion="club" if i % 3 == 0 else "x",
+            )
+        esperados = set(Grupo.objects.filter(nombre_grupo__startswith='Club').values_list('pk', flat=True))
+        for url in ('/api/grupos/?search=club&cursor=', '/api/grupos/buscar/?busqueda=club&cursor='):
+            ids, paginas = [], 0
+            while url:
+                respuesta = self.client.get(url)
+                self.assertEqual(respuesta.status_code, 200)
+                data = respuesta.json()
+                ids.extend(g['id_grupo'] for g in data['results'])
+                url, paginas = data['next'], paginas + 1
+            self.assertEqual(paginas, 3)
+            self.assertEqual(len(ids), len(set(ids)))
+            self.assertEqual(set(ids), esperados)
+
+
+class TestFacetas(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Club de Música", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="musica@unal.edu.co", descripcion="Ensayos",
+        )
+        Grupo.objects.create(
+            nombre_grupo="Coro UN", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="coro@unal.edu.co", descripcion="Coro",
+        )
+
+    def test_facetas_incrementales(self):
+        self.assertEqual(obtener_facetas()['area_interes'], {'Artes': 2})
+
+        GrupoService.aprobar_grupo(self.grupo.id_grupo)
+        GrupoService.actualizar_grupo(self.grupo.id_grupo, {'area_interes': 'Música'})
+        facetas = obtener_facetas()
+        self.assertEqual(facetas['area_interes'], {'Artes': 1, 'Música': 1})
+        self.assertEqual(facetas['estado_grupo'], {'APROBADO': 1, 'PENDIENTE': 1})
+
+        GrupoService.eliminar_grupo(self.grupo.id_grupo)
+        self.assertEqual(obtener_facetas()['area_interes'], {'Artes': 1})
+
+    def test_facetas_en_listado(self):
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/grupos/?facetas=1&cursor=').json()
+        self.assertEqual(data['facetas']['tipo_grupo'], {'Cultural': 2})
+
+    def test_facetas_con_filtros(self):
+        Grupo.objects.create(
+            nombre_grupo="Club de Fútbol", area_interes="Deportes", tipo_grupo="Deportivo",
+            correo_grupo="futbol@unal.edu.co", descripcion="Entrenamientos",
+        )
+        data = self.client.get('/api/grupos/?facetas=1&area=Artes').json()
+        self.assertEqual(data['facetas']['area_interes'], {'Artes': 2})
+        self.assertEqual(data['facetas']['tipo_grupo'], {'Cultural': 2})
+
+        data = self.client.get('/api/grupos/?facetas=1&search=futbol').json()
+        self.assertEqual(data['facetas']['area_interes'], {'Deportes': 1})
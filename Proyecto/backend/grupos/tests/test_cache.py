@@ -0,0 +1,234 @@
+"""
+Tests de cache de grupos - ÁgoraUN
+"""
+
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from grupos.models import Evento, Grupo
+from grupos.services import EventoService, GrupoService
+from grupos.singletons import grupo_cache, resumen_estadisticas
+from project import settings as settings_proyecto
+from project.singleton import config_manager
+
+
+class TestEstadisticasCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Club de Ajedrez", area_interes="Juegos", tipo_grupo="Cultural",
+            correo_grupo="ajedrez@unal.edu.co",
+        )
+
+    def test_contadores_por_namespace(self):
+        antes = resumen_estadisticas('grupo')['grupo']
+        grupo_cache.get_grupo(self.grupo.id_grupo)
+        grupo_cache.get_grupo(self.grupo.id_grupo)
+        cache.clear()  # el backend desaloja la entrada
+        grupo_cache.get_grupo(self.grupo.id_grupo)
+
+        despues = resumen_estadisticas('grupo')['grupo']
+        self.assertEqual(despues['aciertos'] - antes['aciertos'], 1)
+        self.assertEqual(despues['fallos'] - antes['fallos'], 2)
+        self.assertEqual(despues['desalojos'] - antes['desalojos'], 1)
+        self.assertEqual(despues['cargas'] - antes['cargas'], 2)
+        self.assertGreater(despues['bytes'], 0)
+
+    def test_endpoint_estadisticas(self):
+        grupo_cache.get_grupo(self.grupo.id_grupo)
+        data = APIClient().get('/api/cache/estadisticas/?namespace=grupo').json()
+        self.assertEqual(list(data['estadisticas']), ['grupo'])
+        self.assertIn('carga_media_ms', data['estadisticas']['grupo'])
+
+
+class TestCacheGrupos(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Club de Teatro", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="teatro@unal.edu.co", descripcion="Montajes",
+        )
+
+    def test_payload_completo_e_invalidacion(self):
+        datos = grupo_cache.get_grupo(self.grupo.id_grupo)
+        self.assertEqual(datos['descripcion'], "Montajes")
+        self.assertIn('total_miembros', datos)
+
+        GrupoService.actualizar_grupo(self.grupo.id_grupo, {'descripcion': "Obras"})
+        self.assertEqual(grupo_cache.get_grupo(self.grupo.id_grupo)['descripcion'], "Obras")
+
+    def test_mover_evento_invalida_ambos_grupos(self):
+        otro = Grupo.objects.create(
+            nombre_grupo="Club de Danza", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="danza@unal.edu.co",
+        )
+        inicio = timezone.now() + timedelta(days=1)
+        evento = Evento.objects.create(
+            grupo=self.grupo, nombre_evento="Ensayo", descripcion_evento="x",
+            fecha_inicio=inicio, fecha_fin=inicio + timedelta(hours=2),
+            lugar="Auditorio", tipo_evento="Taller", cupo=10,
+        )
+        self.assertEqual(grupo_cache.get_grupo(self.grupo.id_grupo)['total_eventos'], 1)
+        self.assertEqual(grupo_cache.get_grupo(otro.id_grupo)['total_eventos'], 0)
+
+        EventoService.actualizar_evento(evento.id_evento, {'grupo': otro})
+        self.assertEqual(grupo_cache.get_grupo(self.grupo.id_grupo)['total_eventos'], 0)
+        self.assertEqual(grupo_cache.get_grupo(otro.id_grupo)['total_eventos'], 1)
+
+    def test_cache_negativo(self):
+        self.assertIsNone(grupo_cache.get_grupo(999999))
+        with self.assertNumQueries(0):
+            self.assertIsNone(grupo_cache.get_grupo(999999))
+
+    @override_settings(GRUPO_CACHE_TTL=0, TAREAS_SINCRONAS=True)
+    def test_sirve_vencido_mientras_renueva(self):
+        grupo_cache.get_grupo(self.grupo.id_grupo)
+        Grupo.objects.filter(pk=self.grupo.pk).update(descripcion="Nueva")  # sin signals
+
+        with self.captureOnCommitCallbacks(execute=True) as renovaciones:
+            with self.assertNumQueries(0):
+                datos = grupo_cache.get_grupo(self.grupo.id_grupo)
+        self.assertEqual(datos['descripcion'], "Montajes")
+        self.assertEqual(len(renovaciones), 1)
+        self.assertEqual(grupo_cache.get_grupo(self.grupo.id_grupo)['descripcion'], "Nueva")
+
+    def test_una_sola_carga_por_clave(self):
+        clave = f"grupo_{self.grupo.id_grupo}"
+        cache.add(f"{clave}_carga", 1, 5)  # otra petición está cargando
+        entrada = {'datos': {'id_grupo': self.grupo.id_grupo}, 'fresco_hasta': time.time() + 60}
+        threading.Timer(0.1, cache.set, args=(clave, entrada, 60)).start()
+
+        with self.assertNumQueries(0):
+            datos = grupo_cache.get_grupo(self.grupo.id_grupo)
+        self.assertEqual(datos, entrada['datos'])
+
+    def test_no_recarga_si_la_carga_termino_antes_del_candado(self):
+        clave = f"grupo_{self.grupo.id_grupo}"
+        entrada = {'datos': {'id_grupo': self.grupo.id_grupo}, 'fresco_hasta': time.time() + 60}
+        add = cache.add
+
+        def add_tras_otra_carga(key, *args, **kwargs):
+            # La otra petición guarda el valor y suelta el candado justo antes
+            if key == f"{clave}_carga":
+                cache.set(clave, entrada, 60)
+            return add(key, *args, **kwargs)
+
+        with patch('grupos.singletons.cache.add', side_effect=add_tras_otra_carga):
+            with self.assertNumQueries(0):
+                datos = grupo_cache.get_grupo(self.grupo.id_grupo)
+        self.assertEqual(datos, entrada['datos'])
+        self.assertIsNone(cache.get(f"{clave}_carga"))
+
+
+class TestCacheConsultas(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grupo = Grupo.objects.create(
+                nombre_grupo="Club de Cine", area_interes="Artes", tipo_grupo="Cultural",
+                correo_grupo="cine@unal.edu.co",
+            )
+
+    def _nombres(self):
+        return [g.nombre_grupo for g in Grupo.objects.filter(area_interes="Artes").cacheado()]
+
+    def test_repetida_desde_cache(self):
+        self._nombres()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._nombres(), ["Club de Cine"])
+
+    def test_escrituras_cambian_generacion(self):
+        self._nombres()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.grupo.nombre_grupo = "Cineclub"
+            self.grupo.save()
+        self.assertEqual(self._nombres(), ["Cineclub"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Grupo.objects.filter(pk=self.grupo.pk).update(nombre_grupo="Cine UN")
+        self.assertEqual(self._nombres(), ["Cine UN"])
+
+    def test_transaccion_con_escrituras_va_a_bd(self):
+        self._nombres()
+        Grupo.objects.filter(pk=self.grupo.pk).update(nombre_grupo="Sin confirmar")
+        with self.assertNumQueries(1):
+            self.assertEqual(self._nombres(), ["Sin confirmar"])
+
+    def test_tablas_no_versionadas_no_se_cachean(self):
+        consulta = Evento.objects.filter(participaciones__estado_participacion='CONFIRMADO').cacheado()
+        list(consulta)
+        with self.assertNumQueries(1):
+            list(consulta.all())
+
+
+class TestConfigManager(TestCase):
+    """Snapshot de configuración con versión compartida"""
+
+    def test_lectura_sin_io(self):
+        config_manager.get('app_name')
+        with patch('project.singleton._cache') as cache_mock:
+            config_manager.get('app_name')
+            config_manager.get('max_grupos_usuario')
+        cache_mock.assert_not_called()
+
+    def test_otro_proceso_recarga_por_version(self):
+        config_manager.set('max_grupos_usuario', 8)
+        # Simular otro worker: snapshot viejo y verificación vencida
+        config_manager._estado = (None, config_manager._load_initial_config())
+        config_manager._verificado = 0.0
+        try:
+            self.assertEqual(config_manager.get('max_grupos_usuario'), 8)
+            with self.assertRaises(TypeError):
+                config_manager._snapshot()['max_grupos_usuario'] = 1
+        finally:
+            config_manager.reset()
+        self.assertEqual(config_manager.get('max_grupos_usuario'), 5)
+
+
+class TestCacheCompartido(TestCase):
+
+    @override_settings(CACHES=settings_proyecto.CACHES_BD)
+    def test_dos_instancias_ven_la_misma_version(self):
+        call_command('createcachetable', verbosity=0)
+        # Dos instancias del backend de versiones = dos workers
+        worker_a = caches.create_connection('versiones')
+        worker_b = caches.create_connection('versiones')
+        self.assertNotIsInstance(worker_a, LocMemCache)
+
+        with patch('project.singleton._cache', return_value=worker_a):
+            config_manager.set('max_grupos_usuario', 9)
+        version = worker_a.get('config_version')
+        self.assertEqual(worker_b.get('config_version'), version)
+
+        # El worker B tiene el snapshot inicial y recarga al ver la versión
+        config_manager._estado = (None, config_manager._load_initial_config())
+        config_manager._verificado = 0.0
+        try:
+            with patch('project.singleton._cache', return_value=worker_b):
+                self.assertEqual(config_manager.get('max_grupos_usuario'), 9)
+        finally:
+            with patch('project.singleton._cache', return_value=worker_b):
+                config_manager.reset()
+
+    def test_configuracion_compartida(self):
+        for alias in ('default', 'versiones'):
+            for configuracion in (settings_proyecto.CACHES_REDIS, settings_proyecto.CACHES_BD):
+                self.assertNotIn('LocMem', configuracion[alias]['BACKEND'])
+        # El respaldo en BD no recorta las versiones junto con el resto
+        self.assertNotEqual(
+            settings_proyecto.CACHES_BD['versiones']['LOCATION'],
+            settings_proyecto.CACHES_BD['default']['LOCATION'],
+        )
+        self.assertIn('MAX_ENTRIES', settings_proyecto.CACHES_BD['default']['OPTIONS'])
@@ -0,0 +1,90 @@
+"""
+Tests de contadores denormalizados de Grupo - ÁgoraUN
+
+Validan que total_miembros / total_eventos se mantienen con
+los services, los borrados en cascada y el comando de reconstrucción.
+"""
+
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from grupos.models import Grupo, Usuario, UsuarioGrupo
+from grupos.serializers import GrupoSerializer
+from grupos.services import GrupoService, EventoService
+
+
+class TestContadoresGrupo(TestCase):
+
+    def setUp(self):
+        self.creador = Usuario.objects.create(
+            nombre_usuario="Ana", apellido="Pérez", correo_usuario="ana@unal.edu.co"
+        )
+        self.otro = Usuario.objects.create(
+            nombre_usuario="Luis", apellido="Gómez", correo_usuario="luis@unal.edu.co"
+        )
+        self.grupo = GrupoService.crear_grupo({
+            'nombre_grupo': 'Club de Ajedrez',
+            'area_interes': 'Juegos',
+            'tipo_grupo': 'Cultural',
+            'correo_grupo': 'ajedrez@unal.edu.co',
+            'descripcion': 'Club de ajedrez',
+        }, self.creador)
+
+    def _crear_evento(self):
+        inicio = timezone.now() + timedelta(days=1)
+        return EventoService.crear_evento({
+            'grupo': self.grupo,
+            'nombre_evento': 'Torneo',
+            'descripcion_evento': 'Torneo abierto',
+            'fecha_inicio': inicio,
+            'fecha_fin': inicio + timedelta(hours=2),
+            'lugar': 'Bloque 401',
+            'tipo_evento': 'Torneo',
+            'cupo': 10,
+        })
+
+    def test_crear_grupo_cuenta_al_creador(self):
+        self.assertEqual(self.grupo.total_miembros, 1)
+
+    def test_agregar_y_eliminar_miembro(self):
+        GrupoService.agregar_miembro(self.grupo.id_grupo, self.otro.id_usuario)
+        self.grupo.refresh_from_db()
+        self.assertEqual(self.grupo.total_miembros, 2)
+
+        GrupoService.eliminar_miembro(self.grupo.id_grupo, self.otro.id_usuario)
+        self.grupo.refresh_from_db()
+        self.assertEqual(self.grupo.total_miembros, 1)
+
+    def test_eventos_y_borrado_en_cascada(self):
+        evento = self._crear_evento()
+        self._crear_evento()
+        self.grupo.refresh_from_db()
+        self.assertEqual(self.grupo.total_eventos, 2)
+
+        evento.delete()
+        GrupoService.agregar_miembro(self.grupo.id_grupo, self.otro.id_usuario)
+        self.otro.delete()  # cascada sobre UsuarioGrupo
+        self.grupo.refresh_from_db()
+        self.assertEqual(self.grupo.total_eventos, 1)
+        self.assertEqual(self.grupo.total_miembros, 1)
+
+    def test_recalcular_contadores(self):
+        self._crear_evento()
+        Grupo.objects.update(total_miembros=0, total_eventos=0)
+        call_command('recalcular_contadores', stdout=StringIO())
+        self.grupo.refresh_from_db()
+        self.assertEqual(self.grupo.total_miembros, UsuarioGrupo.objects.count())
+        self.assertEqual(self.grupo.total_eventos, 1)
+
+    def test_listado_sin_consultas_por_fila(self):
+        for i in range(5):
+            Grupo.objects.create(
+                nombre_grupo=f"Grupo {i}", area_interes="Test", tipo_grupo="Test",
+                correo_grupo=f"g{i}@unal.edu.co", descripcion="x",
+            )
+        with self.assertNumQueries(1):
+            GrupoSerializer(Grupo.objects.all(), many=True).data
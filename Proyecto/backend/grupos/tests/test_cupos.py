@@ -0,0 +1,202 @@
+"""
+Tests del motor de asignación de cupos - ÁgoraUN
+"""
+
+from datetime import timedelta
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.db import OperationalError, connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from grupos.cupos import cupos_ocupados, fragmentar_cupos, reintentar_transaccion, reservar_cupo
+from grupos.models import Evento, Grupo, Participacion, ParticipacionUsuario, Usuario
+from grupos.services import EventoService, ParticipacionService
+
+
+class TestAsignacionCupos(TestCase):
+
+    def setUp(self):
+        grupo = Grupo.objects.create(
+            nombre_grupo="Club de Cine", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="cine@unal.edu.co", descripcion="x",
+        )
+        inicio = timezone.now() + timedelta(days=1)
+        self.evento = Evento.objects.create(
+            grupo=grupo, nombre_evento="Función", descripcion_evento="x",
+            fecha_inicio=inicio, fecha_fin=inicio + timedelta(hours=2),
+            lugar="Auditorio", tipo_evento="Proyección", cupo=3,
+        )
+        self.usuarios = [
+            Usuario.objects.create(
+                nombre_usuario=f"U{i}", apellido="Test", correo_usuario=f"u{i}@unal.edu.co"
+            )
+            for i in range(6)
+        ]
+
+    def _registrar(self, usuario):
+        return ParticipacionService.registrar_participacion(self.evento.id_evento, usuario.id_usuario)
+
+    def test_no_sobrevende(self):
+        for usuario in self.usuarios[:3]:
+            self._registrar(usuario)
+        with self.assertRaisesMessage(ValidationError, "No hay cupos"):
+            self._registrar(self.usuarios[3])
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.cupos_ocupados, 3)
+        # La inscripción rechazada no deja filas
+        self.assertEqual(Participacion.objects.filter(evento=self.evento).count(), 3)
+
+    def test_duplicado_y_liberacion(self):
+        participacion = self._registrar(self.usuarios[0])
+        with self.assertRaisesMessage(ValidationError, "ya está registrado"):
+            self._registrar(self.usuarios[0])
+
+        participacion.estado_participacion = 'CANCELADO'
+        participacion.save()
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.cupos_ocupados, 0)
+
+        # Tras cancelar puede volver a inscribirse
+        self._registrar(self.usuarios[0])
+        Participacion.objects.filter(evento=self.evento).delete()
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.cupos_ocupados, 0)
+
+    def test_contador_fragmentado(self):
+        self.evento.cupo = 5
+        self.evento.save()
+        self._registrar(self.usuarios[0])
+        evento = fragmentar_cupos(self.evento.id_evento, 3)
+        self.assertEqual(sum(f.capacidad for f in evento.fragmentos.all()), 4)
+
+        for usuario in self.usuarios[1:5]:
+            self._registrar(usuario)
+        with self.assertRaises(ValidationError):
+            self._registrar(self.usuarios[5])
+        self.assertEqual(cupos_ocupados(evento), 5)
+
+        # Volver a un contador único conserva el total
+        evento = fragmentar_cupos(self.evento.id_evento, 0)
+        self.assertEqual(evento.cupos_ocupados, 5)
+        self.assertFalse(evento.fragmentos.exists())
+
+    def test_cupo_liberado_con_fragmentos(self):
+        # Regresión: el cupo ocupado antes de fragmentar y luego cancelado
+        # debe poder reservarse otra vez
+        self.evento.cupo = 5
+        self.evento.save()
+        primera = self._registrar(self.usuarios[0])
+        fragmentar_cupos(self.evento.id_evento, 2)
+        for usuario in self.usuarios[1:5]:
+            self._registrar(usuario)
+
+        primera.estado_participacion = 'CANCELADO'
+        primera.save()
+        self.evento.refresh_from_db()
+        self.assertEqual(cupos_ocupados(self.evento), 4)
+
+        self._registrar(self.usuarios[5])
+        self.evento.refresh_from_db()
+        self.assertEqual(cupos_ocupados(self.evento), 5)
+
+    def test_fragmentado_entre_lectura_y_reserva(self):
+        # Regresión: un num_fragmentos leído antes de fragmentar no debe
+        # reservar sobre la fila del Evento (sobreventa)
+        for usuario in self.usuarios[:2]:
+            self._registrar(usuario)
+        leido = Evento.objects.only('id_evento', 'num_fragmentos').get(id_evento=self.evento.id_evento)
+        fragmentar_cupos(self.evento.id_evento, 2)
+
+        self.assertTrue(reservar_cupo(leido))
+        self.assertEqual(leido.num_fragmentos, 2)
+        self.assertFalse(reservar_cupo(
+            Evento.objects.only('id_evento', 'num_fragmentos').get(id_evento=self.evento.id_evento)
+        ))
+        self.evento.refresh_from_db()
+        self.assertEqual(cupos_ocupados(self.evento), 3)
+
+    def test_cancelar_no_pisa_contadores(self):
+        # Regresión: una reserva entre la lectura del evento y el save no
+        # debe perderse al cancelar o actualizar
+        leido = Evento.objects.get(id_evento=self.evento.id_evento)
+        self._registrar(self.usuarios[0])
+        with mock.patch.object(Evento.objects, 'get', return_value=leido):
+            EventoService.cancelar_evento(self.evento.id_evento)
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.estado_evento, 'CANCELADO')
+        self.assertEqual(self.evento.cupos_ocupados, 1)
+
+        leido = Evento.objects.get(id_evento=self.evento.id_evento)
+        self._registrar(self.usuarios[1])
+        with mock.patch.object(Evento.objects, 'get', return_value=leido):
+            EventoService.actualizar_evento(self.evento.id_evento, {'cupos_ocupados': 0})
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.cupos_ocupados, 2)
+
+    def test_reintento_en_deadlock(self):
+        llamadas = []
+
+        @reintentar_transaccion(intentos=3, espera=0)
+        def operacion():
+            llamadas.append(1)
+            if len(llamadas) < 3:
+                raise OperationalError(1213, "Deadlock found when trying to get lock")
+            return "ok"
+
+        self.assertEqual(operacion(), "ok")
+        self.assertEqual(len(llamadas), 3)
+
+        @reintentar_transaccion(intentos=3, espera=0)
+        def error_no_reintentable():
+            llamadas.append(1)
+            raise OperationalError(2006, "MySQL server has gone away")
+
+        llamadas.clear()
+        with self.assertRaises(OperationalError):
+            error_no_reintentable()
+        self.assertEqual(len(llamadas), 1)
+
+    def test_registro_masivo(self):
+        self._registrar(self.usuarios[0])
+        ids = [u.id_usuario for u in self.usuarios]
+        solicitud = [ids[0], ids[1], ids[1], 99999, ids[2], ids[3], ids[4]]
+
+        # Incluye la relectura de num_fragmentos cuando la reserva completa falla
+        with self.assertNumQueries(11):
+            resultados = ParticipacionService.registrar_participaciones(
+                self.evento.id_evento, solicitud
+            )
+        self.assertEqual(
+            [r["estado"] for r in resultados],
+            ["YA_REGISTRADO", "REGISTRADO", "DUPLICADO", "NO_EXISTE",
+             "REGISTRADO", "SIN_CUPO", "SIN_CUPO"],
+        )
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.cupos_ocupados, 3)
+        self.assertEqual(Participacion.objects.filter(evento=self.evento).count(), 3)
+
+    def test_registro_masivo_sin_returning(self):
+        # Como en MySQL: un solo INSERT y las PKs con un SELECT posterior
+        ids = [u.id_usuario for u in self.usuarios[:3]]
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert',
+            new_callable=mock.PropertyMock, return_value=False,
+        ):
+            with CaptureQueriesContext(connection) as consultas:
+                resultados = ParticipacionService.registrar_participaciones(
+                    self.evento.id_evento, ids
+                )
+        inserts = [
+            q['sql'] for q in consultas.captured_queries
+            if q['sql'].startswith('INSERT INTO "PARTICIPACION"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        for resultado in resultados:
+            self.assertEqual(resultado["estado"], "REGISTRADO")
+            self.assertTrue(ParticipacionUsuario.objects.filter(
+                usuario_id=resultado["id_usuario"],
+                participacion_id=resultado["id_participacion"],
+            ).exists())
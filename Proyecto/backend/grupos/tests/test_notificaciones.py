@@ -0,0 +1,498 @@
+"""
+Tests de notificaciones - ÁgoraUN
+"""
+
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import BooleanField, F, IntegerField, Value
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from grupos.audiencias import insertar_seleccion
+from grupos.models import Grupo, Notificacion, Usuario, UsuarioGrupo, UsuarioNotificacion
+from grupos.push import canal_usuario, canales_de_usuario
+from grupos.retencion import compactar
+from grupos.serializers import EnviarNotificacionSerializer
+from grupos.services import NotificacionService
+from grupos.singletons import broker_notificaciones, buffer_lecturas
+
+
+def enviar(*args, **kwargs):
+    """enviar_notificacion y el reparto, que corre al confirmar la transacción."""
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        return NotificacionService.enviar_notificacion(*args, **kwargs)
+
+
+class TestRepartoNotificaciones(TestCase):
+
+    def setUp(self):
+        self.usuarios = [
+            Usuario.objects.create(
+                nombre_usuario=f"U{i}", apellido="Test", correo_usuario=f"u{i}@unal.edu.co"
+            )
+            for i in range(7)
+        ]
+        self.ids = [u.id_usuario for u in self.usuarios]
+
+    @override_settings(NOTIFICACIONES_LOTE=3)
+    def test_reparto_por_lotes(self):
+        # INSERT de la notificación + (SELECT + UPDATE + INSERT) por lote de 3, más
+        # los savepoints de cada lote: nada depende del nº de usuarios
+        with self.assertNumQueries(1 + 3 * 5):
+            notificacion = enviar(self.ids + [self.ids[0], 99999], "AVISO", "Hola")
+        self.assertFalse(notificacion.envio_diferido)
+        self.assertEqual(
+            UsuarioNotificacion.objects.filter(notificacion=notificacion).count(), 7
+        )
+
+    @override_settings(NOTIFICACIONES_UMBRAL_DIFERIDO=5, TAREAS_SINCRONAS=True)
+    def test_audiencia_grande_en_segundo_plano(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            notificacion = NotificacionService.enviar_notificacion(self.ids, "AVISO", "Hola")
+        self.assertTrue(notificacion.envio_diferido)
+        self.assertFalse(UsuarioNotificacion.objects.filter(notificacion=notificacion).exists())
+
+        # El reparto corre al confirmar la transacción
+        for callback in callbacks:
+            callback()
+        self.assertEqual(
+            UsuarioNotificacion.objects.filter(notificacion=notificacion).count(), 7
+        )
+
+
+class TestRepartoTransaccional(TransactionTestCase):
+    """Sin la transacción del TestCase: cada lote debe confirmarse solo."""
+
+    @override_settings(NOTIFICACIONES_LOTE=2)
+    def test_cada_lote_confirma_por_separado(self):
+        ids = [
+            Usuario.objects.create(
+                nombre_usuario=f"U{i}", apellido="Test", correo_usuario=f"u{i}@unal.edu.co"
+            ).id_usuario
+            for i in range(5)
+        ]
+        original = UsuarioNotificacion.objects.bulk_create
+        llamadas = []
+
+        def falla_segundo_lote(*args, **kwargs):
+            llamadas.append(1)
+            if len(llamadas) == 2:
+                raise DatabaseError("caída")
+            return original(*args, **kwargs)
+
+        with patch.object(UsuarioNotificacion.objects, 'bulk_create', side_effect=falla_segundo_lote):
+            with self.assertRaises(DatabaseError):
+                NotificacionService.enviar_notificacion(ids, "AVISO", "Hola")
+
+        # La notificación y el primer lote quedan confirmados
+        notificacion = Notificacion.objects.get()
+        self.assertEqual(
+            set(notificacion.usuarios.values_list('id_usuario', flat=True)), set(ids[:2])
+        )
+        self.assertEqual(
+            Usuario.objects.filter(notificaciones_no_leidas=1).count(), 2
+        )
+
+@override_settings(NOTIFICACIONES_LOTE=2, TAREAS_SINCRONAS=True)
+class TestAudiencias(TestCase):
+
+    def setUp(self):
+        self.usuarios = [
+            Usuario.objects.create(
+                nombre_usuario=f"U{i}", apellido="Test", correo_usuario=f"u{i}@unal.edu.co"
+            )
+            for i in range(5)
+        ]
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Club de Ajedrez", area_interes="Deportes", tipo_grupo="Deportivo",
+            correo_grupo="ajedrez@unal.edu.co", descripcion="x",
+        )
+        for usuario in self.usuarios[1:]:
+            UsuarioGrupo.objects.create(usuario=usuario, grupo=self.grupo)
+
+    def test_miembros_de_grupo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            notificacion = NotificacionService.enviar_notificacion(
+                None, "AVISO", "Reunión", audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo}
+            )
+        self.assertTrue(notificacion.envio_diferido)
+        self.assertEqual(
+            set(notificacion.usuarios.values_list('id_usuario', flat=True)),
+            {u.id_usuario for u in self.usuarios[1:]},
+        )
+
+    def test_audiencia_inexistente(self):
+        with self.assertRaises(ValidationError):
+            NotificacionService.enviar_notificacion(
+                None, "AVISO", "x", audiencia={'tipo': 'GRUPO', 'id': 99999}
+            )
+        serializer = EnviarNotificacionSerializer(data={
+            'ids_usuarios': [1], 'audiencia': {'tipo': 'ROL', 'id': 1},
+            'tipo_notificacion': 'AVISO', 'mensaje': 'x',
+        })
+        self.assertFalse(serializer.is_valid())
+
+    def test_difusion(self):
+        notificacion = NotificacionService.enviar_notificacion(
+            None, "AVISO", "Torneo", audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo},
+            difusion=True,
+        )
+        # Se guarda una sola vez, sin filas por destinatario
+        self.assertFalse(UsuarioNotificacion.objects.filter(notificacion=notificacion).exists())
+
+        miembro, externo = self.usuarios[1], self.usuarios[0]
+        bandeja = list(NotificacionService.obtener_notificaciones_usuario(miembro.id_usuario))
+        self.assertEqual([(n.pk, n.leida) for n in bandeja], [(notificacion.pk, False)])
+        self.assertFalse(NotificacionService.obtener_notificaciones_usuario(externo.id_usuario).exists())
+
+        NotificacionService.marcar_como_leida(miembro.id_usuario, notificacion.pk)
+        self.assertTrue(NotificacionService.obtener_notificaciones_usuario(miembro.id_usuario)[0].leida)
+        self.assertEqual(UsuarioNotificacion.objects.filter(notificacion=notificacion).count(), 1)
+        with self.assertRaises(UsuarioNotificacion.DoesNotExist):
+            NotificacionService.marcar_como_leida(externo.id_usuario, notificacion.pk)
+
+    def test_bandeja_es_union_de_ramas_indexadas(self):
+        miembro = self.usuarios[1]
+        difusion = NotificacionService.enviar_notificacion(
+            None, "AVISO", "Torneo", audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo},
+            difusion=True,
+        )
+        # El acuse la pone también en la rama individual: debe salir una vez
+        NotificacionService.marcar_como_leida(miembro.id_usuario, difusion.pk)
+        directa = enviar([miembro.id_usuario], "AVISO", "x")
+
+        url = f'/api/notificaciones/?usuario={miembro.id_usuario}&cursor='
+        with CaptureQueriesContext(connection) as consultas:
+            data = self.client.get(url).json()
+        self.assertEqual(len(consultas), 1)
+        sql = consultas[0]['sql']
+        # Rama individual + una por tipo de audiencia, sin OR entre ellas
+        self.assertEqual(sql.count('UNION'), 3)
+        self.assertNotIn(' OR ', sql)
+        self.assertEqual(
+            [(n['id_notificacion'], n['leida']) for n in data['results']],
+            [(directa.pk, False), (difusion.pk, True)],
+        )
+
+        # Fuera del grupo, la difusión ya leída sigue en su bandeja
+        UsuarioGrupo.objects.filter(usuario=miembro).delete()
+        data = self.client.get(f'/api/notificaciones/?usuario={miembro.id_usuario}').json()
+        self.assertEqual(data['count'], 2)
+
+
+class TestBandejaNotificaciones(TestCase):
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create(
+            nombre_usuario="Ana", apellido="Test", correo_usuario="ana@unal.edu.co"
+        )
+
+    def _enviar(self, cantidad):
+        for i in range(cantidad):
+            enviar([self.usuario.id_usuario], "AVISO", f"Aviso {i}")
+
+    def test_bandeja_consultas_fijas(self):
+        self._enviar(2)
+        NotificacionService.marcar_como_leida(
+            self.usuario.id_usuario, Notificacion.objects.order_by('fecha_envio').first().pk
+        )
+        url = f'/api/notificaciones/?usuario={self.usuario.id_usuario}'
+        # COUNT de la paginación + la página con `leida` anotada
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual([n['leida'] for n in data['results']], [False, True])
+
+        self._enviar(8)
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+        self.assertEqual(len(data['results']), 10)
+
+        # Modo cursor: una sola consulta
+        with self.assertNumQueries(1):
+            self.client.get(url + '&cursor=')
+
+
+@override_settings(TAREAS_SINCRONAS=True)
+class TestContadorNoLeidas(TestCase):
+
+    def setUp(self):
+        self.usuarios = [
+            Usuario.objects.create(
+                nombre_usuario=f"U{i}", apellido="Test", correo_usuario=f"u{i}@unal.edu.co"
+            )
+            for i in range(3)
+        ]
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Coro", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="coro@unal.edu.co", descripcion="x",
+        )
+        UsuarioGrupo.objects.create(usuario=self.usuarios[0], grupo=self.grupo)
+
+    def _badge(self, usuario):
+        return self.client.get(f'/api/notificaciones/no_leidas/?usuario={usuario.id_usuario}').json()['no_leidas']
+
+    def test_contador_mantenido(self):
+        ana, beto, _ = self.usuarios
+        directa = enviar([ana.id_usuario, beto.id_usuario], "AVISO", "x")
+        audiencia = {'tipo': 'GRUPO', 'id': self.grupo.id_grupo}
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificacionService.enviar_notificacion(None, "AVISO", "y", audiencia=audiencia)
+        difusion = NotificacionService.enviar_notificacion(
+            None, "AVISO", "z", audiencia=audiencia, difusion=True
+        )
+        self.assertEqual((self._badge(ana), self._badge(beto)), (3, 1))
+
+        with self.assertNumQueries(1):
+            NotificacionService.contar_no_leidas(ana.id_usuario)
+
+        # Leer (dos veces) descuenta una sola vez
+        NotificacionService.marcar_como_leida(ana.id_usuario, directa.pk)
+        NotificacionService.marcar_como_leida(ana.id_usuario, directa.pk)
+        NotificacionService.marcar_como_leida(ana.id_usuario, difusion.pk)
+        self.assertEqual(self._badge(ana), 1)
+
+        # Unirse al grupo suma sus difusiones pendientes; salir las resta
+        membresia = UsuarioGrupo.objects.create(usuario=beto, grupo=self.grupo)
+        self.assertEqual(self._badge(beto), 2)
+        membresia.delete()
+        self.assertEqual(self._badge(beto), 1)
+
+        difusion.delete()
+        directa.delete()
+        self.assertEqual((self._badge(ana), self._badge(beto)), (1, 0))
+
+    def test_doble_acuse_concurrente(self):
+        ana = self.usuarios[0]
+        difusion = NotificacionService.enviar_notificacion(
+            None, "AVISO", "z", audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo}, difusion=True
+        )
+        # Dos peticiones que no ven el acuse de la otra: la misma selección dos veces
+        acuse = Notificacion.objects.filter(pk=difusion.pk).annotate(
+            id_lector=Value(ana.id_usuario, output_field=IntegerField()),
+            id_notif=F('pk'),
+            ya_leida=Value(True, output_field=BooleanField()),
+        ).values_list('id_lector', 'id_notif', 'ya_leida')
+        self.assertEqual(insertar_seleccion(acuse), 1)
+        self.assertEqual(insertar_seleccion(acuse), 0)
+        self.assertEqual(
+            UsuarioNotificacion.objects.filter(usuario=ana, notificacion=difusion).count(), 1
+        )
+
+    def test_editar_perfil_no_pisa_el_contador(self):
+        ana = self.usuarios[0]
+        leida = Usuario.objects.get(pk=ana.pk)
+        enviar([ana.id_usuario], "AVISO", "x")
+
+        # Instancia leída antes del reparto: save() completo
+        leida.apellido = "Gómez"
+        leida.save()
+        self.assertEqual(self._badge(ana), 1)
+
+        # API y vista HTML del perfil
+        cliente = APIClient()
+        cliente.force_authenticate(user=ana)
+        enviar([ana.id_usuario], "AVISO", "y")
+        respuesta = cliente.patch(
+            f'/api/usuarios/{ana.id_usuario}/',
+            {'nombre_usuario': "Ana María", 'notificaciones_no_leidas': 0}, format='json',
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.client.post(f'/api/perfil/{ana.id_usuario}/editar/', {
+            'nombre_usuario': "Ana", 'apellido': "Gómez", 'correo_usuario': "ana@unal.edu.co",
+        })
+        ana.refresh_from_db()
+        self.assertEqual((ana.nombre_usuario, ana.apellido), ("Ana", "Gómez"))
+        self.assertEqual(self._badge(ana), 2)
+
+    def test_reconciliar(self):
+        ana = self.usuarios[0]
+        NotificacionService.enviar_notificacion(
+            None, "AVISO", "z", audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo}, difusion=True
+        )
+        enviar([ana.id_usuario], "AVISO", "x")
+        Usuario.objects.update(notificaciones_no_leidas=7)
+        call_command('recalcular_no_leidas', stdout=StringIO())
+        self.assertEqual(
+            list(Usuario.objects.order_by('id_usuario').values_list('notificaciones_no_leidas', flat=True)),
+            [2, 0, 0],
+        )
+
+    def test_marcar_leidas_por_conjunto(self):
+        ana = self.usuarios[0]
+        directas = [
+            enviar([ana.id_usuario], "AVISO", f"d{i}")
+            for i in range(4)
+        ]
+        difusion = NotificacionService.enviar_notificacion(
+            None, "AVISO", "z", audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo}, difusion=True
+        )
+        ajena = enviar([self.usuarios[1].id_usuario], "AVISO", "x")
+        self.assertEqual(self._badge(ana), 5)
+
+        cliente = APIClient()
+        cliente.force_authenticate(user=ana)
+        url = '/api/notificaciones/marcar_leidas/'
+
+        # Lista de IDs: las ajenas se ignoran
+        data = cliente.post(url, {'ids_notificaciones': [directas[0].pk, ajena.pk]}, format='json').json()
+        self.assertEqual((data['marcadas'], self._badge(ana)), (1, 4))
+
+        # Todas: UPDATE + INSERT ... SELECT + contador (más savepoints)
+        with self.assertNumQueries(5):
+            NotificacionService.marcar_leidas(ana.id_usuario)
+        self.assertEqual(self._badge(ana), 0)
+        self.assertFalse(
+            NotificacionService.obtener_notificaciones_usuario(ana.id_usuario).filter(leida=False).exists()
+        )
+        self.assertTrue(UsuarioNotificacion.objects.get(usuario=ana, notificacion=difusion).leida)
+        self.assertEqual(NotificacionService.marcar_leidas(ana.id_usuario), 0)
+        self.assertEqual(self._badge(self.usuarios[1]), 1)
+
+    @override_settings(LECTURAS_VENTANA=60)
+    def test_buffer_de_lecturas(self):
+        ana = self.usuarios[0]
+        notificaciones = [
+            enviar([ana.id_usuario], "AVISO", f"d{i}")
+            for i in range(3)
+        ]
+        cliente = APIClient()
+        cliente.force_authenticate(user=ana)
+        for notificacion in notificaciones:
+            cliente.post(f'/api/notificaciones/{notificacion.pk}/marcar_leida/')
+
+        # Aún en memoria: ninguna escritura por lectura
+        self.assertFalse(UsuarioNotificacion.objects.filter(usuario=ana, leida=True).exists())
+        self.assertEqual(len(buffer_lecturas.pendientes(ana.id_usuario)), 3)
+
+        # Leer la bandeja del mismo usuario vacía sus pendientes primero
+        self.assertEqual(self._badge(ana), 0)
+        self.assertEqual(UsuarioNotificacion.objects.filter(usuario=ana, leida=True).count(), 3)
+        self.assertEqual(buffer_lecturas.vaciar(), 0)
+
+    @override_settings(LECTURAS_VENTANA=60)
+    def test_marcar_leida_fuera_de_la_bandeja(self):
+        ana, beto, _ = self.usuarios
+        ajena = enviar([beto.id_usuario], "AVISO", "x")
+        cliente = APIClient()
+        cliente.force_authenticate(user=ana)
+        respuesta = cliente.post(f'/api/notificaciones/{ajena.pk}/marcar_leida/')
+        self.assertEqual(respuesta.status_code, 404)
+        self.assertEqual(buffer_lecturas.pendientes(ana.id_usuario), set())
+
+    @override_settings(LECTURAS_VENTANA=60, LECTURAS_MAX_PENDIENTES=1)
+    def test_buffer_lleno_con_error_no_rompe_la_peticion(self):
+        ana = self.usuarios[0]
+        notificacion = enviar([ana.id_usuario], "AVISO", "x")
+        with patch('grupos.singletons.marcar_leidas', side_effect=DatabaseError("caída")):
+            NotificacionService.registrar_lectura(ana.id_usuario, notificacion.pk)
+            self.assertEqual(NotificacionService.contar_no_leidas(ana.id_usuario), 1)
+        # El acuse volvió al buffer y se escribe en el siguiente intento
+        self.assertEqual(buffer_lecturas.pendientes(ana.id_usuario), {notificacion.pk})
+        self.assertEqual(buffer_lecturas.vaciar(), 1)
+
+
+class TestAvisoNotificaciones(TestCase):
+
+    def setUp(self):
+        self.ana = Usuario.objects.create(
+            nombre_usuario="Ana", apellido="Test", correo_usuario="ana@unal.edu.co"
+        )
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Teatro", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="teatro@unal.edu.co", descripcion="x",
+        )
+        UsuarioGrupo.objects.create(usuario=self.ana, grupo=self.grupo)
+        self.url = f'/api/notificaciones/esperar/?usuario={self.ana.id_usuario}'
+
+    def test_sin_novedades(self):
+        data = self.client.get(self.url + '&timeout=0').json()
+        self.assertFalse(data['hay_nuevas'])
+        self.assertGreater(data['marca'], 0)
+
+    def test_aviso_por_usuario_y_por_audiencia(self):
+        desde = self.client.get(self.url + '&timeout=0').json()['marca']
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificacionService.enviar_notificacion([self.ana.id_usuario], "AVISO", "x")
+        data = self.client.get(f'{self.url}&desde={desde}&timeout=5').json()
+        self.assertTrue(data['hay_nuevas'])
+
+        desde = data['marca']
+        with self.captureOnCommitCallbacks(execute=True):
+            NotificacionService.enviar_notificacion(
+                None, "AVISO", "y", audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo},
+                difusion=True,
+            )
+        data = self.client.get(f'{self.url}&desde={desde}&timeout=5').json()
+        self.assertTrue(data['hay_nuevas'])
+        self.assertGreater(data['marca'], desde)
+
+    def test_espera_despierta_al_publicar(self):
+        canales = canales_de_usuario(self.ana.id_usuario)
+        desde = broker_notificaciones.marca_actual()
+        hilo = threading.Timer(0.1, broker_notificaciones.publicar, args=[[canal_usuario(self.ana.id_usuario)]])
+        inicio = time.monotonic()
+        hilo.start()
+        marca = broker_notificaciones.esperar(canales, desde, timeout=10)
+        hilo.join()
+        self.assertIsNotNone(marca)
+        self.assertLess(time.monotonic() - inicio, 5)
+
+
+@override_settings(NOTIFICACIONES_RETENCION={'default': 90, 'EVENTO_CREADO': 10})
+class TestRetencionNotificaciones(TestCase):
+
+    def setUp(self):
+        self.ana, self.beto = [
+            Usuario.objects.create(
+                nombre_usuario=n, apellido="Test", correo_usuario=f"{n.lower()}@unal.edu.co"
+            )
+            for n in ("Ana", "Beto")
+        ]
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Danza", area_interes="Artes", tipo_grupo="Cultural",
+            correo_grupo="danza@unal.edu.co", descripcion="x",
+        )
+        UsuarioGrupo.objects.create(usuario=self.ana, grupo=self.grupo)
+
+    def _enviar(self, dias, tipo="AVISO", ids=None, **kwargs):
+        notificacion = enviar(ids, tipo, "x", **kwargs)
+        Notificacion.objects.filter(pk=notificacion.pk).update(
+            fecha_envio=timezone.now() - timedelta(days=dias)
+        )
+        return notificacion
+
+    def test_compactar(self):
+        ambos = [self.ana.id_usuario, self.beto.id_usuario]
+        parcial = self._enviar(100, ids=ambos)           # vencida, Beto no la leyó
+        completa = self._enviar(100, ids=ambos)          # vencida y leída por ambos
+        evento = self._enviar(20, tipo="EVENTO_CREADO", ids=[self.ana.id_usuario])
+        reciente = self._enviar(20, ids=[self.ana.id_usuario])
+        difusion = self._enviar(
+            100, audiencia={'tipo': 'GRUPO', 'id': self.grupo.id_grupo}, difusion=True
+        )
+        NotificacionService.marcar_leidas(self.ana.id_usuario)
+        NotificacionService.marcar_como_leida(self.beto.id_usuario, completa.pk)
+        enviar([self.ana.id_usuario], "AVISO", "nueva")
+
+        borradas = compactar(tamano_lote=2)
+
+        self.assertEqual(borradas, {'lecturas': 4, 'difusiones': 1, 'huerfanas': 2})
+        self.assertEqual(
+            set(Notificacion.objects.values_list('pk', flat=True)) & {
+                parcial.pk, completa.pk, evento.pk, reciente.pk, difusion.pk
+            },
+            {parcial.pk, reciente.pk},
+        )
+        self.assertTrue(UsuarioNotificacion.objects.filter(usuario=self.beto, notificacion=parcial).exists())
+        self.assertEqual(
+            [u.notificaciones_no_leidas for u in Usuario.objects.order_by('id_usuario')], [1, 1]
+        )
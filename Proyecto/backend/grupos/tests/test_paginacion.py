@@ -0,0 +1,88 @@
+"""
+Tests de paginación keyset - ÁgoraUN
+
+Recorren /api/grupos/ con ?cursor= y verifican que no se repiten ni
+se pierden filas, que no se ejecuta COUNT y el total aproximado.
+"""
+
+import base64
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from grupos.models import Grupo
+from grupos.pagination import KeysetPagination
+
+
+class TestKeysetPagination(TestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        # Nombres repetidos para forzar el desempate por pk
+        for i in range(25):
+            Grupo.objects.create(
+                nombre_grupo=f"Grupo {i % 7}", area_interes="Test", tipo_grupo="Test",
+                correo_grupo=f"g{i}@unal.edu.co", descripcion="x",
+            )
+
+    def _recorrer(self, url):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            self.assertNotIn('count', data)
+            ids.extend(g['id_grupo'] for g in data['results'])
+            url = data['next']
+        return ids
+
+    def test_recorrido_completo_sin_duplicados(self):
+        ids = self._recorrer('/api/grupos/?cursor=')
+        esperados = list(
+            Grupo.objects.order_by('nombre_grupo', 'id_grupo').values_list('id_grupo', flat=True)
+        )
+        self.assertEqual(ids, esperados)
+
+    def test_orden_descendente(self):
+        ids = self._recorrer('/api/grupos/?cursor=&ordering=-fecha_creacion')
+        esperados = list(
+            Grupo.objects.order_by('-fecha_creacion', '-id_grupo').values_list('id_grupo', flat=True)
+        )
+        self.assertEqual(ids, esperados)
+
+    def test_modo_cursor_no_ejecuta_count(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/grupos/?cursor=')
+        self.assertFalse(any('COUNT(' in q['sql'].upper() for q in ctx.captured_queries))
+
+    def test_total_aproximado_y_modo_paginas(self):
+        resp = self.client.get('/api/grupos/?cursor=&total=aprox')
+        self.assertEqual(resp['X-Total-Count-Approx'], '25')
+        data = self.client.get('/api/grupos/?page=2').json()
+        self.assertEqual(data['count'], 25)
+
+    def test_total_estimado_sin_filtros(self):
+        # En MySQL el listado completo usa la estimación de EXPLAIN, sin COUNT
+        with patch.object(connection, 'vendor', 'mysql'), \
+                patch.object(KeysetPagination, '_filas_estimadas', return_value=24) as estimar:
+            resp = self.client.get('/api/grupos/?cursor=&total=aprox')
+            self.assertEqual(resp['X-Total-Count-Approx'], '24')
+            estimar.assert_called_once_with(Grupo, 'default')
+            # Con filtros: COUNT exacto (cacheado)
+            resp = self.client.get('/api/grupos/?cursor=&total=aprox&area=Test')
+            self.assertEqual(resp['X-Total-Count-Approx'], '25')
+            estimar.assert_called_once()
+
+    def test_cursor_invalido(self):
+        resp = self.client.get('/api/grupos/?cursor=%%%')
+        self.assertEqual(resp.status_code, 404)
+
+    def test_cursor_con_forma_o_tipos_invalidos(self):
+        for crudo in ('"ab"', '["x"]', '{"a": 1, "b": 2}', '["x","notint"]'):
+            cursor = base64.urlsafe_b64encode(crudo.encode()).decode()
+            resp = self.client.get(f'/api/grupos/?cursor={cursor}')
+            self.assertEqual(resp.status_code, 404, crudo)
+        cursor = base64.urlsafe_b64encode(b'["2024-13-45", 1]').decode()
+        resp = self.client.get(f'/api/grupos/?cursor={cursor}&ordering=fecha_creacion')
+        self.assertEqual(resp.status_code, 404)
@@ -0,0 +1,127 @@
+"""
+Tests de vistas HTML - ÁgoraUN
+"""
+
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from grupos.cupos import fragmentar_cupos
+from grupos.models import Evento, Grupo, Usuario
+from grupos.serializers import ParticipacionUsuarioSerializer
+from grupos.services import GrupoService, ParticipacionService
+
+
+class TestExplorarIntereses(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create(
+            nombre_usuario="Ana", apellido="Pérez", correo_usuario="ana@unal.edu.co"
+        )
+        for i in range(7):
+            Grupo.objects.create(
+                nombre_grupo=f"Arte {i}", area_interes="Artes", tipo_grupo="Cultural",
+                correo_grupo=f"arte{i}@unal.edu.co", descripcion="x",
+            )
+        Grupo.objects.create(
+            nombre_grupo="Fútbol", area_interes="Deportes", tipo_grupo="Deportivo",
+            correo_grupo="futbol@unal.edu.co", descripcion="x",
+        )
+
+    def test_una_consulta_y_luego_cache(self):
+        with self.assertNumQueries(1):
+            resp = self.client.get('/api/intereses/')
+        html = resp.content.decode()
+        self.assertIn('7 grupos', html)
+        self.assertEqual(html.count('class="group-link"'), 6)  # 5 de Artes + 1 de Deportes
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/intereses/')
+
+    def test_top_por_miembros_e_invalidacion(self):
+        self.client.get('/api/intereses/')
+        GrupoService.crear_grupo({
+            'nombre_grupo': 'Teatro Popular', 'area_interes': 'Artes',
+            'tipo_grupo': 'Cultural', 'correo_grupo': 'teatro@unal.edu.co',
+            'descripcion': 'x',
+        }, self.usuario)
+        html = self.client.get('/api/intereses/').content.decode()
+        self.assertIn('8 grupos', html)
+        self.assertIn('Teatro Popular', html)  # tiene 1 miembro → primero del área
+
+
+class TestDetalleGrupo(TestCase):
+    """El detalle de un grupo debe cargarse con un número fijo de consultas."""
+
+    def setUp(self):
+        self.grupo = Grupo.objects.create(
+            nombre_grupo="Club de Robótica", area_interes="Tecnología", tipo_grupo="Académico",
+            correo_grupo="robotica@unal.edu.co", descripcion="x",
+        )
+        inicio = timezone.now() + timedelta(days=1)
+        for i in range(12):
+            usuario = Usuario.objects.create(
+                nombre_usuario=f"U{i}", apellido="Test", correo_usuario=f"u{i}@unal.edu.co"
+            )
+            GrupoService.agregar_miembro(self.grupo.id_grupo, usuario.id_usuario)
+        for i in range(7):
+            evento = Evento.objects.create(
+                grupo=self.grupo, nombre_evento=f"Evento {i}", descripcion_evento="x",
+                fecha_inicio=inicio + timedelta(days=i), fecha_fin=inicio + timedelta(days=i, hours=2),
+                lugar="Aula", tipo_evento="Taller", cupo=5,
+            )
+            participacion = ParticipacionService.registrar_participacion(evento.id_evento, usuario.id_usuario)
+            ParticipacionService.confirmar_participacion(participacion.id_participaciones)
+
+    def test_presupuesto_de_consultas(self):
+        # grupo + miembros + eventos próximos
+        with self.assertNumQueries(3):
+            data = self.client.get(f'/api/grupos/{self.grupo.id_grupo}/').json()
+        self.assertEqual(len(data['miembros']), 10)
+        self.assertEqual(len(data['eventos_proximos']), 5)
+        self.assertEqual(data['eventos_proximos'][0]['cupos_disponibles'], 4)
+        self.assertEqual(data['eventos_proximos'][0]['grupo_nombre'], "Club de Robótica")
+
+    def test_listado_eventos_sin_consulta_por_evento(self):
+        # COUNT de la paginación + página (cupos desde el contador)
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/eventos/').json()
+        self.assertEqual(len(data['results']), 7)
+        self.assertTrue(all(e['cupos_disponibles'] == 4 for e in data['results']))
+
+        with self.assertNumQueries(2):  # grupo + eventos
+            data = self.client.get(f'/api/grupos/{self.grupo.id_grupo}/eventos/').json()
+        self.assertEqual(len(data), 7)
+
+    def test_listado_eventos_fragmentados_sin_consulta_por_evento(self):
+        otro = Usuario.objects.create(
+            nombre_usuario="Otro", apellido="Test", correo_usuario="otro@unal.edu.co"
+        )
+        fragmentados = list(Evento.objects.order_by('id_evento')[:3])
+        for evento in fragmentados:
+            fragmentar_cupos(evento.id_evento, 2)
+            ParticipacionService.registrar_participacion(evento.id_evento, otro.id_usuario)
+        esperado = {
+            e.id_evento: 3 if e in fragmentados else 4 for e in Evento.objects.all()
+        }
+
+        with self.assertNumQueries(2):
+            data = self.client.get('/api/eventos/').json()
+        self.assertEqual({e['id_evento']: e['cupos_disponibles'] for e in data['results']}, esperado)
+
+        with self.assertNumQueries(2):
+            data = self.client.get(f'/api/grupos/{self.grupo.id_grupo}/eventos/').json()
+        self.assertEqual({e['id_evento']: e['cupos_disponibles'] for e in data}, esperado)
+
+        participaciones = list(ParticipacionService.obtener_participaciones_evento(None))
+        with self.assertNumQueries(0):
+            ParticipacionUsuarioSerializer(participaciones, many=True).data
+
+    def test_participaciones_con_evento_info(self):
+        participaciones = list(ParticipacionService.obtener_participaciones_evento(None))
+        with self.assertNumQueries(0):
+            data = ParticipacionUsuarioSerializer(participaciones, many=True).data
+        self.assertEqual(data[0]['participacion_info']['evento_info']['cupos_disponibles'], 4)
@@ -17,6 +17,8 @@ from .views import (
     ComentarioViewSet,
     NotificacionViewSet,
     AuthView,
+    BusquedaGruposView,
+    EstadisticasCacheView,
     perfil_usuario,
     explorar_intereses,
     editar_perfil,
@@ -37,6 +39,8 @@ urlpatterns = [
     path('perfil/<int:usuario_id>/editar/', editar_perfil, name='editar_perfil'),
     path('perfil/<int:usuario_id>/intereses/', actualizar_intereses, name='actualizar_intereses'),
     path('intereses/', explorar_intereses, name='explorar_intereses'),
+    path("grupos/buscar/", BusquedaGruposView.as_view({"get": "buscar"}), name="grupos-buscar"),
+    path("cache/estadisticas/", EstadisticasCacheView.as_view(), name="cache-estadisticas"),
     path("", include(router.urls)),
     path("auth/register/", AuthView.as_view({"post": "register"}), name="auth-register"),
     path("auth/login/",    AuthView.as_view({"post": "login"}),    name="auth-login"),
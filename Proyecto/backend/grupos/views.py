@@ -2,10 +2,12 @@
 
 from django.shortcuts import redirect
 from django.contrib import messages
-from django.db.models import Count
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import transaction
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.template.loader import render_to_string
 from django.shortcuts import render, get_object_or_404
 from django.views import View
 
@@ -19,7 +21,10 @@ from rest_framework.parsers import JSONParser
 from rest_framework.serializers import Serializer, CharField, EmailField
 
 from project.singleton import config_manager
-from .singletons import grupo_cache
+from .singletons import grupo_cache, resumen_estadisticas
+from .cupos import con_cupos_ocupados
+from .pagination import KeysetPagination
+from .search import BusquedaTextoFilter, obtener_facetas
 
 from .models import (
     Participacion, ParticipacionUsuario, Usuario, Grupo, Evento,
@@ -30,12 +35,13 @@ from .serializers import (
     UsuarioSerializer,
     GrupoSerializer, GrupoDetalleSerializer,
     EventoSerializer,
-    ParticipacionSerializer, RegistroParticipacionSerializer,
+    ParticipacionSerializer, RegistroParticipacionSerializer, RegistroMasivoSerializer,
     ComentarioSerializer,
     NotificacionSerializer,
     UsuarioGrupoSerializer,
     AgregarMiembroSerializer,
     EnviarNotificacionSerializer,
+    MarcarLeidasSerializer,
     RechazarGrupoSerializer
 )
 from .services import (
@@ -91,6 +97,15 @@ class ConfigView(View):
         return JsonResponse({'error': 'Key y value requeridos'}, status=400)
 
 
+class EstadisticasCacheView(View):
+    """GET /api/cache/estadisticas/?namespace=grupo - contadores de cache del proceso."""
+
+    def get(self, request):
+        return JsonResponse({
+            'estadisticas': resumen_estadisticas(request.GET.get('namespace') or None),
+        })
+
+
 class BusquedaGruposView(viewsets.ViewSet):
     """Vista personalizada para búsqueda avanzada de grupos (JSON)."""
 
@@ -98,7 +113,8 @@ class BusquedaGruposView(viewsets.ViewSet):
     def buscar(self, request):
         """
         GET /grupos/buscar/?busqueda=Programación&area=Tecnología&tipo=Académico
-        Parámetros: busqueda | area | tipo
+        Parámetros: busqueda | area | tipo (+ page | cursor | total=aprox | facetas=1)
+        Resultados ordenados por relevancia (índice invertido, grupos/search.py).
         """
         filtros = {
             'busqueda': request.query_params.get('busqueda', ''),
@@ -107,24 +123,15 @@ class BusquedaGruposView(viewsets.ViewSet):
         }
         filtros = {k: v for k, v in filtros.items() if v}
 
-        if hasattr(GrupoService, "listar_grupos"):
-            grupos = GrupoService.listar_grupos(filtros)
-        else:
-            # Fallback sencillo si el service no tuviera ese método
-            grupos = Grupo.objects.all()
-            if filtros.get('area_interes'):
-                grupos = grupos.filter(area_interes__icontains=filtros['area_interes'])
-            if filtros.get('tipo_grupo'):
-                grupos = grupos.filter(tipo_grupo__icontains=filtros['tipo_grupo'])
-            if filtros.get('busqueda'):
-                q = filtros['busqueda']
-                grupos = grupos.filter(
-                    nombre_grupo__icontains=q
-                ) | grupos.filter(descripcion__icontains=q)
-
-        ser = GrupoSerializer(grupos, many=True)
-        total = grupos.count() if hasattr(grupos, "count") else len(ser.data)
-        return Response({"total": total, "resultados": ser.data})
+        grupos = GrupoService.listar_grupos(filtros)
+        paginator = KeysetPagination()
+        pagina = paginator.paginate_queryset(grupos, request, view=self)
+        ser = GrupoSerializer(pagina, many=True)
+        response = paginator.get_paginated_response(ser.data)
+        if request.query_params.get('facetas'):
+            # Con filtros, los conteos se calculan sobre los resultados
+            response.data['facetas'] = obtener_facetas(grupos if filtros else None)
+        return response
 
 # -------------------------------------------------------------------
 # GRUPOS
@@ -135,24 +142,20 @@ class GrupoViewSet(viewsets.ModelViewSet):
     CRUD de Grupos + acciones: miembros, agregar_miembro, eliminar_miembro, eventos.
 
     Query params útiles:
-      ?search= (nombre_grupo/area_interes/tipo_grupo/descripcion/correo_grupo)
+      ?search= (texto libre sobre nombre/área/tipo/descripción, por relevancia)
       ?ordering=nombre_grupo|area_interes|tipo_grupo|id_grupo|fecha_creacion
       ?area= (filtro exacto por área → area_interes)
+      ?cursor= (paginación keyset sin COUNT; ver grupos/pagination.py)
+      ?facetas=1 (agrega conteos por área/tipo/estado; con filtros, de los resultados)
     """
 
     queryset = Grupo.objects.all()
     serializer_class = GrupoSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
-    # DRF filters
-    filter_backends = [SearchFilter, OrderingFilter]
-    search_fields = [
-        "nombre_grupo",
-        "area_interes",
-        "tipo_grupo",
-        "descripcion",
-        "correo_grupo",
-    ]
+    # DRF filters (la búsqueda va después para poder ordenar por relevancia)
+    filter_backends = [OrderingFilter, BusquedaTextoFilter]
     ordering_fields = [
         "nombre_grupo",
         "area_interes",
@@ -169,6 +172,12 @@ class GrupoViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         qs = super().get_queryset()
+        if self.action == "retrieve":
+            # Miembros y próximos eventos (con cupos) en consultas fijas
+            qs = GrupoService.con_detalle(qs)
+        elif self.action == "list":
+            # Listados repetidos desde el cache (grupos/cache_consultas.py)
+            qs = qs.cacheado()
         area = self.request.query_params.get("area")
         estado = self.request.query_params.get("estado")
         if area:
@@ -177,6 +186,19 @@ class GrupoViewSet(viewsets.ModelViewSet):
             qs = qs.filter(estado_grupo=estado)
         return qs
 
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get("facetas") and isinstance(response.data, dict):
+            filtrado = any(
+                request.query_params.get(param) for param in ("search", "area", "estado")
+            )
+            # Sin filtros: conteos precalculados (GRUPO_FACETA), sin GROUP BY.
+            # Con filtros: conteos sobre los resultados filtrados.
+            response.data["facetas"] = obtener_facetas(
+                self.filter_queryset(self.get_queryset()) if filtrado else None
+            )
+        return response
+
     # ----------------------- CRUD con services -----------------------------
 
     @transaction.atomic
@@ -296,7 +318,7 @@ class GrupoViewSet(viewsets.ModelViewSet):
             eventos = (
                 GrupoService.obtener_eventos(grupo.id_grupo)
                 if hasattr(GrupoService, "obtener_eventos")
-                else grupo.eventos.all()
+                else con_cupos_ocupados(grupo.eventos.all())
             )
             return Response(EventoSerializer(eventos, many=True).data)
         except ObjectDoesNotExist:
@@ -307,11 +329,12 @@ class GrupoViewSet(viewsets.ModelViewSet):
 # -------------------------------------------------------------------
 
 class EventoViewSet(viewsets.ModelViewSet):
-    """CRUD de Eventos + cancelar + registrar_usuario."""
+    """CRUD de Eventos + cancelar + registrar_usuario(s)."""
 
     queryset = Evento.objects.select_related("grupo").all()
     serializer_class = EventoSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     filter_backends = [SearchFilter, OrderingFilter]
     search_fields = ["nombre_evento", "descripcion_evento", "lugar", "tipo_evento"]
@@ -329,6 +352,8 @@ class EventoViewSet(viewsets.ModelViewSet):
             qs = qs.filter(estado_evento=estado)
         if desde:
             qs = qs.filter(fecha_inicio__date__gte=desde)
+        if self.action == "list":
+            qs = con_cupos_ocupados(qs).cacheado()
         return qs
 
     @transaction.atomic
@@ -406,6 +431,34 @@ class EventoViewSet(viewsets.ModelViewSet):
         except (ValidationError, DRFValidationError) as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=["post"])
+    def registrar_usuarios(self, request, pk=None):
+        """
+        POST /eventos/{id}/registrar_usuarios/
+        Body: {"ids_usuarios": [3, 4, 5], "comentario": "Inscripción del curso"}
+
+        Respuesta: resultado por usuario (REGISTRADO, NO_EXISTE,
+        YA_REGISTRADO, DUPLICADO o SIN_CUPO) y el total de registrados.
+        """
+        try:
+            evento = self.get_object()
+            payload = RegistroMasivoSerializer(data=request.data)
+            payload.is_valid(raise_exception=True)
+            resultados = ParticipacionService.registrar_participaciones(
+                id_evento=evento.id_evento,
+                ids_usuarios=payload.validated_data["ids_usuarios"],
+                comentario=payload.validated_data.get("comentario", ""),
+            )
+            registrados = sum(1 for r in resultados if r["estado"] == "REGISTRADO")
+            return Response(
+                {"registrados": registrados, "resultados": resultados},
+                status=status.HTTP_201_CREATED if registrados else status.HTTP_200_OK,
+            )
+        except ObjectDoesNotExist:
+            return Response({"error": "Evento no encontrado"}, status=status.HTTP_404_NOT_FOUND)
+        except (ValidationError, DRFValidationError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
 # -------------------------------------------------------------------
 # USUARIOS
 # -------------------------------------------------------------------
@@ -413,9 +466,10 @@ class EventoViewSet(viewsets.ModelViewSet):
 class UsuarioViewSet(viewsets.ModelViewSet):
     """CRUD de Usuarios."""
 
-    queryset = Usuario.objects.all()
+    queryset = Usuario.objects.order_by("id_usuario")
     serializer_class = UsuarioSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     @transaction.atomic
     def create(self, request, *args, **kwargs):
@@ -470,14 +524,15 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Notificacion.objects.all()
     serializer_class = NotificacionSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
     # NUEVO: filtrar por usuario=? usando tu modelo Usuario
     def get_queryset(self):
-        qs = super().get_queryset().order_by('-fecha_envio')
         usuario_id = self.request.query_params.get('usuario')
         if usuario_id:
-            qs = qs.filter(usuarios__id_usuario=usuario_id)
-        return qs
+            # Bandeja del usuario con `leida` anotada en la misma consulta
+            return NotificacionService.obtener_notificaciones_usuario(usuario_id)
+        return super().get_queryset().order_by('-fecha_envio')
 
     # NUEVO: pasar id_usuario al serializer para calcular "leida"
     def get_serializer_context(self):
@@ -487,12 +542,49 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
             context['id_usuario'] = usuario_id
         return context
 
+    @action(detail=False, methods=['get'])
+    def no_leidas(self, request):
+        """GET /notificaciones/no_leidas/?usuario=ID → {"no_leidas": N} (badge)"""
+        usuario_id = request.query_params.get('usuario')
+        if not usuario_id or not usuario_id.isdigit():
+            return Response({"error": "Parámetro usuario requerido"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            total = NotificacionService.contar_no_leidas(int(usuario_id))
+            return Response({"no_leidas": total})
+        except ObjectDoesNotExist:
+            return Response({"error": "Usuario no encontrado"},
+                            status=status.HTTP_404_NOT_FOUND)
+
+    @action(detail=False, methods=['get'])
+    def esperar(self, request):
+        """
+        GET /notificaciones/esperar/?usuario=ID&desde=MARCA&timeout=25
+        Long-poll: responde en cuanto el usuario tenga notificaciones nuevas
+        (o al agotarse el tiempo) con {"hay_nuevas": bool, "marca": N}.
+        La siguiente llamada debe enviar desde=marca.
+        """
+        usuario_id = request.query_params.get('usuario', '')
+        desde = request.query_params.get('desde')
+        timeout = request.query_params.get('timeout')
+        try:
+            resultado = NotificacionService.esperar_novedades(
+                int(usuario_id),
+                desde=int(desde) if desde else None,
+                timeout=float(timeout) if timeout else None,
+            )
+            return Response(resultado)
+        except ValueError:
+            return Response({"error": "Parámetros usuario, desde y timeout deben ser numéricos"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=True, methods=['post'])
     def marcar_leida(self, request, pk=None):
         """POST /notificaciones/{id}/marcar-leida/"""
         try:
             notificacion = self.get_object()
-            NotificacionService.marcar_como_leida(
+            # Escritura diferida: se agrupa con otras lecturas del intervalo
+            NotificacionService.registrar_lectura(
                 request.user.id,  # esto lo revisamos luego si queremos mapear User→Usuario
                 notificacion.id_notificacion
             )
@@ -502,22 +594,45 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
             return Response({"error": "Notificación no encontrada"},
                             status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['post'])
+    def marcar_leidas(self, request):
+        """
+        POST /notificaciones/marcar_leidas/
+        Body: {} (todas) | {"hasta": "2025-05-01T00:00:00Z"} | {"ids_notificaciones": [1, 2]}
+        """
+        try:
+            ser = MarcarLeidasSerializer(data=request.data)
+            ser.is_valid(raise_exception=True)
+            marcadas = NotificacionService.marcar_leidas(
+                request.user.id,
+                hasta=ser.validated_data.get('hasta'),
+                ids_notificaciones=ser.validated_data.get('ids_notificaciones'),
+            )
+            return Response({"marcadas": marcadas}, status=status.HTTP_200_OK)
+        except (ValidationError, DRFValidationError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
     @action(detail=False, methods=['post'])
     def enviar_masiva(self, request):
 
         """
         POST /notificaciones/enviar-masiva/
         Body: {"ids_usuarios":[1,2,3], "tipo_notificacion":"EVENTO_CREADO", "mensaje":"Se creó un nuevo evento"}
+           o   {"audiencia": {"tipo": "GRUPO", "id": 4}, "difusion": true, "tipo_notificacion": ..., "mensaje": ...}
         """
         try:
             ser = EnviarNotificacionSerializer(data=request.data)
             ser.is_valid(raise_exception=True)
             notif = NotificacionService.enviar_notificacion(
-                ser.validated_data['ids_usuarios'],
+                ser.validated_data.get('ids_usuarios'),
                 ser.validated_data['tipo_notificacion'],
-                ser.validated_data['mensaje']
+                ser.validated_data['mensaje'],
+                audiencia=ser.validated_data.get('audiencia'),
+                difusion=ser.validated_data['difusion'],
             )
-            return Response(NotificacionSerializer(notif).data, status=status.HTTP_201_CREATED)
+            # 202: el reparto a una audiencia grande sigue en segundo plano
+            codigo = status.HTTP_202_ACCEPTED if notif.envio_diferido else status.HTTP_201_CREATED
+            return Response(NotificacionSerializer(notif).data, status=codigo)
         except (ValidationError, DRFValidationError) as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -526,7 +641,16 @@ class NotificacionViewSet(viewsets.ReadOnlyModelViewSet):
 # AUTH (Register / Login / Logout)
 # -------------------------------------------------------------------
 
-from .auth import UsuarioAuthToken  # import del nuevo módulo de auth
+from .auth import UsuarioAuthToken, ejecutar_hash  # import del nuevo módulo de auth
+from .tareas import PoolSaturado
+
+
+def _respuesta_saturada():
+    return Response(
+        {'error': 'Servicio ocupado, intenta de nuevo en unos segundos'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': '2'},
+    )
 
 
 class RegisterSerializer(Serializer):
@@ -539,6 +663,12 @@ class RegisterSerializer(Serializer):
 class LoginSerializer(Serializer):
     correo = EmailField()
     password = CharField()
+    dispositivo = CharField(max_length=100, required=False, allow_blank=True)
+
+
+def _dispositivo(request, data):
+    """Identificador del cliente: el enviado explícitamente o el User-Agent."""
+    return (data.get('dispositivo') or request.META.get('HTTP_USER_AGENT', ''))[:100]
 
 
 class AuthView(viewsets.ViewSet):
@@ -563,7 +693,7 @@ class AuthView(viewsets.ViewSet):
         if not correo.endswith('@unal.edu.co'):
             return Response({'error': 'Registro permitido solo con correo @unal.edu.co'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if Usuario.objects.filter(correo_usuario__iexact=correo).exists():
+        if Usuario.objects.filter(correo_normalizado=correo).exists():
             return Response({'error': 'Ya existe una cuenta con ese correo'}, status=status.HTTP_400_BAD_REQUEST)
 
         usuario = Usuario(
@@ -571,10 +701,13 @@ class AuthView(viewsets.ViewSet):
             apellido=data['apellido'].strip(),
             correo_usuario=correo
         )
-        usuario.set_password(data['password'])
+        try:
+            ejecutar_hash(usuario.set_password, data['password'])
+        except PoolSaturado:
+            return _respuesta_saturada()
         usuario.save()
 
-        token = UsuarioAuthToken.create(usuario)
+        token = UsuarioAuthToken.create(usuario, _dispositivo(request, data))
 
         return Response({
             'message': 'Registrado correctamente',
@@ -595,15 +728,19 @@ class AuthView(viewsets.ViewSet):
         correo = data['correo'].lower().strip()
 
         try:
-            usuario = Usuario.objects.get(correo_usuario__iexact=correo)
+            usuario = Usuario.objects.get(correo_normalizado=correo)
         except Usuario.DoesNotExist:
             return Response({'error': 'Credenciales inválidas'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        if not usuario.check_password(data['password']):
+        try:
+            valida = ejecutar_hash(usuario.check_password, data['password'])
+        except PoolSaturado:
+            return _respuesta_saturada()
+        if not valida:
             return Response({'error': 'Credenciales inválidas'}, status=status.HTTP_401_UNAUTHORIZED)
 
-        # crear token nuevo cada login (o reutilizar si prefieres)
-        token = UsuarioAuthToken.create(usuario)
+        # reutilizar el token vigente del dispositivo (AUTH_TOKEN_REUSAR)
+        token = UsuarioAuthToken.obtener_o_crear(usuario, _dispositivo(request, data))
         return Response({
             'message': 'Login correcto',
             'usuario': {
@@ -664,27 +801,44 @@ def perfil_usuario(request, usuario_id):
     return render(request, 'perfil/completo.html', context)
 
 
-def explorar_intereses(request):
-    """Página para explorar todas las áreas de interés disponibles."""
-    grupos_por_interes = (
-        Grupo.objects.values('area_interes')
-        .annotate(total_grupos=Count('id_grupo'))
-        .order_by('area_interes')
+def _intereses_populares(grupos_por_area=5):
+    """
+    Áreas de interés con su total de grupos y los más populares de cada una,
+    en una sola consulta con funciones de ventana.
+    """
+    por_area = F('area_interes')
+    grupos = (
+        Grupo.objects.exclude(area_interes='')
+        .annotate(
+            posicion=Window(
+                RowNumber(),
+                partition_by=[por_area],
+                order_by=[F('total_miembros').desc(), F('id_grupo').asc()],
+            ),
+            total_area=Window(Count('id_grupo'), partition_by=[por_area]),
+        )
+        .filter(posicion__lte=grupos_por_area)
+        .order_by('area_interes', 'posicion')
     )
 
-    intereses_populares = []
-    for interes in grupos_por_interes:
-        if interes['area_interes']:
-            grupos = Grupo.objects.filter(area_interes=interes['area_interes'])[:5]
-            intereses_populares.append({
-                'area': interes['area_interes'],
-                'total_grupos': interes['total_grupos'],
-                'grupos_destacados': grupos
-            })
+    intereses = {}
+    for grupo in grupos:
+        interes = intereses.setdefault(grupo.area_interes, {
+            'area': grupo.area_interes,
+            'total_grupos': grupo.total_area,
+            'grupos_destacados': [],
+        })
+        interes['grupos_destacados'].append(grupo)
+    return list(intereses.values())
+
 
-    return render(request, 'perfil/explorar_intereses.html', {
-        'intereses_populares': intereses_populares
-    })
+def explorar_intereses(request):
+    """Página para explorar todas las áreas de interés disponibles (cacheada)."""
+    html = grupo_cache.get_explorar_intereses(lambda: render_to_string(
+        'perfil/explorar_intereses.html',
+        {'intereses_populares': _intereses_populares()},
+    ))
+    return HttpResponse(html)
 
 
 def editar_perfil(request, usuario_id):
@@ -700,7 +854,7 @@ def editar_perfil(request, usuario_id):
             usuario.nombre_usuario = nombre
             usuario.apellido = apellido
             usuario.correo_usuario = correo
-            usuario.save()
+            usuario.save(update_fields=['nombre_usuario', 'apellido', 'correo_usuario'])
 
             messages.success(request, 'Perfil actualizado correctamente!')
             return redirect('perfil_usuario', usuario_id=usuario.id_usuario)
@@ -4,6 +4,7 @@ Configuración de Django - ÁgoraUN
 Basado en Django 4.2 + DRF
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project
@@ -97,6 +98,67 @@ DATABASES = {
     }
 }
 
+# ===========================================================================
+# CACHE
+# ===========================================================================
+
+# 'default' es compartido entre workers: cache de grupos, nivel compartido
+# de tokens, candados de carga y avisos push. Debe ser un cache en memoria
+# (Redis): estas claves se leen y escriben en casi cada petición.
+# 'versiones' guarda claves pequeñas que nunca deben expulsarse (versión de
+# ConfigManager, generaciones de tablas, revocaciones de tokens); en Redis
+# es la misma instancia: con maxmemory-policy volatile-lru solo se expulsan
+# claves con TTL y estas no lo tienen.
+# 'local' es de cada proceso: solo para datos cuya validez la decide una
+# clave compartida (resultados de QuerySets por generación).
+#
+# AGORAUN_CACHE=bd usa DatabaseCache en la misma MySQL como respaldo
+# (sin Redis): tablas creadas por la migración 0012, 'default' con límite
+# de entradas y 'versiones' en su propia tabla, sin recorte.
+REDIS_URL = os.environ.get('AGORAUN_REDIS_URL', 'redis://127.0.0.1:6379/1')
+
+CACHES_REDIS = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'agoraun',
+    },
+    'versiones': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'agoraun',
+    },
+}
+
+CACHES_BD = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'AGORAUN_CACHE',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+            'CULL_FREQUENCY': 4,    # al llenarse borra 1/4 de las entradas
+        },
+    },
+    'versiones': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'AGORAUN_CACHE_VERSIONES',
+        # Pocas claves (una por tabla versionada, usuario revocado y la
+        # configuración): el límite solo evita que se recorten
+        'OPTIONS': {'MAX_ENTRIES': 10 ** 9},
+    },
+}
+
+CACHES = {
+    **(CACHES_BD if os.environ.get('AGORAUN_CACHE') == 'bd' else CACHES_REDIS),
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'agoraun-local',
+    },
+}
+
+# Alias de CACHES con las versiones compartidas (ver arriba)
+CACHE_VERSIONES_ALIAS = 'versiones'
+
 # ===========================================================================
 # VALIDACIÓN DE CONTRASEÑAS
 # ===========================================================================
@@ -147,6 +209,8 @@ REST_FRAMEWORK = {
     # Paginación
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Los listados principales usan grupos.pagination.KeysetPagination:
+    # ?cursor= activa paginación keyset (sin COUNT ni OFFSET)
 
     # Autenticación
     'DEFAULT_AUTHENTICATION_CLASSES': [
@@ -170,6 +234,69 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Ciclo de vida de tokens (grupos.auth.UsuarioAuthToken)
+AUTH_TOKEN_REUSAR = True              # un token por usuario y dispositivo
+AUTH_TOKEN_EXPIRACION = 30 * 86400    # segundos sin uso; None = no expiran
+AUTH_TOKEN_RENOVAR = 3600             # frecuencia máxima de escritura de ultimo_uso
+
+# Pool acotado para hashes de contraseña (grupos.auth.ejecutar_hash)
+AUTH_HASH_HILOS = 4
+AUTH_HASH_COLA = 64      # en espera; por encima se responde 503
+AUTH_HASH_ESPERA = 10    # segundos máximos esperando el resultado
+
+# Segundos entre comprobaciones de la versión compartida de ConfigManager
+CONFIG_VERIFICAR = 5
+
+# Cache read-through de grupos (grupos.singletons.GrupoCacheManager)
+GRUPO_CACHE_TTL = 900            # segundos que la entrada se considera fresca
+GRUPO_CACHE_STALE = 300          # segundos extra sirviéndola mientras se renueva
+GRUPO_CACHE_TTL_NEGATIVO = 60    # IDs inexistentes
+GRUPO_CACHE_ESPERA = 5           # máximo esperando la carga de otra petición
+
+# Cache de resultados de QuerySets (grupos/cache_consultas.py): las
+# generaciones van en CACHES['default'] y los resultados en este alias
+QUERYSET_CACHE_ACTIVO = True
+QUERYSET_CACHE_TTL = 60
+QUERYSET_CACHE_ALIAS = 'local'
+
+# Cache de autenticación por token (grupos.singletons.TokenCacheManager)
+AUTH_CACHE_TTL_LOCAL = 30          # segundos en la LRU de cada proceso
+AUTH_CACHE_MAX = 10000             # entradas máximas de la LRU
+AUTH_CACHE_COMPARTIDO = False      # segundo nivel en CACHES['default'] (compartido)
+AUTH_CACHE_TTL_COMPARTIDO = 300
+
+# Segundos que se cachea el COUNT de ?total=aprox en listados con filtros
+# (sin filtros, en MySQL, se usa la estimación de filas del optimizador)
+PAGINACION_TOTAL_TTL = 60
+
+# ===========================================================================
+# NOTIFICACIONES Y TAREAS EN SEGUNDO PLANO
+# ===========================================================================
+
+# Filas USUARIO_NOTIFICACION por INSERT al repartir una notificación
+NOTIFICACIONES_LOTE = 1000
+# A partir de cuántos destinatarios el reparto se hace en segundo plano
+NOTIFICACIONES_UMBRAL_DIFERIDO = 1000
+# Hilos del pool de tareas (grupos/tareas.py)
+TAREAS_HILOS = 2
+TAREAS_SINCRONAS = False
+# Acuses de lectura: segundos que se acumulan antes de escribirlos en lote
+# (0 = escribir de inmediato) y máximo de pendientes por proceso.
+# El buffer es de cada proceso: "leída" se ve al instante en el mismo
+# worker, pero otros workers pueden tardar hasta LECTURAS_VENTANA segundos.
+LECTURAS_VENTANA = 0.5
+LECTURAS_MAX_PENDIENTES = 1000
+# Aviso de notificaciones nuevas (GET /api/notificaciones/esperar/).
+# Con varios workers usar 'grupos.push.BackendCache' (CACHES['default'] es compartido).
+NOTIFICACIONES_PUSH_BACKEND = 'grupos.push.BackendLocal'
+NOTIFICACIONES_PUSH_ESPERA = 25   # segundos máximos de una espera
+NOTIFICACIONES_PUSH_SONDEO = 1    # segundos entre consultas al backend
+# Días de retención por tipo_notificacion (python manage.py compactar_notificaciones)
+NOTIFICACIONES_RETENCION = {
+    'default': 180,
+    'EVENTO_CREADO': 60,
+}
+
 # ===========================================================================
 # DOCUMENTACIÓN API (Swagger/OpenAPI)
 # ===========================================================================
@@ -1,27 +1,48 @@
 import logging
-from django.core.cache import cache
+import threading
+import time
+import uuid
+from types import MappingProxyType
+
+from django.conf import settings
+from django.core.cache import caches
 
 logger = logging.getLogger(__name__)
 
 
+def _cache():
+    """Cache compartido de versiones (settings.CACHE_VERSIONES_ALIAS)."""
+    return caches[settings.CACHE_VERSIONES_ALIAS]
+
+
 class ConfigManager:
     """
     Singleton para gestión de configuración de la aplicación
     Caso REAL donde SÍ es útil
+
+    La configuración vive en un snapshot inmutable del proceso: `get` lee
+    de memoria, sin I/O. `set`/`reset` publican la configuración completa
+    en el cache de versiones compartido junto con una clave de versión
+    ('config_version').
+    Cada proceso compara esa versión como mucho cada CONFIG_VERIFICAR
+    segundos y, si cambió, reemplaza su snapshot de una sola vez.
     """
     _instance = None
-    _config_data = {}
+    _cache_datos = "config_datos"
+    _cache_version = "config_version"
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
-            cls._instance._load_initial_config()
+            cls._instance._lock = threading.Lock()
+            cls._instance._estado = (None, MappingProxyType(cls._instance._load_initial_config()))
+            cls._instance._verificado = 0.0
             logger.info("ConfigManager Singleton creado")
         return cls._instance
 
     def _load_initial_config(self):
-        """Cargar configuración inicial"""
-        self._config_data = {
+        """Configuración inicial"""
+        return {
             'app_name': 'Sistema de Grupos UN',
             'version': '1.0.0',
             'max_grupos_usuario': 5,
@@ -29,33 +50,52 @@ class ConfigManager:
             'notificaciones_activas': True,
         }
 
+    def _snapshot(self):
+        """Snapshot vigente; consulta la versión compartida si toca."""
+        ahora = time.monotonic()
+        if ahora - self._verificado >= settings.CONFIG_VERIFICAR:
+            self._verificado = ahora
+            self._recargar()
+        return self._estado[1]
+
+    def _recargar(self):
+        version = _cache().get(self._cache_version)
+        if version is None or version == self._estado[0]:
+            return
+        publicado = _cache().get(self._cache_datos)
+        if publicado is None:
+            return
+        # (versión, datos) se guardan juntos: el snapshot nunca mezcla versiones
+        version, datos = publicado
+        self._estado = (version, MappingProxyType(datos))
+        logger.info("Config recargada (versión %s)", version)
+
+    def _publicar(self, datos):
+        version = uuid.uuid4().hex
+        with self._lock:
+            self._estado = (version, MappingProxyType(datos))
+        _cache().set(self._cache_datos, (version, datos), None)
+        _cache().set(self._cache_version, version, None)
+
     def get(self, key, default=None):
         """Obtener valor de configuración"""
-        cache_key = f"config_{key}"
-        cached_value = cache.get(cache_key)
-        if cached_value is not None:
-            return cached_value
-
-        value = self._config_data.get(key, default)
-        cache.set(cache_key, value, 3600)
-        return value
+        return self._snapshot().get(key, default)
 
     def set(self, key, value):
-        """Establecer valor de configuración"""
-        self._config_data[key] = value
-        cache_key = f"config_{key}"
-        cache.set(cache_key, value, 3600)
+        """Establecer valor de configuración (para todos los procesos)"""
+        with self._lock:
+            self._recargar()
+            datos = {**self._estado[1], key: value}
+        self._publicar(datos)
         logger.info("Config: %s = %s", key, value)
 
     def get_all(self):
         """Obtener toda la configuración"""
-        return self._config_data.copy()
+        return dict(self._snapshot())
 
     def reset(self):
         """Resetear a configuración inicial"""
-        self._load_initial_config()
-        for key in self._config_data:
-            cache.delete(f"config_{key}")
+        self._publicar(self._load_initial_config())
         logger.info("ConfigManager reseteado")
 
 
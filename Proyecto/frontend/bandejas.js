@@ -190,7 +190,30 @@ async function loadEventos() {
   }
 }
 
+// Aviso de notificaciones nuevas (long-poll): la bandeja se recarga solo
+// cuando el servidor avisa que hay algo nuevo para el usuario
+const pausa = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+let marcaNotifs = null;
+
+async function esperarNotificaciones() {
+  while (true) {
+    if (!USER_ID) {
+      await pausa(5000);
+      continue;
+    }
+    try {
+      const desde = marcaNotifs ? `&desde=${marcaNotifs}` : "";
+      const data = await fetchJSON(`${API_BASE}/notificaciones/esperar/?usuario=${USER_ID}${desde}`);
+      marcaNotifs = data.marca;
+      if (data.hay_nuevas) loadNotificaciones();
+    } catch (err) {
+      await pausa(5000);
+    }
+  }
+}
+
 // Inicial
 loadSolicitudes();
 loadNotificaciones();
 loadEventos();
+esperarNotificaciones();